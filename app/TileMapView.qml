@@ -0,0 +1,106 @@
+// TileMapView.qml — pans and zooms a pre-rendered route map (see route_tiles.py)
+// Only the tiles intersecting the viewport exist as Image items; everything
+// else is covered by the map's thumbnail until its tile has been decoded.
+import QtQuick 2.15
+import QtQuick.Controls 2.15
+
+Item {
+    id: mapView
+    property string mapName: ""
+    property int page: 0
+    property var levels: RouteMaps.levels(mapName)
+    property int zoom: Math.min(1, levels.length - 1)
+    readonly property int tileSize: RouteMaps.tileSize()
+    readonly property var level: levels.length ? levels[zoom] : ({ width: 0, height: 0 })
+    clip: true
+
+    // Keep the point under (cx, cy) in place while switching pyramid levels
+    function setZoom(newZoom, cx, cy) {
+        newZoom = Math.max(0, Math.min(levels.length - 1, newZoom))
+        if (newZoom === zoom)
+            return
+        var fx = (flick.contentX + cx) / Math.max(1, level.width)
+        var fy = (flick.contentY + cy) / Math.max(1, level.height)
+        zoom = newZoom
+        flick.contentX = Math.max(0, Math.min(level.width - width, fx * level.width - cx))
+        flick.contentY = Math.max(0, Math.min(level.height - height, fy * level.height - cy))
+    }
+
+    Flickable {
+        id: flick
+        anchors.fill: parent
+        contentWidth: mapView.level.width
+        contentHeight: mapView.level.height
+        boundsBehavior: Flickable.StopAtBounds
+
+        // Visible tile range, recomputed at most once per event-loop pass and
+        // assigned as one object so a pan or zoom re-binds each delegate once
+        property var tiles: ({ col: 0, row: 0, cols: 0, rows: 0 })
+        function updateTiles() {
+            var size = mapView.tileSize
+            var col = Math.max(0, Math.floor(contentX / size))
+            var row = Math.max(0, Math.floor(contentY / size))
+            var lastCol = Math.min(Math.ceil(mapView.level.width / size), Math.ceil((contentX + width) / size)) - 1
+            var lastRow = Math.min(Math.ceil(mapView.level.height / size), Math.ceil((contentY + height) / size)) - 1
+            var next = { col: col, row: row, cols: Math.max(0, lastCol - col + 1), rows: Math.max(0, lastRow - row + 1) }
+            if (next.col !== tiles.col || next.row !== tiles.row || next.cols !== tiles.cols
+                    || next.rows !== tiles.rows || mapView.zoom !== tiles.zoom) {
+                next.zoom = mapView.zoom
+                tiles = next
+            }
+        }
+        onContentXChanged: Qt.callLater(updateTiles)
+        onContentYChanged: Qt.callLater(updateTiles)
+        onWidthChanged: Qt.callLater(updateTiles)
+        onHeightChanged: Qt.callLater(updateTiles)
+        Connections {
+            target: mapView
+            function onZoomChanged() { Qt.callLater(flick.updateTiles) }
+            function onLevelsChanged() { Qt.callLater(flick.updateTiles) }
+        }
+
+        Image {
+            width: flick.contentWidth
+            height: flick.contentHeight
+            source: mapView.mapName ? "image://tiles/" + mapView.mapName + "/thumb" : ""
+            smooth: true
+        }
+
+        Repeater {
+            model: flick.tiles.cols * flick.tiles.rows
+            delegate: Image {
+                readonly property int col: flick.tiles.col + index % flick.tiles.cols
+                readonly property int row: flick.tiles.row + Math.floor(index / flick.tiles.cols)
+                x: col * mapView.tileSize
+                y: row * mapView.tileSize
+                asynchronous: true
+                source: "image://tiles/%1/%2/%3/%4/%5".arg(mapView.mapName).arg(mapView.page)
+                        .arg(flick.tiles.zoom).arg(col).arg(row)
+            }
+        }
+    }
+
+    PinchHandler {
+        target: null
+        property int startZoom: 0
+        onActiveChanged: if (active) startZoom = mapView.zoom
+        onActiveScaleChanged: mapView.setZoom(startZoom + Math.round(Math.log(activeScale) / Math.LN2),
+                                              centroid.position.x, centroid.position.y)
+    }
+
+    WheelHandler {
+        onWheel: function(event) {
+            mapView.setZoom(mapView.zoom + (event.angleDelta.y > 0 ? 1 : -1),
+                            event.x, event.y)
+        }
+    }
+
+    Column {
+        anchors.right: parent.right
+        anchors.bottom: parent.bottom
+        anchors.margins: 12
+        spacing: 8
+        Button { text: "+"; width: 40; onClicked: mapView.setZoom(mapView.zoom + 1, mapView.width / 2, mapView.height / 2) }
+        Button { text: "−"; width: 40; onClicked: mapView.setZoom(mapView.zoom - 1, mapView.width / 2, mapView.height / 2) }
+    }
+}
@@ -0,0 +1,101 @@
+# build_qml_bundle.py
+# Asset build step: pack main.qml, the pages and the images they reference into
+# qml.rcc, the binary resource bundle page_cache.qml_base_url() loads from.
+#
+# Every QML file is then compiled from the bundle with a throwaway engine, so
+# syntax errors, unknown types and broken relative references fail the build
+# rather than the first visit to a page.  qmlcachegen's ahead-of-time output is
+# C++ that a Python application cannot link; instead the engine's on-disk
+# cache stores each file's bytecode the first time it is compiled, keyed by the
+# bundle's timestamps.
+#
+#   python app/build_qml_bundle.py
+#   python app/build_qml_bundle.py --output dist/qml.rcc --skip-check
+
+import argparse
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from page_cache import APP_DIR, QML_BUNDLE
+
+logger = logging.getLogger("rts.build.qml")
+
+ASSET_SUFFIXES = {".png", ".svg", ".jpg"}
+
+
+def bundle_files() -> list[Path]:
+    """QML sources and top-level images (route maps are served by route_tiles, not QML)."""
+    files = sorted(APP_DIR.glob("*.qml"))
+    files += sorted(p for p in (APP_DIR / "assets").iterdir()
+                    if p.is_file() and p.suffix.lower() in ASSET_SUFFIXES)
+    return files
+
+
+def _rcc() -> str:
+    rcc = shutil.which("pyside6-rcc")
+    if rcc is None:
+        import PySide6
+        rcc = str(Path(PySide6.__file__).parent / "Qt" / "libexec" / "rcc")
+    return rcc
+
+
+def pack(files: list[Path], output: Path):
+    entries = "\n".join(f'    <file alias="{escape(p.relative_to(APP_DIR).as_posix())}">{escape(str(p))}</file>'
+                        for p in files)
+    qrc = f'<!DOCTYPE RCC><RCC version="1.0">\n<qresource prefix="/">\n{entries}\n</qresource>\n</RCC>\n'
+    with tempfile.TemporaryDirectory() as tmp:
+        qrc_path = Path(tmp) / "qml.qrc"
+        qrc_path.write_text(qrc, encoding="utf-8")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        subprocess.run([_rcc(), "--binary", "-o", str(output), str(qrc_path)], check=True)
+
+
+def check(bundle: Path, files: list[Path]) -> list[str]:
+    """Compile every QML file from the bundle; returns the error messages."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QResource, QUrl
+    from PySide6.QtGui import QGuiApplication
+    from PySide6.QtQml import QQmlComponent, QQmlEngine
+
+    app = QGuiApplication.instance() or QGuiApplication([])  # noqa: F841  (engine needs one)
+    if not QResource.registerResource(str(bundle)):
+        return [f"{bundle}: not a valid resource bundle"]
+    engine = QQmlEngine()
+    errors = []
+    for path in files:
+        if path.suffix != ".qml":
+            continue
+        component = QQmlComponent(engine, QUrl(f"qrc:/{path.name}"))
+        errors += [e.toString() for e in component.errors()]
+    QResource.unregisterResource(str(bundle))
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the QML resource bundle")
+    parser.add_argument("--output", "-o", type=Path, default=QML_BUNDLE)
+    parser.add_argument("--skip-check", action="store_true", help="do not compile the QML after packing")
+    parser.add_argument("--log-level", "-l", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    start = time.perf_counter()
+    files = bundle_files()
+    pack(files, args.output)
+    if not args.skip_check:
+        errors = check(args.output, files)
+        for error in errors:
+            logger.error("%s", error)
+        if errors:
+            args.output.unlink()
+            sys.exit(f"QML check failed with {len(errors)} errors; {args.output} removed")
+    print(f"Packed {len(files)} files ({args.output.stat().st_size / 1e3:.0f} KB) into {args.output} "
+          f"in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,168 @@
+# build_tiles.py
+# Asset build step: rasterize the route map PDFs into the tile pyramid that
+# TileMapView.qml displays (see route_tiles.py for the layout).
+#
+# Each (map, page, zoom level) is rendered and cut into tiles in its own worker
+# process, so a full build uses every core; the parent is the only writer to
+# the SQLite store.  Maps whose PDF has not changed since the last build are
+# skipped.
+#
+#   python app/build_tiles.py                 # all PDFs in app/assets/routes
+#   python app/build_tiles.py --jobs 4 --force
+
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from route_tiles import DEFAULT_PATH, SCALES, THUMB_WIDTH, TILE_SIZE, TileStore
+
+logger = logging.getLogger("rts.build.tiles")
+
+ROUTES_DIR = Path(__file__).resolve().parent / "assets" / "routes"
+MAP_SUFFIX = "-map2025.pdf"
+
+
+# ----- Worker side -----------------------------------------------------------
+_app = None
+
+
+def _init_worker():
+    # QtPdf needs a core application instance in every process
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QCoreApplication
+    _app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def _encode(image, fmt: str) -> bytes:
+    from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, fmt, 100)  # WebP at quality 100 is lossless
+    return bytes(data)
+
+
+def _open(pdf_path: str):
+    from PySide6.QtPdf import QPdfDocument
+
+    document = QPdfDocument()
+    error = document.load(pdf_path)
+    if error != QPdfDocument.Error.None_:
+        raise RuntimeError(f"cannot load {pdf_path}: {error}")
+    return document
+
+
+def render_level(pdf_path: str, page: int, zoom: int, fmt: str):
+    """Render one page at SCALES[zoom] and cut it into (col, row, encoded) tiles."""
+    from PySide6.QtCore import QSize
+    from PySide6.QtGui import QImage
+
+    document = _open(pdf_path)
+    points = document.pagePointSize(page)
+    width = max(1, round(points.width() * SCALES[zoom]))
+    height = max(1, round(points.height() * SCALES[zoom]))
+    # Maps are opaque: drop alpha so tiles encode smaller
+    image = document.render(page, QSize(width, height)).convertToFormat(QImage.Format_RGB888)
+    document.close()
+    tiles = []
+    for row in range((height + TILE_SIZE - 1) // TILE_SIZE):
+        for col in range((width + TILE_SIZE - 1) // TILE_SIZE):
+            tile = image.copy(col * TILE_SIZE, row * TILE_SIZE,
+                              min(TILE_SIZE, width - col * TILE_SIZE),
+                              min(TILE_SIZE, height - row * TILE_SIZE))
+            tiles.append((col, row, _encode(tile, fmt)))
+    return page, zoom, width, height, tiles
+
+
+def render_thumbnail(pdf_path: str, fmt: str):
+    from PySide6.QtCore import QSize
+
+    document = _open(pdf_path)
+    pages = document.pageCount()
+    points = document.pagePointSize(0)
+    height = max(1, round(points.height() * THUMB_WIDTH / points.width()))
+    thumb = _encode(document.render(0, QSize(THUMB_WIDTH, height)), fmt)
+    document.close()
+    return pages, thumb
+
+
+# ----- Build driver ----------------------------------------------------------
+def _sha1(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def _tile_format() -> str:
+    from PySide6.QtGui import QImageWriter
+
+    formats = {bytes(f).decode() for f in QImageWriter.supportedImageFormats()}
+    return "webp" if "webp" in formats else "png"
+
+
+def build(pdfs, store: TileStore, jobs: int | None = None, force: bool = False) -> dict:
+    fmt = _tile_format()
+    todo = {}
+    for pdf in pdfs:
+        name = pdf.name.removesuffix(MAP_SUFFIX).removesuffix(".pdf")
+        digest = _sha1(pdf)
+        if not force and store.source(name) == digest:
+            logger.info("%s is up to date", name)
+            continue
+        todo[name] = (pdf, digest)
+    stats = {"maps": len(todo), "tiles": 0, "bytes": 0, "format": fmt}
+    if not todo:
+        return stats
+
+    context = multiprocessing.get_context("spawn")  # never fork a process that may hold Qt state
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_worker) as pool:
+        thumbs = {name: pool.submit(render_thumbnail, str(pdf), fmt) for name, (pdf, _) in todo.items()}
+        levels, pending = {}, {}
+        for name, (pdf, _) in todo.items():
+            pages, thumb = thumbs[name].result()
+            store.replace_map(name, pages, thumb)
+            pending[name] = pages * len(SCALES)
+            # Deepest levels first: they are the slowest jobs, so start them early
+            for zoom in reversed(range(len(SCALES))):
+                for page in range(pages):
+                    levels[pool.submit(render_level, str(pdf), page, zoom, fmt)] = name
+        for future in as_completed(levels):
+            name = levels[future]
+            page, zoom, width, height, tiles = future.result()
+            store.add_level(name, page, zoom, width, height, tiles)
+            stats["tiles"] += len(tiles)
+            stats["bytes"] += sum(len(data) for _, _, data in tiles)
+            logger.debug("%s page %d zoom %d: %dx%d, %d tiles", name, page, zoom, width, height, len(tiles))
+            pending[name] -= 1
+            if not pending[name]:
+                store.finish_map(name, todo[name][1])
+    store.vacuum()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the route map tile pyramid")
+    parser.add_argument("pdfs", nargs="*", type=Path, help=f"PDFs to build (default: {ROUTES_DIR}/*{MAP_SUFFIX})")
+    parser.add_argument("--output", "-o", type=Path, default=DEFAULT_PATH)
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="rebuild maps even if their PDF is unchanged")
+    parser.add_argument("--log-level", "-l", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    pdfs = args.pdfs or sorted(ROUTES_DIR.glob(f"*{MAP_SUFFIX}"))
+    if not pdfs:
+        sys.exit(f"No route PDFs found in {ROUTES_DIR}")
+    start = time.perf_counter()
+    store = TileStore(args.output)
+    stats = build(pdfs, store, jobs=args.jobs, force=args.force)
+    store.close()
+    print(f"Built {stats['maps']} maps, {stats['tiles']} {stats['format']} tiles "
+          f"({stats['bytes'] / 1e6:.1f} MB) into {args.output} in {time.perf_counter() - start:.1f} s")
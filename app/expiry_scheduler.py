@@ -0,0 +1,153 @@
+# expiry_scheduler.py
+"""
+expiry_scheduler.py
+
+One timer for every ticket countdown in the wallet.
+
+Tickets sit in a heap ordered by the next moment something about them
+changes on screen: the expiry itself, or, for tickets a delegate is showing,
+the next time their countdown text rolls over (hourly while more than a day
+is left, every minute below that).  A single QTimer is armed for the head of
+the heap, so the wallet wakes up only at those boundaries instead of once a
+second per ticket.  Entries are never removed from the middle of the heap;
+each ticket carries a generation number and stale entries are skipped when
+they surface.  An expired ticket leaves the heap for good.
+
+Signals:
+  - expired(str):          the ticket's expiry has passed
+  - countdownChanged(str): a watched ticket's countdown text has changed
+"""
+import heapq
+import itertools
+import logging
+import math
+import time
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+
+logger = logging.getLogger("rts.client.expiry")
+
+DAY = 86400
+HOUR = 3600
+MINUTE = 60
+# QTimer intervals are 32-bit milliseconds; longer waits are re-armed on wake-up
+MAX_WAIT_MS = DAY * 1000
+
+EXPIRE = 0
+TICK = 1
+
+
+def countdown(remaining: float) -> str:
+    """Countdown text for remaining seconds: "12d 4h", "3h 07m", "45m", "<1m", or "" once expired."""
+    if remaining <= 0:
+        return ""
+    minutes = int(remaining // MINUTE)
+    if remaining >= DAY:
+        return f"{minutes // 1440}d {minutes // 60 % 24}h"
+    if remaining >= HOUR:
+        return f"{minutes // 60}h {minutes % 60:02d}m"
+    return f"{minutes}m" if minutes else "<1m"
+
+
+def next_rollover(expires: float, now: float) -> float:
+    """
+    When countdown(expires - now) next changes: remaining drops below its current
+    whole unit.  Always after now, also when remaining is an exact multiple of the unit.
+    """
+    remaining = expires - now
+    unit = HOUR if remaining > DAY else MINUTE
+    return expires - (math.ceil(remaining / unit) - 1) * unit
+
+
+class ExpiryScheduler(QObject):
+    expired = Signal(str)
+    countdownChanged = Signal(str)
+
+    def __init__(self, parent=None, clock=time.time):
+        super().__init__(parent)
+        self._clock = clock
+        self._heap: list[tuple[float, int, int, str, int]] = []   # (when, seq, generation, id, kind)
+        self._seq = itertools.count()
+        self._expiry: dict[str, float] = {}
+        self._generation: dict[str, int] = {}
+        self._watched: set[str] = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._fire)
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    # ----- Registration ----------------------------------------------------
+    def sync(self, expiries: dict[str, float | None]):
+        """Make the scheduled set equal to expiries (ticket id -> Unix expiry, None = never)."""
+        now = self._clock()
+        for ticket_id in list(self._expiry):
+            if expiries.get(ticket_id) is None:
+                self._drop(ticket_id)
+        for ticket_id, expires in expiries.items():
+            if expires is None or expires <= now or self._expiry.get(ticket_id) == expires:
+                continue
+            self._expiry[ticket_id] = expires
+            self._generation[ticket_id] = self._generation.get(ticket_id, 0) + 1
+            self._push(expires, ticket_id, EXPIRE)
+            if ticket_id in self._watched:
+                self._push(next_rollover(expires, now), ticket_id, TICK)
+        self._arm()
+
+    def watch(self, ticket_id: str, watched: bool):
+        """A delegate showing ticket_id appeared (True) or went away (False)."""
+        if not watched:
+            # Its pending TICK entry is skipped when it surfaces
+            self._watched.discard(ticket_id)
+            return
+        if ticket_id in self._watched:
+            return
+        self._watched.add(ticket_id)
+        expires = self._expiry.get(ticket_id)
+        if expires is not None:
+            self._push(next_rollover(expires, self._clock()), ticket_id, TICK)
+            self._arm()
+
+    def _drop(self, ticket_id: str):
+        del self._expiry[ticket_id]
+        self._generation[ticket_id] = self._generation.get(ticket_id, 0) + 1
+
+    # ----- Heap + timer --------------------------------------------------------
+    def _push(self, when: float, ticket_id: str, kind: int):
+        heapq.heappush(self._heap, (when, next(self._seq), self._generation[ticket_id], ticket_id, kind))
+
+    def _live(self, entry) -> bool:
+        _, _, generation, ticket_id, kind = entry
+        return (ticket_id in self._expiry and self._generation[ticket_id] == generation
+                and (kind == EXPIRE or ticket_id in self._watched))
+
+    def _arm(self):
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._timer.stop()
+            return
+        wait_ms = int((self._heap[0][0] - self._clock()) * 1000) + 1
+        self._timer.start(max(0, min(wait_ms, MAX_WAIT_MS)))
+
+    def _fire(self):
+        now = self._clock()
+        expired, ticked = [], set()
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._live(entry):
+                continue
+            _, _, _, ticket_id, kind = entry
+            if kind == EXPIRE:
+                self._drop(ticket_id)
+                expired.append(ticket_id)
+            elif ticket_id not in ticked:
+                ticked.add(ticket_id)
+                self._push(next_rollover(self._expiry[ticket_id], now), ticket_id, TICK)
+        self._arm()
+        for ticket_id in ticked - set(expired):
+            self.countdownChanged.emit(ticket_id)
+        for ticket_id in expired:
+            logger.debug("Ticket %s expired", ticket_id)
+            self.expired.emit(ticket_id)
@@ -0,0 +1,319 @@
+# gtfs_store.py
+"""
+gtfs_store.py
+
+GTFS schedules compiled into flat NumPy columns.
+
+compile_feed() reads routes.txt, stops.txt, trips.txt, stop_times.txt and
+calendar.txt / calendar_dates.txt (from a directory or a .zip) and writes one
+.npy per column into a store directory:
+
+    stops    stop_id, stop_name, stop_lonlat             (sorted by stop_id)
+    routes   route_id, route_name                        (sorted by route_id)
+    trips    trip_id, trip_route, trip_service, trip_headsign, trip_offsets
+    stop times, grouped by trip in stop_sequence order:
+             st_stop, st_arrival, st_departure           (int32 seconds after
+                                                          midnight, may pass 24h)
+    per-stop departure index:
+             dep_offsets (CSR over stops), dep_time (sorted within each
+             stop), dep_row (row into the stop-time columns)
+    calendar service_id, service_days (one packed bit per service per day,
+             starting at meta.json's start_date)
+
+GtfsStore opens a compiled store with np.load(mmap_mode="r"), so opening
+costs a few file mappings no matter how large the feed is.  Id lookups are
+binary searches over the sorted id columns.  next_departures() is a binary
+search into one stop's slice of dep_time plus a vectorized calendar check.
+"""
+import csv
+import io
+import json
+import logging
+import zipfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("rts.client.gtfs")
+
+STORE_VERSION = 1
+DAY_S = 86_400
+# A trip's times can run past midnight; look this many service days back for them
+MAX_TRIP_DAYS = 2
+ARRAYS = (
+    "stop_id", "stop_name", "stop_lonlat",
+    "route_id", "route_name",
+    "trip_id", "trip_route", "trip_service", "trip_headsign", "trip_offsets",
+    "st_stop", "st_arrival", "st_departure",
+    "dep_offsets", "dep_time", "dep_row",
+    "service_id", "service_days",
+)
+
+
+# ----- Reading the feed ------------------------------------------------------
+class _Feed:
+    """Access to the .txt tables of a feed directory or zip."""
+
+    def __init__(self, path):
+        self._path = Path(path)
+        self._zip = zipfile.ZipFile(self._path) if self._path.suffix == ".zip" else None
+
+    def has(self, name: str) -> bool:
+        if self._zip is not None:
+            return name in self._zip.namelist()
+        return (self._path / name).exists()
+
+    def rows(self, name: str):
+        if self._zip is not None:
+            handle = io.TextIOWrapper(self._zip.open(name), encoding="utf-8-sig", newline="")
+        else:
+            handle = open(self._path / name, encoding="utf-8-sig", newline="")
+        with handle:
+            reader = csv.reader(handle)
+            header = [h.strip() for h in next(reader)]
+            yield header
+            yield from reader
+
+    def columns(self, name: str, wanted: list[str], optional=()) -> dict[str, list[str]]:
+        """The named columns of a table as lists of strings; missing optional columns are ''."""
+        rows = self.rows(name)
+        header = next(rows)
+        index = {}
+        for column in wanted + list(optional):
+            if column in header:
+                index[column] = header.index(column)
+            elif column in wanted:
+                raise ValueError(f"{name} has no {column} column")
+        out = {column: [] for column in wanted + list(optional)}
+        for row in rows:
+            if not row:
+                continue
+            for column, i in index.items():
+                out[column].append(row[i].strip() if i < len(row) else "")
+        n = len(next(iter(out.values()))) if index else 0
+        for column in optional:
+            if column not in index:
+                out[column] = [""] * n
+        return out
+
+
+def _seconds(values: list[str]) -> np.ndarray:
+    """'H:MM:SS' strings to int32 seconds; feeds repeat few distinct times, so memoise."""
+    memo = {}
+    out = np.empty(len(values), dtype=np.int32)
+    for i, text in enumerate(values):
+        seconds = memo.get(text)
+        if seconds is None:
+            if text:
+                h, m, s = text.split(":")
+                seconds = int(h) * 3600 + int(m) * 60 + int(s)
+            else:
+                seconds = -1
+            memo[text] = seconds
+        out[i] = seconds
+    return out
+
+
+def _index_of(sorted_ids: np.ndarray, ids: list[str], what: str) -> np.ndarray:
+    positions = np.searchsorted(sorted_ids, ids)
+    positions = np.minimum(positions, len(sorted_ids) - 1)
+    unknown = sorted_ids[positions] != np.asarray(ids, dtype=sorted_ids.dtype)
+    if unknown.any():
+        raise ValueError(f"unknown {what} {ids[int(np.argmax(unknown))]!r}")
+    return positions.astype(np.int32)
+
+
+def _parse_date(text: str) -> date:
+    return datetime.strptime(text, "%Y%m%d").date()
+
+
+def _calendar(feed: _Feed) -> tuple[np.ndarray, date, np.ndarray]:
+    """Sorted service ids, first day, and a (services, days) boolean activity matrix."""
+    weekly = feed.columns("calendar.txt", ["service_id", "monday", "tuesday", "wednesday", "thursday",
+                                           "friday", "saturday", "sunday", "start_date", "end_date"]) \
+        if feed.has("calendar.txt") else None
+    exceptions = feed.columns("calendar_dates.txt", ["service_id", "date", "exception_type"]) \
+        if feed.has("calendar_dates.txt") else None
+    if weekly is None and exceptions is None:
+        raise ValueError("feed has neither calendar.txt nor calendar_dates.txt")
+
+    ids, days = set(), []
+    if weekly:
+        ids.update(weekly["service_id"])
+        days += [_parse_date(d) for d in weekly["start_date"] + weekly["end_date"]]
+    if exceptions:
+        ids.update(exceptions["service_id"])
+        days += [_parse_date(d) for d in exceptions["date"]]
+    service_id = np.array(sorted(ids))
+    first = min(days)
+    n_days = (max(days) - first).days + 1
+    active = np.zeros((len(service_id), n_days), dtype=bool)
+    # Weekday of every day in the range, Monday = 0
+    weekday = (np.arange(n_days) + first.weekday()) % 7
+    if weekly:
+        rows = _index_of(service_id, weekly["service_id"], "service_id")
+        names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+        for i, row in enumerate(rows):
+            runs = np.array([weekly[name][i] == "1" for name in names])
+            start = (_parse_date(weekly["start_date"][i]) - first).days
+            end = (_parse_date(weekly["end_date"][i]) - first).days + 1
+            active[row, start:end] |= runs[weekday[start:end]]
+    if exceptions:
+        rows = _index_of(service_id, exceptions["service_id"], "service_id")
+        offsets = np.array([(_parse_date(d) - first).days for d in exceptions["date"]])
+        kinds = np.array(exceptions["exception_type"])
+        active[rows[kinds == "1"], offsets[kinds == "1"]] = True
+        active[rows[kinds == "2"], offsets[kinds == "2"]] = False
+    return service_id, first, active
+
+
+def compile_feed(feed_path, store_dir) -> dict:
+    """Compile a GTFS feed (directory or .zip) into store_dir; returns row counts."""
+    feed = _Feed(feed_path)
+    arrays = {}
+
+    stops = feed.columns("stops.txt", ["stop_id", "stop_lat", "stop_lon"], optional=["stop_name"])
+    order = np.argsort(stops["stop_id"], kind="stable")
+    arrays["stop_id"] = np.array(stops["stop_id"])[order]
+    arrays["stop_name"] = np.array(stops["stop_name"])[order]
+    arrays["stop_lonlat"] = np.column_stack((
+        np.array(stops["stop_lon"], dtype=np.float64), np.array(stops["stop_lat"], dtype=np.float64)))[order]
+
+    routes = feed.columns("routes.txt", ["route_id"], optional=["route_short_name", "route_long_name"])
+    order = np.argsort(routes["route_id"], kind="stable")
+    arrays["route_id"] = np.array(routes["route_id"])[order]
+    arrays["route_name"] = np.array([s or l for s, l in zip(routes["route_short_name"],
+                                                            routes["route_long_name"])])[order]
+
+    service_id, first_day, active = _calendar(feed)
+    arrays["service_id"] = service_id
+    arrays["service_days"] = np.packbits(active, axis=1)
+
+    trips = feed.columns("trips.txt", ["trip_id", "route_id", "service_id"], optional=["trip_headsign"])
+    order = np.argsort(trips["trip_id"], kind="stable")
+    arrays["trip_id"] = np.array(trips["trip_id"])[order]
+    arrays["trip_route"] = _index_of(arrays["route_id"], trips["route_id"], "route_id")[order]
+    arrays["trip_service"] = _index_of(service_id, trips["service_id"], "service_id")[order]
+    arrays["trip_headsign"] = np.array(trips["trip_headsign"])[order]
+
+    st = feed.columns("stop_times.txt", ["trip_id", "stop_id", "stop_sequence"],
+                      optional=["arrival_time", "departure_time"])
+    trip = _index_of(arrays["trip_id"], st.pop("trip_id"), "trip_id")
+    stop = _index_of(arrays["stop_id"], st.pop("stop_id"), "stop_id")
+    sequence = np.array(st.pop("stop_sequence"), dtype=np.int64)
+    arrival = _seconds(st.pop("arrival_time"))
+    departure = _seconds(st.pop("departure_time"))
+    # Only timepoints are required to carry times; fill the rest from each other
+    arrival = np.where(arrival < 0, departure, arrival)
+    departure = np.where(departure < 0, arrival, departure)
+    if (departure < 0).any():
+        logger.warning("%d stop times without any time are dropped (no interpolation)",
+                       int((departure < 0).sum()))
+    keep = departure >= 0
+    order = np.lexsort((sequence[keep], trip[keep]))
+    trip, stop = trip[keep][order], stop[keep][order]
+    arrays["st_stop"] = stop
+    arrays["st_arrival"] = arrival[keep][order]
+    arrays["st_departure"] = departure[keep][order]
+    arrays["trip_offsets"] = np.searchsorted(trip, np.arange(len(arrays["trip_id"]) + 1)).astype(np.int64)
+
+    # Departures grouped by stop, sorted by time within each stop
+    by_stop = np.lexsort((arrays["st_departure"], stop))
+    arrays["dep_row"] = by_stop.astype(np.int32)
+    arrays["dep_time"] = arrays["st_departure"][by_stop]
+    arrays["dep_offsets"] = np.searchsorted(stop[by_stop], np.arange(len(arrays["stop_id"]) + 1)).astype(np.int64)
+
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    for name in ARRAYS:
+        np.save(store_dir / f"{name}.npy", arrays[name])
+    counts = {"stops": len(arrays["stop_id"]), "routes": len(arrays["route_id"]),
+              "trips": len(arrays["trip_id"]), "stop_times": len(arrays["st_stop"]),
+              "services": len(service_id), "days": active.shape[1]}
+    # Written last: a store without meta.json is incomplete
+    (store_dir / "meta.json").write_text(json.dumps({
+        "version": STORE_VERSION, "start_date": first_day.isoformat(), **counts}))
+    logger.info("Compiled GTFS feed %s: %s", feed_path, counts)
+    return counts
+
+
+# ----- Querying --------------------------------------------------------------
+class GtfsStore:
+    def __init__(self, store_dir):
+        store_dir = Path(store_dir)
+        meta = json.loads((store_dir / "meta.json").read_text())
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"GTFS store {store_dir} has version {meta.get('version')}, "
+                             f"expected {STORE_VERSION}; recompile it")
+        self.meta = meta
+        self.start_date = date.fromisoformat(meta["start_date"])
+        self.days = meta["days"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(store_dir / f"{name}.npy", mmap_mode="r"))
+
+    def stop_index(self, stop_id: str) -> int:
+        i = int(np.searchsorted(self.stop_id, stop_id))
+        if i == len(self.stop_id) or self.stop_id[i] != stop_id:
+            raise KeyError(stop_id)
+        return i
+
+    def active(self, services: np.ndarray, day: int) -> np.ndarray:
+        """Whether each service (index array) runs on day (offset from start_date)."""
+        if not 0 <= day < self.days:
+            return np.zeros(len(services), dtype=bool)
+        byte = self.service_days[services, day >> 3]
+        return (byte >> (7 - (day & 7))) & 1 == 1
+
+    def departures_after(self, stop: int, day: int, seconds: int, limit: int) -> list[tuple[int, int]]:
+        """
+        Up to `limit` (row, departure seconds on `day`) pairs from a stop at or
+        after `seconds`, earliest first.  Trips of earlier service days still
+        running past midnight are included.
+        """
+        lo, hi = int(self.dep_offsets[stop]), int(self.dep_offsets[stop + 1])
+        times = self.dep_time[lo:hi]
+        found = []
+        for back in range(MAX_TRIP_DAYS):
+            start = lo + int(np.searchsorted(times, seconds + back * DAY_S))
+            window, count = limit, 0
+            # Walk forward in growing windows until enough running trips are found
+            while start < hi and count < limit:
+                end = min(start + window, hi)
+                rows = self.dep_row[start:end]
+                trips = np.searchsorted(self.trip_offsets, rows, side="right") - 1
+                running = self.active(self.trip_service[trips], day - back)
+                found += [(int(r), int(t) - back * DAY_S)
+                          for r, t in zip(rows[running], self.dep_time[start:end][running])]
+                count += int(running.sum())
+                start, window = end, window * 4
+        found.sort(key=lambda pair: pair[1])
+        return found[:limit]
+
+    def next_departures(self, stop_id: str, when: datetime, limit: int = 5) -> list[dict]:
+        """The next `limit` departures from a stop at or after `when` (local time)."""
+        stop = self.stop_index(stop_id)
+        day = (when.date() - self.start_date).days
+        seconds = when.hour * 3600 + when.minute * 60 + when.second
+        midnight = datetime.combine(when.date(), datetime.min.time(), tzinfo=when.tzinfo)
+        result = []
+        for row, departure in self.departures_after(stop, day, seconds, limit):
+            trip = int(np.searchsorted(self.trip_offsets, row, side="right") - 1)
+            result.append({
+                "trip_id": str(self.trip_id[trip]),
+                "route": str(self.route_name[self.trip_route[trip]]),
+                "headsign": str(self.trip_headsign[trip]),
+                "departure": midnight + timedelta(seconds=departure),
+            })
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a GTFS feed into a memory-mappable store")
+    parser.add_argument("feed", type=Path, help="GTFS directory or .zip")
+    parser.add_argument("store", type=Path, help="output directory")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    compile_feed(args.feed, args.store)
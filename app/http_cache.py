@@ -0,0 +1,173 @@
+# http_cache.py
+"""
+http_cache.py
+
+Persistent, size-bounded HTTP response cache used by NetworkManager.
+
+Bodies are stored one file per URL under the cache directory; an index.json
+keeps the validators (ETag / Last-Modified) and the LRU order.  Entries are
+revalidated with If-None-Match / If-Modified-Since, so an unchanged resource
+costs a 304 instead of a full body.  All methods are thread-safe: they are
+called from NetworkManager's worker threads.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger("rts.httpcache")
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: str | None
+    last_modified: str | None
+    size: int
+    stored_at: float
+    body: bytes = b""
+
+    def conditional_headers(self) -> dict:
+        """Headers that turn a GET for this URL into a revalidation."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    def __init__(self, directory, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._index_path = self._dir / "index.json"
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> CacheEntry without body, least recently used first
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._total = 0
+        self._load_index()
+        logger.debug("HttpCache at %s holds %d entries (%d bytes, limit %d)",
+                     self._dir, len(self._entries), self._total, self._max_bytes)
+
+    # ----- Index persistence ----------------------------------------------
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _body_path(self, key: str) -> Path:
+        return self._dir / f"{key}.bin"
+
+    def _load_index(self):
+        if not self._index_path.exists():
+            return
+        try:
+            records = json.loads(self._index_path.read_text())
+        except Exception as e:
+            logger.warning("Discarding unreadable cache index: %s", e)
+            return
+        for rec in records:
+            key = self._key(rec["url"])
+            if not self._body_path(key).exists():
+                continue
+            entry = CacheEntry(rec["url"], rec.get("etag"), rec.get("last_modified"),
+                               rec["size"], rec.get("stored_at", 0.0))
+            self._entries[key] = entry
+            self._total += entry.size
+
+    def _save_index(self):
+        records = [
+            {"url": e.url, "etag": e.etag, "last_modified": e.last_modified,
+             "size": e.size, "stored_at": e.stored_at}
+            for e in self._entries.values()
+        ]
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(records))
+        tmp.replace(self._index_path)
+
+    # ----- Lookup ------------------------------------------------------------
+    def contains(self, url: str) -> bool:
+        with self._lock:
+            return self._key(url) in self._entries
+
+    def get(self, url: str) -> CacheEntry | None:
+        """Return the cached entry (with body) and mark it most recently used."""
+        key = self._key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            try:
+                body = self._body_path(key).read_bytes()
+            except OSError:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return CacheEntry(entry.url, entry.etag, entry.last_modified,
+                              entry.size, entry.stored_at, body)
+
+    # ----- Updates -----------------------------------------------------------
+    def store(self, url: str, body: bytes, headers) -> None:
+        """
+        Cache a 200 response if the server gave us something to revalidate
+        with.  One that cannot be cached evicts the older copy, which no
+        longer matches what the server serves.
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        key = self._key(url)
+        if (not etag and not last_modified) or len(body) > self._max_bytes:
+            with self._lock:
+                self._drop(key)
+            return
+        with self._lock:
+            self._drop(key, persist=False)
+            tmp = self._body_path(key).with_suffix(".part")
+            tmp.write_bytes(body)
+            tmp.replace(self._body_path(key))
+            self._entries[key] = CacheEntry(url, etag, last_modified, len(body), time.time())
+            self._total += len(body)
+            self._evict()
+            self._save_index()
+
+    def revalidated(self, url: str, headers) -> None:
+        """Record a 304: refresh validators the server may have rotated."""
+        key = self._key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.etag = headers.get("ETag", entry.etag)
+            entry.last_modified = headers.get("Last-Modified", entry.last_modified)
+            entry.stored_at = time.time()
+            self._entries.move_to_end(key)
+            self._save_index()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key, persist=False)
+            self._save_index()
+        logger.debug("HttpCache cleared")
+
+    def _drop(self, key: str, persist: bool = True):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total -= entry.size
+        self._body_path(key).unlink(missing_ok=True)
+        if persist:
+            self._save_index()
+
+    def _evict(self):
+        while self._total > self._max_bytes and self._entries:
+            key, entry = next(iter(self._entries.items()))
+            logger.debug("Evicting %s (%d bytes) from HttpCache", entry.url, entry.size)
+            self._drop(key, persist=False)
@@ -0,0 +1,395 @@
+# journey_planner.py
+"""
+journey_planner.py
+
+Round-based (RAPTOR) journey planning over a compiled GtfsStore.
+
+JourneyPlanner groups the store's trips into route patterns: trips that serve
+the same stop sequence, kept in overtaking-free (FIFO) order.  Walking links
+come from the stop coordinates: every pair of stops within WALK_RADIUS_M,
+timed at WALK_SPEED_MS with a DETOUR factor.  A TimeTable is the pattern set
+for one service day.  It includes the previous day's trips that run past
+midnight, shifted by a day, and is built on first use per date.
+
+Round k of RAPTOR finds the best arrivals using k vehicles.  Each pattern
+touched by a stop improved in round k-1 is scanned with array operations
+rather than stop by stop:
+
+    board[i]  first trip catchable at position i      (column compare + sum)
+    trip[j]   best trip boarded before position j      (running minimum)
+    arrive[j] that trip's arrival at j                  (one gather)
+
+Queries (stop ids, naive local datetimes):
+
+    earliest_arrival(origin, destination, depart_at)    Pareto set over transfers
+    latest_departure(origin, destination, arrive_by)    same search on the
+                                                         time-reversed timetable
+    profile(origin, destination, start, end)            rRAPTOR: every departure
+                                                         in the window, latest
+                                                         first, labels kept
+                                                         between runs; one pass
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from gtfs_store import DAY_S, GtfsStore
+
+logger = logging.getLogger("rts.client.planner")
+
+WALK_RADIUS_M = 400.0
+WALK_SPEED_MS = 1.3
+DETOUR = 1.25            # street distance over straight-line distance
+TRANSFER_SLACK_S = 60    # minimum time between alighting and boarding another vehicle
+MAX_TRANSFERS = 4
+INF = np.iinfo(np.int64).max // 4
+
+
+@dataclass
+class Leg:
+    mode: str                 # "ride" or "walk"
+    from_stop: str
+    to_stop: str
+    depart: datetime
+    arrive: datetime
+    trip_id: str = ""
+    route: str = ""
+    headsign: str = ""
+
+
+@dataclass
+class Journey:
+    depart: datetime
+    arrive: datetime
+    transfers: int
+    legs: list[Leg] = field(default_factory=list)
+
+    @property
+    def duration(self) -> timedelta:
+        return self.arrive - self.depart
+
+
+@dataclass
+class Pattern:
+    stops: np.ndarray         # (S,) stop rows
+    trips: np.ndarray         # (T,) trip rows, FIFO order
+    dep: np.ndarray           # (T, S) departure seconds
+    arr: np.ndarray           # (T, S) arrival seconds
+
+
+class TimeTable:
+    """Patterns of one service day plus the stop -> (pattern, position) index."""
+
+    def __init__(self, patterns: list[Pattern], n_stops: int):
+        self.patterns = patterns
+        self.n_stops = n_stops
+        serving = [[] for _ in range(n_stops)]
+        for p, pattern in enumerate(patterns):
+            for position, stop in enumerate(pattern.stops.tolist()):
+                serving[stop].append((p, position))
+        self.serving = serving
+
+    def reversed(self) -> "TimeTable":
+        """
+        The same network with time running backwards: stop order reversed and
+        times negated, so an earliest-arrival search on it answers latest
+        departure.  Reversing the trip order keeps every column ascending.
+        """
+        return TimeTable([Pattern(p.stops[::-1].copy(), p.trips[::-1].copy(),
+                                  -p.arr[::-1, ::-1], -p.dep[::-1, ::-1])
+                          for p in self.patterns], self.n_stops)
+
+
+def _fifo_split(trips: np.ndarray, dep: np.ndarray, arr: np.ndarray):
+    """Split trips sorted by first departure into groups in which no trip overtakes another."""
+    if len(trips) < 2 or (np.all(np.diff(dep, axis=0) >= 0) and np.all(np.diff(arr, axis=0) >= 0)):
+        return [(trips, dep, arr)]
+    groups: list[list[int]] = []
+    for t in range(len(trips)):
+        for group in groups:
+            last = group[-1]
+            if np.all(dep[last] <= dep[t]) and np.all(arr[last] <= arr[t]):
+                group.append(t)
+                break
+        else:
+            groups.append([t])
+    return [(trips[g], dep[g], arr[g]) for g in groups]
+
+
+class _Search:
+    """Labels of one RAPTOR search; kept across runs by profile()."""
+
+    def __init__(self, n_stops: int, rounds: int):
+        shape = (rounds + 1, n_stops)
+        self.label = np.full(shape, INF, dtype=np.int64)       # best arrival, after walking
+        self.ride = np.full(shape, INF, dtype=np.int64)        # best arrival by vehicle
+        self.trip = np.full(shape, -1, dtype=np.int64)         # ride parent: trip row
+        self.board_stop = np.full(shape, -1, dtype=np.int64)   # ride parent: boarding stop
+        self.board_time = np.zeros(shape, dtype=np.int64)
+        self.walk_from = np.full(shape, -1, dtype=np.int64)    # walk parent: source stop
+
+    def bound(self, k: int, stops):
+        """
+        Arrival a round-k label at stops must beat: the best with at most k rides,
+        from this run or, in profile(), from a run that left later.
+        """
+        return self.label[:k + 1, stops].min(axis=0)
+
+
+class JourneyPlanner:
+    def __init__(self, store: GtfsStore, walk_radius_m: float = WALK_RADIUS_M,
+                 max_transfers: int = MAX_TRANSFERS):
+        self.store = store
+        self.max_transfers = max_transfers
+        self._timetables: dict[int, tuple[TimeTable, TimeTable]] = {}
+        self._build_patterns()
+        self._build_footpaths(walk_radius_m)
+
+    # ----- Preprocessing -----------------------------------------------------
+    def _build_patterns(self):
+        store = self.store
+        offsets = np.asarray(store.trip_offsets)
+        stops = np.asarray(store.st_stop)
+        groups: dict[bytes, list[int]] = {}
+        for trip in range(len(offsets) - 1):
+            lo, hi = offsets[trip], offsets[trip + 1]
+            if hi - lo >= 2:
+                groups.setdefault(stops[lo:hi].tobytes(), []).append(trip)
+        self._pattern_stops, self._pattern_trips = [], []
+        for trips in groups.values():
+            trips = np.array(trips)
+            self._pattern_stops.append(stops[offsets[trips[0]]:offsets[trips[0] + 1]].astype(np.int64))
+            self._pattern_trips.append(trips)
+        # A trip still running after midnight also serves the next service day
+        self._overnight = np.zeros(len(offsets) - 1, dtype=bool)
+        last = offsets[1:] - 1
+        has_times = offsets[1:] > offsets[:-1]
+        self._overnight[has_times] = np.asarray(store.st_arrival)[last[has_times]] >= DAY_S
+        logger.debug("%d trips in %d patterns", len(offsets) - 1, len(groups))
+
+    def _build_footpaths(self, radius_m: float):
+        from stop_index import StopIndex
+
+        lonlat = np.asarray(self.store.stop_lonlat)
+        queries, stops, metres = StopIndex(lonlat).within_batch(lonlat, radius_m)
+        keep = queries != stops
+        queries, stops = queries[keep], stops[keep]
+        seconds = np.ceil(metres[keep] * DETOUR / WALK_SPEED_MS).astype(np.int64)
+        order = np.argsort(queries, kind="stable")
+        self._walk_to = stops[order]
+        self._walk_s = seconds[order]
+        self._walk_offsets = np.searchsorted(queries[order], np.arange(len(lonlat) + 1))
+
+    def _times(self, trips: np.ndarray, column) -> np.ndarray:
+        offsets = np.asarray(self.store.trip_offsets)
+        width = int(offsets[trips[0] + 1] - offsets[trips[0]])
+        return np.asarray(column)[offsets[trips][:, None] + np.arange(width)].astype(np.int64)
+
+    def timetable(self, day: int, reverse: bool = False) -> TimeTable:
+        """Patterns running on a service day (offset from the store's start_date)."""
+        if day not in self._timetables:
+            store = self.store
+            today = store.active(np.asarray(store.trip_service), day)
+            yesterday = store.active(np.asarray(store.trip_service), day - 1) & self._overnight
+            patterns = []
+            for stops, trips in zip(self._pattern_stops, self._pattern_trips):
+                parts = []
+                for selected, shift in ((trips[today[trips]], 0), (trips[yesterday[trips]], DAY_S)):
+                    if len(selected):
+                        parts.append((selected, self._times(selected, store.st_departure) - shift,
+                                      self._times(selected, store.st_arrival) - shift))
+                if not parts:
+                    continue
+                selected = np.concatenate([p[0] for p in parts])
+                dep = np.concatenate([p[1] for p in parts])
+                arr = np.concatenate([p[2] for p in parts])
+                order = np.lexsort(dep.T[::-1])
+                for group in _fifo_split(selected[order], dep[order], arr[order]):
+                    patterns.append(Pattern(stops, *group))
+            forward = TimeTable(patterns, len(store.stop_id))
+            self._timetables[day] = (forward, forward.reversed())
+            logger.debug("Timetable for day %d: %d patterns", day, len(patterns))
+        return self._timetables[day][1 if reverse else 0]
+
+    # ----- RAPTOR --------------------------------------------------------------
+    def _walk(self, search: _Search, k: int, sources: np.ndarray, target: int) -> np.ndarray:
+        """Relax footpaths from stops reached by vehicle in round k; returns stops improved by walking."""
+        if not len(sources):
+            return sources
+        counts = self._walk_offsets[sources + 1] - self._walk_offsets[sources]
+        starts = np.repeat(self._walk_offsets[sources], counts)
+        index = starts + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        origin = np.repeat(sources, counts)
+        to = self._walk_to[index]
+        arrival = search.ride[k, origin] + self._walk_s[index]
+        # Keep the fastest walk into each stop, then apply the ones that improve it
+        order = np.lexsort((arrival, to))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = to[order][1:] != to[order][:-1]
+        to, arrival, origin = to[order][first], arrival[order][first], origin[order][first]
+        better = arrival < np.minimum(search.bound(k, to), search.bound(k, target))
+        to, arrival, origin = to[better], arrival[better], origin[better]
+        search.label[k, to] = arrival
+        search.walk_from[k, to] = origin
+        return to
+
+    def _run(self, table: TimeTable, search: _Search, origin: int, target: int, depart: int):
+        rounds = self.max_transfers + 1
+        search.label[0, origin] = search.ride[0, origin] = min(search.label[0, origin], depart)
+        search.walk_from[0, origin] = -1
+        marked = np.concatenate(([origin], self._walk(search, 0, np.array([origin]), target)))
+        for k in range(1, rounds + 1):
+            if not len(marked):
+                break
+            first_position: dict[int, int] = {}
+            for stop in marked.tolist():
+                for p, position in table.serving[stop]:
+                    if first_position.get(p, INF) > position:
+                        first_position[p] = position
+            slack = TRANSFER_SLACK_S if k > 1 else 0
+            prev = search.label[k - 1]
+            improved = []
+            for p, start in first_position.items():
+                pattern = table.patterns[p]
+                stops = pattern.stops[start:]
+                ready = prev[stops]
+                ready = np.where(ready < INF, ready + slack, INF)
+                board = (pattern.dep[:, start:] < ready).sum(axis=0)
+                # Trip in use at position j: the earliest one boardable at any position before j
+                running = np.minimum.accumulate(board)[:-1]
+                boarded_at = np.maximum.accumulate(
+                    np.where(board == np.minimum.accumulate(board), np.arange(len(board)), 0))[:-1]
+                ok = running < len(pattern.trips)
+                if not ok.any():
+                    continue
+                positions = np.flatnonzero(ok) + 1
+                trips = running[ok]
+                arrival = pattern.arr[trips, start + positions]
+                at = stops[positions]
+                better = arrival < np.minimum(search.bound(k, at), search.bound(k, target))
+                if not better.any():
+                    continue
+                at, arrival, trips = at[better], arrival[better], trips[better]
+                boards = boarded_at[ok][better]
+                search.label[k, at] = search.ride[k, at] = arrival
+                search.trip[k, at] = pattern.trips[trips]
+                search.board_stop[k, at] = stops[boards]
+                search.board_time[k, at] = pattern.dep[trips, start + boards]
+                search.walk_from[k, at] = -1
+                improved.append(at)
+            rode = np.unique(np.concatenate(improved)) if improved else np.empty(0, dtype=np.int64)
+            walked = self._walk(search, k, rode, target)
+            marked = np.unique(np.concatenate((rode, walked)))
+
+    # ----- Journeys ------------------------------------------------------------
+    def _legs(self, search: _Search, k: int, stop: int, midnight: datetime, sign: int) -> list[Leg] | None:
+        store = self.store
+        legs = []
+        while True:
+            source = int(search.walk_from[k, stop])
+            if source >= 0:
+                legs.append(self._leg("walk", source, stop, search.ride[k, source],
+                                      search.label[k, stop], midnight, sign))
+                stop = source
+            if k == 0:
+                break
+            trip = int(search.trip[k, stop])
+            if trip < 0:
+                return None
+            board = int(search.board_stop[k, stop])
+            leg = self._leg("ride", board, stop, search.board_time[k, stop],
+                            search.ride[k, stop], midnight, sign)
+            leg.trip_id = str(store.trip_id[trip])
+            leg.route = str(store.route_name[store.trip_route[trip]])
+            leg.headsign = str(store.trip_headsign[trip])
+            legs.append(leg)
+            stop, k = board, k - 1
+        legs.reverse()
+        if sign < 0:
+            legs = [Leg(l.mode, l.to_stop, l.from_stop, l.arrive, l.depart, l.trip_id, l.route, l.headsign)
+                    for l in reversed(legs)]
+        return legs
+
+    def _leg(self, mode, from_row, to_row, depart, arrive, midnight, sign) -> Leg:
+        ids = self.store.stop_id
+        return Leg(mode, str(ids[from_row]), str(ids[to_row]),
+                   midnight + timedelta(seconds=sign * int(depart)),
+                   midnight + timedelta(seconds=sign * int(arrive)))
+
+    def _journeys(self, search, origin, target, depart, midnight, sign) -> list[Journey]:
+        """Pareto set at the target: one journey per round that beats every round with fewer rides."""
+        journeys, best = [], INF
+        for k in range(search.label.shape[0]):
+            arrival = int(search.label[k, target])
+            if arrival >= best:
+                continue
+            legs = self._legs(search, k, target, midnight, sign)
+            if legs is None:
+                continue
+            best = arrival
+            if not legs:
+                continue  # origin and destination are the same stop
+            rides = sum(1 for leg in legs if leg.mode == "ride")
+            journeys.append(Journey(legs[0].depart, legs[-1].arrive, max(0, rides - 1), legs))
+        return journeys
+
+    def _prepare(self, origin_id: str, destination_id: str, when: datetime):
+        origin, target = self.store.stop_index(origin_id), self.store.stop_index(destination_id)
+        day = (when.date() - self.store.start_date).days
+        midnight = datetime.combine(when.date(), datetime.min.time(), tzinfo=when.tzinfo)
+        seconds = int((when - midnight).total_seconds())
+        return origin, target, day, midnight, seconds
+
+    def earliest_arrival(self, origin_id: str, destination_id: str, depart_at: datetime) -> list[Journey]:
+        """Fastest journeys leaving at or after depart_at, one per number of transfers that helps."""
+        origin, target, day, midnight, seconds = self._prepare(origin_id, destination_id, depart_at)
+        search = _Search(len(self.store.stop_id), self.max_transfers + 1)
+        self._run(self.timetable(day), search, origin, target, seconds)
+        return self._journeys(search, origin, target, seconds, midnight, 1)
+
+    def latest_departure(self, origin_id: str, destination_id: str, arrive_by: datetime) -> list[Journey]:
+        """Latest-leaving journeys that still arrive by arrive_by."""
+        origin, target, day, midnight, seconds = self._prepare(origin_id, destination_id, arrive_by)
+        search = _Search(len(self.store.stop_id), self.max_transfers + 1)
+        self._run(self.timetable(day, reverse=True), search, target, origin, -seconds)
+        return self._journeys(search, target, origin, -seconds, midnight, -1)
+
+    def profile(self, origin_id: str, destination_id: str, start: datetime, end: datetime) -> list[Journey]:
+        """
+        Every Pareto-optimal journey (later departure, earlier arrival, fewer
+        transfers) leaving between start and end, earliest departure first.
+        """
+        origin, target, day, midnight, first = self._prepare(origin_id, destination_id, start)
+        last = first + int((end - start).total_seconds())
+        table = self.timetable(day)
+        # Departure times worth trying: boardings at the origin or at stops within walking distance
+        walk = {origin: 0}
+        lo, hi = self._walk_offsets[origin], self._walk_offsets[origin + 1]
+        walk.update(zip(self._walk_to[lo:hi].tolist(), self._walk_s[lo:hi].tolist()))
+        departures = set()
+        for stop, walk_s in walk.items():
+            for p, position in table.serving[stop]:
+                times = table.patterns[p].dep[:, position] - walk_s
+                departures.update(times[(times >= first) & (times <= last)].tolist())
+
+        search = _Search(len(self.store.stop_id), self.max_transfers + 1)
+        found: list[Journey] = []
+        arrivals = [INF] * (self.max_transfers + 2)
+        for depart in sorted(departures, reverse=True):
+            self._run(table, search, origin, target, depart)
+            for journey in self._journeys(search, origin, target, depart, midnight, 1):
+                arrival = int((journey.arrive - midnight).total_seconds())
+                rides = journey.transfers + 1
+                if arrival < arrivals[rides]:
+                    arrivals[rides] = arrival
+                    journey.depart = midnight + timedelta(seconds=depart)
+                    found.append(journey)
+        # Drop journeys dominated by one leaving later, arriving no later, with no more transfers
+        found.sort(key=lambda j: (j.depart, j.arrive, j.transfers))
+        return [j for j in found
+                if not any(o is not j and o.depart >= j.depart and o.arrive <= j.arrive
+                           and o.transfers <= j.transfers and
+                           (o.depart, o.arrive, o.transfers) != (j.depart, j.arrive, j.transfers)
+                           for o in found)]
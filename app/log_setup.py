@@ -0,0 +1,157 @@
+# log_setup.py
+"""
+log_setup.py
+
+Logging for the client, set up once by CLIConfig.
+
+Threads that log (the GUI thread above all) never touch the console: the
+only root handler is a queue handler that drops the record on a SimpleQueue,
+and a QueueListener thread formats and writes it.  Records are enqueued
+unformatted, so the "%s" arguments are only turned into text on the listener
+thread, and only for records that survive the filters.  Arguments must not be
+mutated after the call; every call site in the client passes immutable
+values or fresh objects.
+
+Two filters run on the calling thread before a record is queued, both cheap
+and both exempting WARNING and above unless told otherwise:
+
+  RateLimitFilter   token bucket per logger; the next record let through
+                    after a burst says how many were suppressed
+  SampleFilter      keeps 1 in N records from the named loggers, for hot
+                    paths whose every call is not worth a line
+
+The default level is INFO when running from source and WARNING in a frozen
+(packaged) build; --log-level or LOG_LEVEL override it.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+# Per-logger budget for records below WARNING: sustained rate and burst
+RATE_PER_SECOND = 50.0
+RATE_BURST = 200
+# Hot-path loggers whose DEBUG output is sampled rather than kept in full
+SAMPLED = {"rts.network": 10, "rts.client.walletstore": 10, "rts.client.ticketmodel": 10}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def default_level() -> str:
+    """WARNING for a frozen (packaged) build, INFO when run from source."""
+    return "WARNING" if getattr(sys, "frozen", False) else "INFO"
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per logger name for records below max_level."""
+
+    def __init__(self, per_second: float = RATE_PER_SECOND, burst: int = RATE_BURST,
+                 max_level: int = logging.WARNING):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self.max_level = max_level
+        self._buckets: dict[str, list[float]] = {}   # name -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.max_level:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"[{int(suppressed)} earlier messages suppressed] {record.msg}"
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Keep every Nth record below max_level from each listed logger (and its children)."""
+
+    def __init__(self, rates: dict[str, int], max_level: int = logging.INFO):
+        super().__init__()
+        self.rates = rates
+        self.max_level = max_level
+        self._counts: dict[str, int] = {}
+
+    def _rate(self, name: str) -> int:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.max_level:
+            return True
+        rate = self._rate(record.name)
+        if rate <= 1:
+            return True
+        # A lost increment between threads only shifts which record is kept
+        count = self._counts.get(record.name, 0)
+        self._counts[record.name] = count + 1
+        return count % rate == 0
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener.  The stock handler
+    formats msg % args on the calling thread (prepare), which is exactly the
+    work the queue is meant to move off it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure(level: str | None = None, stream=None, rate: float = RATE_PER_SECOND,
+              burst: int = RATE_BURST, sampled: dict[str, int] | None = None) -> logging.Logger:
+    """
+    Replace the root logger's handlers with the queue pipeline and start the
+    listener thread (stopped, and the queue drained, at exit).  Safe to call
+    again: the previous listener is stopped first.
+    """
+    global _listener
+    shutdown()
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(FORMAT))
+    handler = LazyQueueHandler(records)
+    handler.addFilter(SampleFilter(SAMPLED if sampled is None else sampled))
+    handler.addFilter(RateLimitFilter(rate, burst))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level or default_level())
+    # urllib3 logs every connection at DEBUG; the client's own GET lines cover it
+    logging.getLogger("urllib3").setLevel(max(root.level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return root
+
+
+def shutdown():
+    """Flush everything queued so far and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown)
@@ -1,25 +1,35 @@
 # main.py
 # Main entry point for the RapidRide QML application
 # Exposes Python backend and page controller to QML
+#
+# Start-up is kept to what the first frame needs: QtPdf, segno, requests and
+# cryptography are imported on first use, and the wallet loads in the
+# background once the first page is on screen.
+
+import time
+_START = time.perf_counter()
 
 import os
-import io
-import base64
-import segno
 import sys
 import argparse
 import logging
+import log_setup
+import metrics
+from collections import OrderedDict
 from network import NetworkManager
 from PySide6.QtWidgets import QApplication, QMainWindow
-from PySide6.QtPdf import QPdfDocument
-from PySide6.QtPdfWidgets import QPdfView
-from PySide6.QtQml import QQmlApplicationEngine
-from PySide6.QtCore import QObject, Slot, QUrl, Signal, Property, QCoreApplication
+from PySide6.QtQml import QQmlApplicationEngine, QQmlPropertyMap
+from PySide6.QtCore import QObject, Slot, QUrl, Signal, Property, QCoreApplication, QStandardPaths
 from PySide6.QtGui import QDesktopServices, QGuiApplication, QPalette, QColor
-from PySide6.QtQuick import QQuickWindow, QSGRendererInterface
+from PySide6.QtQuick import QQuickItem, QQuickWindow, QSGRendererInterface
 QQuickWindow.setGraphicsApi(QSGRendererInterface.GraphicsApi.OpenGL)
 from theme_manager import ThemeManager
 from wallet_store import WalletStore
+from qr_provider import QrImageProvider, PROVIDER_ID
+from route_tiles import RouteMaps, PROVIDER_ID as TILES_PROVIDER_ID
+from ticket_model import TicketListModel
+from startup_profile import StartupProfiler
+from page_cache import PageCache, qml_base_url
 
 
 class CLIConfig:
@@ -30,40 +40,105 @@ class CLIConfig:
         self.parser = argparse.ArgumentParser(description="RapidRide QML Client")
         self.parser.add_argument(
             "--log-level", "-l",
-            default=os.getenv("LOG_LEVEL", "DEBUG"),
+            default=os.getenv("LOG_LEVEL", log_setup.default_level()),
             choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-            help="Set the logging level"
+            help="Set the logging level (default: INFO from source, WARNING in packaged builds)"
+        )
+        self.parser.add_argument(
+            "--startup-profile",
+            action="store_true",
+            help="Print a per-phase start-up timing report once the wallet has loaded"
+        )
+        self.parser.add_argument(
+            "--trace",
+            action="store_true",
+            default=os.getenv("RTS_TRACE", "") not in ("", "0"),
+            help="Record operation latencies from start-up (see the diagnostics panel in Settings)"
+        )
+        self.parser.add_argument(
+            "--no-bundle",
+            action="store_true",
+            help="Load QML from the source files even when a qml.rcc bundle is present"
         )
         self.args = self.parser.parse_args()
         self.configure_logging()
 
     def configure_logging(self):
-        level = getattr(logging, self.args.log_level, logging.DEBUG)
-        logging.basicConfig(
-            level=level,
-            format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
-        )
+        # Records are written by a background thread; see log_setup
+        log_setup.configure(self.args.log_level)
         self.logger = logging.getLogger("rts.client.main")
         self.logger.debug("Starting QML client with log level=%s", self.args.log_level)
 
 
 class PdfViewer(QMainWindow):
-    def __init__(self, pdf_path):
+    """
+    Single, reusable route-map window.  Documents are owned by AppBackend's
+    cache; each one gets its own QPdfView in a stack, so switching back to a
+    cached map only raises its page instead of re-attaching the document
+    (QPdfView.setDocument re-lays out every page).  QPdfView renders on its
+    own worker threads.
+    """
+    def __init__(self):
         super().__init__()
         logger = logging.getLogger("rts.client.main")
-        logger.debug(f"Initializing PdfViewer for {pdf_path}")
+        logger.debug("Initializing PdfViewer")
         self.setWindowTitle("PDF Viewer")
+        from PySide6.QtWidgets import QStackedWidget
 
-        self.pdf_document = QPdfDocument(self)
-        self.pdf_document.load(pdf_path)
+        self._stack = QStackedWidget(self)
+        self._views = {}  # QPdfDocument -> QPdfView
+        self.setCentralWidget(self._stack)
+        self.resize(800, 600)
 
-        self.pdf_view = QPdfView(self)
-        self.pdf_view.setDocument(self.pdf_document)
+    def show_document(self, document, title: str):
+        view = self._views.get(document)
+        if view is None:
+            from PySide6.QtPdfWidgets import QPdfView
+
+            view = QPdfView(self._stack)
+            view.setDocument(document)
+            self._stack.addWidget(view)
+            self._views[document] = view
+        self._stack.setCurrentWidget(view)
+        self.setWindowTitle(title)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def release(self, document):
+        """Drop the view (and its rendered pages) of a document leaving the cache."""
+        view = self._views.pop(document, None)
+        if view is not None:
+            self._stack.removeWidget(view)
+            view.deleteLater()
+
+# Used for any key a theme in colors.json leaves out
+THEME_DEFAULTS = {
+    "background": "#000000", "text": "#ffffff", "accent": "#f5721b", "border": "#f5721b",
+    "buttonBackground": "#1e1e1e", "buttonText": "#ffffff", "toolTipBase": "#2c2c2c",
+    "toolTipText": "#ffffff", "highlight": "#f5721b", "highlightedText": "#000000",
+    "placeholder": "#888888", "link": "#268bd2",
+}
+# Application palette role -> theme key
+PALETTE_ROLES = [
+    (QPalette.Window, "background"), (QPalette.WindowText, "text"),
+    (QPalette.Base, "background"), (QPalette.AlternateBase, "background"),
+    (QPalette.ToolTipBase, "toolTipBase"), (QPalette.ToolTipText, "toolTipText"),
+    (QPalette.Text, "text"), (QPalette.Button, "buttonBackground"),
+    (QPalette.ButtonText, "buttonText"), (QPalette.Highlight, "highlight"),
+    (QPalette.HighlightedText, "highlightedText"), (QPalette.PlaceholderText, "placeholder"),
+    (QPalette.Link, "link"),
+]
 
-        self.setCentralWidget(self.pdf_view)
-        self.resize(800, 600)
 
 class ThemeController(QObject):
+    """
+    Every theme in colors.json is turned into a QColor table and a QPalette
+    once, at start-up.  QML reads colors from one QQmlPropertyMap (the "Theme"
+    context property, also self.colors), where each key notifies on its own:
+    setTheme writes only the keys whose color differs from the previous
+    theme's, so bindings to unchanged colors are not re-evaluated.
+    """
     themeChanged = Signal()
 
     def __init__(self):
@@ -71,19 +146,48 @@ class ThemeController(QObject):
         self.logger = logging.getLogger("rts.client.main")
         self.logger.debug("ThemeController init")
         self._theme_manager = ThemeManager()
+        self._tables = {name: {key: QColor(data.get(key, default)) for key, default in THEME_DEFAULTS.items()}
+                        for name, data in self._theme_manager.themes().items()}
+        self._default_table = {key: QColor(value) for key, value in THEME_DEFAULTS.items()}
+        self._palettes = {name: self._build_palette(table) for name, table in self._tables.items()}
         self._current_theme = self._theme_manager.get_theme()
-        self._theme_data = self._theme_manager.get_theme_data()
+        self._colors = QQmlPropertyMap(self)
+        for key, color in self._table(self._current_theme).items():
+            self._colors.insert(key, color)
+
+    def _table(self, name) -> dict:
+        return self._tables.get(name, self._default_table)
+
+    @staticmethod
+    def _build_palette(table) -> QPalette:
+        palette = QPalette()
+        for role, key in PALETTE_ROLES:
+            palette.setColor(role, table[key])
+        palette.setColor(QPalette.BrightText, QColor("#ff0000"))
+        return palette
 
     @Slot(str)
     def setTheme(self, name):
+        if name == self._current_theme:
+            return
+        if name not in self._tables:
+            self.logger.warning("Unknown theme %s", name)
+            return
         self.logger.debug("Setting theme to %s", name)
         self._theme_manager.set_theme(name)
+        previous = self._table(self._current_theme)
         self._current_theme = name
-        self._theme_data = self._theme_manager.get_theme_data()
+        for key, color in self._tables[name].items():
+            if previous.get(key) != color:
+                self._colors.insert(key, color)
         self.applyPalette(name)
         self.themeChanged.emit()
 
-    @Property(str, notify=themeChanged)
+    @Property(QObject, constant=True)
+    def colors(self):
+        return self._colors
+
+    @Property(list, constant=True)
     def available_themes(self):
         return self._theme_manager.available_themes()
 
@@ -91,105 +195,129 @@ class ThemeController(QObject):
     def currentTheme(self):
         return self._current_theme
 
-    @Property(str, notify=themeChanged)
-    def background(self):
-        return self._theme_data.get("background", "#000000")
-
-    @Property(str, notify=themeChanged)
-    def text(self):
-        return self._theme_data.get("text", "#ffffff")
-
-    @Property(str, notify=themeChanged)
-    def accent(self):
-        return self._theme_data.get("accent", "#f5721b")
-
-    @Property(str, notify=themeChanged)
-    def border(self):
-        return self._theme_data.get("border", "#f5721b")
-
-    @Property(str, notify=themeChanged)
-    def buttonBackground(self):
-        return self._theme_data.get("buttonBackground", "#1e1e1e")
-
-    @Property(str, notify=themeChanged)
-    def buttonText(self):
-        return self._theme_data.get("buttonText", "#ffffff")
-
-    @Property(str, notify=themeChanged)
-    def toolTipBase(self):
-        return self._theme_data.get("toolTipBase", "#2c2c2c")
-
-    @Property(str, notify=themeChanged)
-    def toolTipText(self):
-        return self._theme_data.get("toolTipText", "#ffffff")
-
-    @Property(str, notify=themeChanged)
-    def highlight(self):
-        return self._theme_data.get("highlight", "#f5721b")
-
-    @Property(str, notify=themeChanged)
-    def highlightedText(self):
-        return self._theme_data.get("highlightedText", "#000000")
-
-    @Property(str, notify=themeChanged)
-    def placeholder(self):
-        return self._theme_data.get("placeholder", "#888888")
-
-    @Property(str, notify=themeChanged)
-    def link(self):
-        return self._theme_data.get("link", "#268bd2")
-
     def applyPalette(self, theme):
-        self.logger.debug(f"Applying palette for theme {theme}")
-        palette = QPalette()
-        colors = self._theme_data
-
-        palette.setColor(QPalette.Window, QColor(colors.get("background", "#000000")))
-        palette.setColor(QPalette.WindowText, QColor(colors.get("text", "#ffffff")))
-        palette.setColor(QPalette.Base, QColor(colors.get("background", "#000000")))
-        palette.setColor(QPalette.AlternateBase, QColor(colors.get("background", "#000000")))
-        palette.setColor(QPalette.ToolTipBase, QColor(colors.get("toolTipBase", "#2c2c2c")))
-        palette.setColor(QPalette.ToolTipText, QColor(colors.get("toolTipText", "#ffffff")))
-        palette.setColor(QPalette.Text, QColor(colors.get("text", "#ffffff")))
-        palette.setColor(QPalette.Button, QColor(colors.get("buttonBackground", "#1e1e1e")))
-        palette.setColor(QPalette.ButtonText, QColor(colors.get("buttonText", "#ffffff")))
-        palette.setColor(QPalette.BrightText, QColor("#ff0000"))
-        palette.setColor(QPalette.Highlight, QColor(colors.get("highlight", "#f5721b")))
-        palette.setColor(QPalette.HighlightedText, QColor(colors.get("highlightedText", "#000000")))
-        palette.setColor(QPalette.PlaceholderText, QColor(colors.get("placeholder", "#888888")))
-        palette.setColor(QPalette.Link, QColor(colors.get("link", "#268bd2")))
-
+        self.logger.debug("Applying palette for theme %s", theme)
+        palette = self._palettes.get(theme)
+        if palette is None:
+            palette = self._build_palette(self._default_table)
         QGuiApplication.setPalette(palette)
 
 
 class Controller(QObject):
-    """Handles Navigation between QML pages using a Loader"""
-    def __init__(self, loader):
+    """Handles navigation between QML pages, kept alive by a PageCache"""
+    pageShown = Signal(str)
+
+    def __init__(self, root, pages: PageCache):
         super().__init__()
-        self.loader = loader
+        self.root = root
+        self.pages = pages
         self.logger = logging.getLogger("rts.client.main")
+        pages.pageShown.connect(self.pageShown)
 
     @Slot(str)
     def loadPage(self, page):
         self.logger.debug("Loading page: %s", page)
-        self.loader.setProperty("source", page)
+        # Synchronous: a page not yet alive is compiled and created before this returns
+        with metrics.span(f"page.{page}"):
+            if self.pages.show(page):
+                self.root.setProperty("currentPage", page)
+
+
+class Diagnostics(QObject):
+    """
+    Backs the hidden diagnostics panel in settings.qml: turns tracing on and
+    off, lists per-operation latency quantiles and exports the histograms
+    (see metrics.py) to AppDataLocation/diagnostics.
+    """
+    enabledChanged = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger("rts.client.main")
+
+    def _get_enabled(self) -> bool:
+        return metrics.enabled()
+
+    def _set_enabled(self, on: bool):
+        if on != metrics.enabled():
+            metrics.set_enabled(on)
+            self.logger.info("Tracing %s", "enabled" if on else "disabled")
+            self.enabledChanged.emit()
+
+    enabled = Property(bool, _get_enabled, _set_enabled, notify=enabledChanged)
+
+    @Slot(result=list)
+    def summary(self) -> list:
+        """One row per operation: op, count, errors and p50/p95/p99 in milliseconds."""
+        return [{"op": d["op"], "count": d["count"], "errors": d["errors"],
+                 "p50": d["p50"] * 1000, "p95": d["p95"] * 1000, "p99": d["p99"] * 1000}
+                for d in metrics.summary()]
+
+    @Slot()
+    def reset(self):
+        metrics.reset()
+
+    @Slot(str, result=str)
+    def exportTo(self, fmt: str) -> str:
+        """Write the histograms as "prom" or "jsonl"; returns the file path, or "" on failure."""
+        directory = os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation),
+                                 "diagnostics")
+        path = os.path.join(directory, time.strftime(f"metrics-%Y%m%d-%H%M%S.{fmt}"))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            metrics.export(path, fmt)
+        except (OSError, ValueError) as e:
+            self.logger.error("Metrics export failed: %s", e)
+            return ""
+        self.logger.info("Exported metrics to %s", path)
+        return path
 
 class AppBackend(QObject):
     """Exposes Python-side functionality like viewing PDFs, ticket management"""
 
+    PDF_CACHE_SIZE = 3  # parsed route maps kept in memory
+
     def __init__(self):
         super().__init__()
-        self._windows = []
+        self._viewer = None
+        self._documents = OrderedDict()  # route name -> QPdfDocument, least recent first
         self.logger = logging.getLogger("rts.client.main")
 
+    def _route_document(self, fname):
+        """Return the parsed map for a route from the LRU, loading it on a miss."""
+        document = self._documents.get(fname)
+        if document is not None:
+            self._documents.move_to_end(fname)
+            return document
+        from PySide6.QtPdf import QPdfDocument
+
+        pdf_path = f"assets/routes/{fname}-map2025.pdf"
+        document = QPdfDocument(self)
+        error = document.load(pdf_path)
+        if error != QPdfDocument.Error.None_:
+            self.logger.error("Failed to load %s: %s", pdf_path, error)
+            document.deleteLater()
+            return None
+        self._documents[fname] = document
+        while len(self._documents) > self.PDF_CACHE_SIZE:
+            evicted_name, evicted = self._documents.popitem(last=False)
+            self.logger.debug("Evicting route map %s from cache", evicted_name)
+            if self._viewer is not None:
+                self._viewer.release(evicted)
+            evicted.close()
+            evicted.deleteLater()
+        return document
+
     @Slot(str)
     def open_pdf_viewer(self, fname):
-        """Opens the requested PDF in an external viewer"""
+        """Opens the requested PDF in the shared viewer window"""
         self.logger.debug("open_pdf_viewer called with %s", fname)
-        pdf_path = f"assets/routes/{fname}-map2025.pdf"
-        viewer = PdfViewer(pdf_path)
-        viewer.show()
-        self._windows.append(viewer)
+        document = self._route_document(fname)
+        if document is None:
+            return
+        if self._viewer is None:
+            self._viewer = PdfViewer()
+        self._viewer.show_document(document, f"{fname.capitalize()} Route")
 
     @Slot(str)
     def purchase_ticket(self, ticket_type):
@@ -199,11 +327,12 @@ class AppBackend(QObject):
 
 class QrGenerator(QObject):
     """Generates QR Codes"""
-    qrGenerated = Signal(str)  # Emits a full data-URI
+    qrGenerated = Signal(str)  # Emits an image://qr/... source for an Image item
 
-    def __init__(self):
+    def __init__(self, provider: QrImageProvider):
         super().__init__()
         self.logger = logging.getLogger("rts.client.main")
+        self._provider = provider
 
     @Slot(str)
     def makeQr(
@@ -211,76 +340,110 @@ class QrGenerator(QObject):
         payload: str
     ):
         """Makes a QR Code"""
-        # Create QR Code
-        self.logger.debug("Initializing QR Code Generation")
-        self.logger.debug("Creating QR Code")
-        qr = segno.make(payload, error='m')
-
-        # Write in into an in-RAM PNG
-        self.logger.debug("Writing QR Code to RAM")
-        buf = io.BytesIO()
-        qr.save(buf, kind='png', scale=4)
-        img_bytes = buf.getvalue()
+        # The provider renders on first request and caches the QImage,
+        # so only this short URL crosses into QML.
+        source = self._provider.register(payload)
+        self.logger.debug("Emitting QR source %s back to QML", source)
+        self.qrGenerated.emit(source)
 
-        # Base64-encode and wrap as data URI
-        self.logger.debug("Encoding QR Code as Base64 URI")
-        b64 = base64.b64encode(img_bytes).decode('ascii')
-        data_uri = f"data:image/png;base64,{b64}"
+    @Slot(str, result=str)
+    def imageSource(self, payload: str) -> str:
+        """The image://qr/... source for payload, returned directly for a binding."""
+        return self._provider.register(payload)
 
-        # Send back to QML
-        self.logger.debug("Emitting Data URI Back to QML")
-        self.qrGenerated.emit(data_uri)
+    @Slot(list)
+    def prefetch(self, tickets: list):
+        """Render the QR codes of wallet or server tickets in the background."""
+        self._provider.prefetch(t["payload"] for t in tickets if t.get("payload"))
 
 
 if __name__ == "__main__":
+    profiler = StartupProfiler(_START)
+    profiler.mark("imports")
     config = CLIConfig()
+    profiler.enabled = config.args.startup_profile
+    metrics.set_enabled(config.args.trace)
     logger = config.logger
     logger.debug("Application startup begin")
 
     QCoreApplication.setOrganizationName("RapidRide")
     QCoreApplication.setApplicationName("RTS Client")
     app = QApplication(sys.argv)
+    profiler.mark("QApplication")
 
     logger.debug("Initializing QQmlApplicationEngine")
     engine = QQmlApplicationEngine()
     theme_controller = ThemeController()
-    qrgen = QrGenerator()
+    qr_provider = QrImageProvider()
+    engine.addImageProvider(PROVIDER_ID, qr_provider)
+    qrgen = QrGenerator(qr_provider)
+    route_maps, tile_provider = RouteMaps.open()
+    engine.addImageProvider(TILES_PROVIDER_ID, tile_provider)
     wallet_store = WalletStore()
+    ticket_model = TicketListModel()
+    wallet_store.walletLoaded.connect(ticket_model.setLocalTickets)
+    wallet_store.walletUpdated.connect(ticket_model.setLocalTickets)
+    wallet_store.walletLoaded.connect(qrgen.prefetch)
+    wallet_store.walletUpdated.connect(qrgen.prefetch)
     theme_controller.applyPalette(theme_controller.currentTheme)
     engine.rootContext().setContextProperty("ThemeController", theme_controller)
     engine.rootContext().setContextProperty("ThemeManager", theme_controller)
-    engine.rootContext().setContextProperty("Theme", theme_controller)
+    engine.rootContext().setContextProperty("Theme", theme_controller.colors)
     engine.rootContext().setContextProperty("ThemeList", theme_controller.available_themes)
     engine.rootContext().setContextProperty("QrGen", qrgen)
     engine.rootContext().setContextProperty("WalletStore", wallet_store)
+    engine.rootContext().setContextProperty("TicketModel", ticket_model)
+    engine.rootContext().setContextProperty("RouteMaps", route_maps)
+    diagnostics = Diagnostics()
+    engine.rootContext().setContextProperty("Diagnostics", diagnostics)
+
+    # Construction is cheap; requests loads on first call.
+    network = NetworkManager(os.getenv("API_URL", "http://127.0.0.1:8000"), qr_images=qr_provider)
+    app.aboutToQuit.connect(network.shutdown)
+    app.aboutToQuit.connect(qr_provider.shutdown)
+    network.ticketsFetched.connect(ticket_model.setServerTickets)
+    network.ticketsFetched.connect(qrgen.prefetch)
+    engine.rootContext().setContextProperty("Network", network)
+    profiler.mark("context objects")
 
-    logger.debug("Loading QML file: main.qml")
-    engine.load("main.qml")
+    qml_base = qml_base_url(not config.args.no_bundle)
+    logger.debug("Loading QML file: main.qml from %s", qml_base.toString())
+    engine.load(qml_base.resolved(QUrl("main.qml")))
     if not engine.rootObjects():
         logger.error("Failed to load main.qml, exiting")
         sys.exit(-1)
+    profiler.mark("engine load (main.qml)")
 
     root = engine.rootObjects()[0]
-    loader = root.findChild(QObject, "pageLoader")
-    if loader is None:
-        logger.error("Loader 'pageLoader' not found, exiting")
+    page_host = root.findChild(QQuickItem, "pageHost")
+    if page_host is None:
+        logger.error("Item 'pageHost' not found, exiting")
         sys.exit(-1)
 
-    logger.debug("Setting up NetworkManager, Controller, AppBackend")
-    network = NetworkManager(os.getenv("API_URL", "http://127.0.0.1:8000"))
+    logger.debug("Setting up Controller, AppBackend")
     backend = AppBackend()
-    controller = Controller(loader)
-    engine.rootContext().setContextProperty("Network", network)
+    controller = Controller(root, PageCache(engine, page_host, qml_base))
     engine.rootContext().setContextProperty("controller", controller)
     engine.rootContext().setContextProperty("backend", backend)
-    engine.rootContext().setContextProperty("Theme", theme_controller)
-    engine.rootContext().setContextProperty("PageLoader", loader)
 
     initial_page = "home.qml" if network.isLoggedIn() else "login.qml"
     logger.debug("Setting initial page: %s", initial_page)
-    engine.rootContext().setContextProperty("Theme", theme_controller)
-    loader.setProperty("source", initial_page)
+    controller.loadPage(initial_page)
+    profiler.mark(f"initial page ({initial_page})")
+
+    # Everything optional waits until the first page is actually on screen
+    def on_wallet_loaded(_tickets):
+        wallet_store.walletLoaded.disconnect(on_wallet_loaded)
+        profiler.mark("wallet load (background)")
+        profiler.print_report()
+
+    def on_first_frame():
+        root.frameSwapped.disconnect(on_first_frame)
+        profiler.mark("first frame")
+        wallet_store.walletLoaded.connect(on_wallet_loaded)
+        wallet_store.loadAsync()
+
+    root.frameSwapped.connect(on_first_frame)
 
     logger.debug("Starting Qt event loop")
     sys.exit(app.exec())
-
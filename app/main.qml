@@ -9,7 +9,7 @@ ApplicationWindow {
     width: 400
     height: 720
     title: qsTr("RTS RapidRide")
-    property string currentPage: "login.qml"
+    property string currentPage: ""   // set by the Controller on every switch
 
     // Shared gradient background
     Rectangle {
@@ -87,7 +87,7 @@ ApplicationWindow {
                 Text {
                     text: "🚪 Logout"; font.pixelSize: 16; color: Theme.accent
                     Layout.alignment: Qt.AlignLeft
-                    MouseArea { anchors.fill: parent; onClicked: { navDrawer.close(); controller.loadPage("login.qml") } }
+                    MouseArea { anchors.fill: parent; onClicked: { navDrawer.close(); Network.logout(); controller.loadPage("login.qml") } }
                 }
             }
         }
@@ -135,16 +135,14 @@ ApplicationWindow {
         }
     }
 
-    // Central loader to switch between screens
-    Loader {
-        id: pageLoader
-        objectName: "pageLoader"
+    // Pages live here; the Controller's PageCache creates, shows and hides them
+    Item {
+        id: pageHost
+        objectName: "pageHost"
         anchors.top: topBar.bottom
         anchors.left: parent.left
         anchors.right: parent.right
         anchors.bottom: parent.bottom
-        source: currentPage
-        onSourceChanged: currentPage = source
     }
 
     onClosing: Qt.quit()
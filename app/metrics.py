@@ -0,0 +1,219 @@
+# metrics.py
+"""
+metrics.py
+
+In-process latency histograms for the client's hot paths, read by the hidden
+diagnostics panel in settings.qml and exported on demand.
+
+Instrumented code wraps an operation in span(name) or decorates it with
+timed(name); each operation name gets one Histogram.  Tracing is off by
+default (main.py --trace or RTS_TRACE=1 turn it on, as does the diagnostics
+panel): a disabled span() hands back a shared no-op context manager and a
+disabled timed() wrapper calls straight through, so instrumentation costs a
+flag check.
+
+Histograms use fixed log-spaced buckets (four per doubling, 1 us to ~130 s),
+so recording is a bisect and an increment under a per-histogram lock, and
+memory does not grow with the number of samples.  Quantiles are interpolated
+within a bucket, accurate to the bucket width (about 19 %).
+
+Names in use:
+  network.<call>   HTTP work of a NetworkManager request, on its worker thread
+  page.<file>      Controller.loadPage: compiling and creating the page
+  wallet.load      WalletStore: reading and verifying the stored tickets
+  qr.render        QR encode of a registered payload (makeQr / imageSource)
+  qr.request       QrImageProvider.requestImage, cache hits included
+
+Export formats:
+  prom    Prometheus text exposition, histogram rts_operation_seconds{op=...}
+  jsonl   one JSON object per operation with count, sum, min, max, quantiles
+"""
+import bisect
+import functools
+import json
+import threading
+import time
+
+BUCKET_START = 1e-6        # seconds
+BUCKETS_PER_DOUBLING = 4
+BUCKET_COUNT = 108         # up to ~130 s; anything slower lands in +Inf
+BOUNDS = [BUCKET_START * 2 ** (i / BUCKETS_PER_DOUBLING) for i in range(BUCKET_COUNT)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+_enabled = False
+_histograms: dict[str, "Histogram"] = {}
+_registry_lock = threading.Lock()
+
+
+class Histogram:
+    """Bucketed latency distribution of one operation; safe to record from any thread."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * (BUCKET_COUNT + 1)   # last one is +Inf
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, error: bool = False):
+        i = bisect.bisect_left(BOUNDS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            self.errors += error
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile in seconds (0.0 with no samples)."""
+        with self._lock:
+            counts, count, low, high = list(self.counts), self.count, self.min, self.max
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = max(BOUNDS[i - 1] if i else 0.0, low)
+                upper = min(BOUNDS[i] if i < BUCKET_COUNT else high, high)
+                value = lower + (upper - lower) * (rank - seen) / n
+                return min(max(value, low), high)
+            seen += n
+        return high
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = {"op": self.name, "count": self.count, "errors": self.errors, "sum": self.sum,
+                    "min": self.min if self.count else 0.0, "max": self.max,
+                    "buckets": list(self.counts)}
+        for q in QUANTILES:
+            data[f"p{round(q * 100)}"] = self.quantile(q)
+        return data
+
+
+# ----- Recording --------------------------------------------------------------
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(on: bool):
+    global _enabled
+    _enabled = bool(on)
+
+
+def histogram(name: str) -> Histogram:
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram(name))
+    return hist
+
+
+def observe(name: str, seconds: float, error: bool = False):
+    """Record one duration for name, if tracing is on."""
+    if _enabled:
+        histogram(name).record(seconds, error)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        histogram(self.name).record(time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """Context manager timing its body as one sample of name; raising counts as an error."""
+    return _Span(name) if _enabled else _NO_SPAN
+
+
+def timed(name: str):
+    """Decorator: every call of the function is a span named name."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ----- Reading and export -------------------------------------------------------
+def summary() -> list[dict]:
+    """Snapshot of every operation with samples, sorted by name."""
+    with _registry_lock:
+        hists = sorted(_histograms.values(), key=lambda h: h.name)
+    return [h.snapshot() for h in hists if h.count]
+
+
+def reset():
+    with _registry_lock:
+        _histograms.clear()
+
+
+def prometheus_text() -> str:
+    lines = ["# HELP rts_operation_seconds Latency of instrumented client operations.",
+             "# TYPE rts_operation_seconds histogram"]
+    errors = []
+    for data in summary():
+        label = data["op"].replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, n in zip(BOUNDS + [None], data["buckets"]):
+            cumulative += n
+            if n or bound is None:
+                le = "+Inf" if bound is None else f"{bound:.6g}"
+                lines.append(f'rts_operation_seconds_bucket{{op="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'rts_operation_seconds_sum{{op="{label}"}} {data["sum"]:.6f}')
+        lines.append(f'rts_operation_seconds_count{{op="{label}"}} {data["count"]}')
+        errors.append(f'rts_operation_errors_total{{op="{label}"}} {data["errors"]}')
+    if errors:
+        lines += ["# HELP rts_operation_errors_total Instrumented operations that raised.",
+                  "# TYPE rts_operation_errors_total counter"] + errors
+    return "\n".join(lines) + "\n"
+
+
+def jsonl_text() -> str:
+    now = time.time()
+    lines = []
+    for data in summary():
+        del data["buckets"]   # bounds are fixed; the quantiles are what a reader wants
+        lines.append(json.dumps(dict(data, ts=now), separators=(",", ":")) + "\n")
+    return "".join(lines)
+
+
+def export(path, fmt: str = "prom"):
+    """Write the current histograms to path as "prom" (Prometheus text) or "jsonl"."""
+    if fmt not in ("prom", "jsonl"):
+        raise ValueError(f"unknown metrics format {fmt!r}")
+    text = prometheus_text() if fmt == "prom" else jsonl_text()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
@@ -0,0 +1,236 @@
+# mint_tickets.py
+# Issuer tool: mint, sign and render tickets in bulk, e.g. prepaid codes for
+# printed sheets or a kiosk's stock.
+#
+# Tickets are minted in chunks, one chunk per worker-process job, so signing
+# and QR rendering use every core.  The parent only writes: results are
+# streamed to disk as chunks finish and at most a few chunks per worker are in
+# flight, so memory stays flat however many tickets are minted.  Output goes
+# into --output:
+#   manifest.csv            ticket_id, ticket_type, issued_at, expires_at, payload
+#   sheets/sheet-00001.png  --layout sheets: printable pages (Letter at 300 dpi)
+#   tickets.zip             --layout archive: one <ticket_id>.png per ticket
+#
+#   python app/mint_tickets.py --key issuer_key.pem --type ten_ride --count 20000
+#   python app/mint_tickets.py --key issuer_key.pem --new-key ...   # create a key first
+#
+# Almost all of the time goes into QR encoding; --mask N uses one fixed mask
+# pattern instead of scoring all eight, roughly tripling throughput at the cost
+# of a less evenly balanced (still standard, still scannable) code.
+#
+# --new-key also writes the matching raw public key (the public_key.pem format
+# WalletStore and the validator read) next to the private key.
+
+import argparse
+import base64
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import ticket_payload
+
+logger = logging.getLogger("rts.build.mint")
+
+SHEET_SIZE = (2550, 3300)   # US Letter at 300 dpi
+SHEET_DPM = 11811           # 300 dpi in dots per metre, so point sizes and printers agree
+SHEET_GRID = (4, 5)         # columns x rows of tickets per sheet
+SHEET_MARGIN = 150
+ARCHIVE_CHUNK = 250
+QR_SCALE = 8
+# Qt's PNG "quality" is the inverse of zlib effort: 80 encodes a sheet over twice
+# as fast as the default for about twice the bytes (~110 KB, still tiny)
+PNG_QUALITY = 80
+
+
+# ----- Worker side -----------------------------------------------------------
+_app = None
+_key = None
+
+
+def _init_worker(private_bytes: bytes):
+    # QPainter text needs a GUI application (fonts) in every process
+    global _app, _key
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtGui import QGuiApplication
+    _app = QGuiApplication.instance() or QGuiApplication([])
+    _key = _load_private_key(private_bytes)
+
+
+def _load_private_key(data: bytes):
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+    if len(data) == 32:
+        return Ed25519PrivateKey.from_private_bytes(data)
+    return load_pem_private_key(data, password=None)
+
+
+def _sign(record: dict, fmt: str) -> str:
+    if fmt == "v2":
+        message = ticket_payload.pack_record(record)
+        return ticket_payload.encode_v2(message, _key.sign(message))
+    message = json.dumps(record, separators=(",", ":")).encode()
+    return base64.b64encode(message + _key.sign(message)).decode()
+
+
+def _png(image) -> bytes:
+    from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG", PNG_QUALITY)
+    return bytes(data)
+
+
+def mint_chunk(count: int, ticket_type: str, issued_at: str, expires_at: str, fmt: str, layout: str,
+               mask: int | None = None):
+    """Mint count tickets; returns (manifest rows, [(file name, PNG bytes)])."""
+    from PySide6.QtCore import QRect, Qt
+    from PySide6.QtGui import QFont, QImage, QPainter
+    from qr_provider import render_qr
+
+    rows, codes = [], []
+    for _ in range(count):
+        record = {"ticket_id": str(uuid.uuid4()), "ticket_type": ticket_type,
+                  "issued_at": issued_at, "expires_at": expires_at}
+        payload = _sign(record, fmt)
+        rows.append((record["ticket_id"], ticket_type, issued_at, expires_at, payload))
+        # Sheets scale the code while painting it, archives store it at print size
+        codes.append(render_qr(payload, scale=QR_SCALE if layout == "archive" else 1, mask=mask))
+    if layout == "archive":
+        return rows, [(f"{row[0]}.png", _png(code)) for row, code in zip(rows, codes)]
+
+    sheet = QImage(SHEET_SIZE[0], SHEET_SIZE[1], QImage.Format_Grayscale8)
+    sheet.fill(Qt.white)
+    sheet.setDotsPerMeterX(SHEET_DPM)
+    sheet.setDotsPerMeterY(SHEET_DPM)
+    cell_w = (SHEET_SIZE[0] - 2 * SHEET_MARGIN) // SHEET_GRID[0]
+    cell_h = (SHEET_SIZE[1] - 2 * SHEET_MARGIN) // SHEET_GRID[1]
+    painter = QPainter(sheet)
+    painter.setFont(QFont("Sans", 6))
+    for i, (row, code) in enumerate(zip(rows, codes)):
+        x = SHEET_MARGIN + i % SHEET_GRID[0] * cell_w
+        y = SHEET_MARGIN + i // SHEET_GRID[0] * cell_h
+        side = min(cell_w, cell_h - 90)
+        painter.drawImage(QRect(x + (cell_w - side) // 2, y, side, side), code)
+        painter.drawText(QRect(x, y + side, cell_w, 90), Qt.AlignHCenter | Qt.AlignTop,
+                         f"{ticket_type}\n{row[0]}")
+    painter.end()
+    return rows, [(None, _png(sheet))]
+
+
+# ----- Mint driver ------------------------------------------------------------
+def mint(private_bytes: bytes, output: Path, ticket_type: str, count: int, fmt: str = "v2",
+         layout: str = "sheets", valid_days: int | None = None, jobs: int | None = None,
+         mask: int | None = None) -> dict:
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    issued_at = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+    expires = ticket_payload.expiry({"ticket_type": ticket_type, "issued_at": issued_at})
+    if valid_days is not None:
+        expires = now + timedelta(days=valid_days)
+    expires_at = expires.strftime("%Y-%m-%dT%H:%M:%SZ") if expires else ""
+
+    output.mkdir(parents=True, exist_ok=True)
+    chunk = SHEET_GRID[0] * SHEET_GRID[1] if layout == "sheets" else ARCHIVE_CHUNK
+    sizes = [min(chunk, count - i) for i in range(0, count, chunk)]
+    jobs = jobs or os.cpu_count() or 1
+    stats = {"tickets": 0, "files": 0, "bytes": 0}
+
+    manifest_file = open(output / "manifest.csv", "w", newline="")
+    manifest = csv.writer(manifest_file)
+    manifest.writerow(["ticket_id", "ticket_type", "issued_at", "expires_at", "payload"])
+    archive = zipfile.ZipFile(output / "tickets.zip", "w", zipfile.ZIP_STORED) if layout == "archive" else None
+    if layout == "sheets":
+        (output / "sheets").mkdir(exist_ok=True)
+
+    context = multiprocessing.get_context("spawn")  # never fork a process that may hold Qt state
+    try:
+        with ProcessPoolExecutor(jobs, mp_context=context, initializer=_init_worker,
+                                 initargs=(private_bytes,)) as pool:
+            queue = iter(sizes)
+            in_flight = set()
+            while True:
+                # Keep every worker busy without letting finished results pile up
+                for size in queue:
+                    in_flight.add(pool.submit(mint_chunk, size, ticket_type, issued_at, expires_at, fmt,
+                                               layout, mask))
+                    if len(in_flight) >= 2 * jobs:
+                        break
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rows, files = future.result()
+                    manifest.writerows(rows)
+                    for name, data in files:
+                        if archive is not None:
+                            archive.writestr(name, data)  # PNGs do not compress further
+                        else:
+                            stats["files"] += 1
+                            (output / "sheets" / f"sheet-{stats['files']:05d}.png").write_bytes(data)
+                        stats["bytes"] += len(data)
+                    stats["tickets"] += len(rows)
+                    logger.debug("%d / %d tickets", stats["tickets"], count)
+    finally:
+        manifest_file.close()
+        if archive is not None:
+            stats["files"] = len(archive.infolist())
+            archive.close()
+    return stats
+
+
+def _new_key(path: Path):
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import (
+        Encoding, NoEncryption, PrivateFormat, PublicFormat)
+
+    key = Ed25519PrivateKey.generate()
+    path.write_bytes(key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()))
+    path.chmod(0o600)
+    public = path.with_name("public_key.pem")
+    public.write_bytes(key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw))
+    logger.info("Wrote new issuer key %s and %s", path, public)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mint signed tickets in bulk")
+    parser.add_argument("--key", "-k", type=Path, required=True, help="Ed25519 private key (PEM or raw 32 bytes)")
+    parser.add_argument("--new-key", action="store_true", help="generate --key (and public_key.pem) first")
+    parser.add_argument("--type", "-t", default="single_use", choices=sorted(ticket_payload.TYPE_CODES))
+    parser.add_argument("--count", "-n", type=int, default=1000)
+    parser.add_argument("--format", choices=["v1", "v2"], default="v2", help="payload format (see ticket_payload)")
+    parser.add_argument("--layout", choices=["sheets", "archive"], default="sheets")
+    parser.add_argument("--valid-days", type=int, default=None,
+                        help="expiry from now (default: the ticket type's own lifetime, if any)")
+    parser.add_argument("--mask", type=int, choices=range(8), default=None,
+                        help="fixed QR mask pattern (default: best of all eight, slower)")
+    parser.add_argument("--output", "-o", type=Path, default=Path("minted"))
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--log-level", "-l", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    if args.new_key:
+        if args.key.exists():
+            sys.exit(f"{args.key} already exists; not overwriting an issuer key")
+        _new_key(args.key)
+    if not args.key.exists():
+        sys.exit(f"No issuer key at {args.key} (use --new-key to create one)")
+    start = time.perf_counter()
+    stats = mint(args.key.read_bytes(), args.output, args.type, args.count, args.format,
+                 args.layout, args.valid_days, args.jobs, args.mask)
+    elapsed = time.perf_counter() - start
+    print(f"Minted {stats['tickets']} {args.type} tickets into {args.output} "
+          f"({stats['files']} {args.layout} files, {stats['bytes'] / 1e6:.1f} MB) in {elapsed:.1f} s "
+          f"= {stats['tickets'] / elapsed:.0f} tickets/s")
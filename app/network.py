@@ -6,16 +6,84 @@ network.py
 QObject-based bridge between QML and the FastAPI backend.
 All HTTP is done here; QML receives results via signals or optional callbacks.
 Includes detailed debug logging and persistent auth token via QSettings.
+
+Requests never run on the GUI thread: each slot captures what it needs, hands
+the blocking work to a small thread pool sharing one keep-alive
+``requests.Session``, and returns immediately.  Results are marshalled back to
+the GUI thread through a queued signal, so the public signals and QJSValue
+callbacks keep firing on the thread QML expects.
+
+GET /wallet and GET /qr/{ticket_id} go through an on-disk HttpCache: a cached
+copy is served straight away while the request revalidates it with the
+server, which normally answers 304.  When the server hands out a wallet
+cursor, later fetches switch to delta sync (see wallet_sync.py).  Both hold
+one account's data and are discarded when a different account signs in.
+
+Work is queued on a RequestScheduler (see request_scheduler.py) at the
+priority of its call (OP_PRIORITY): what the user is waiting on runs before
+wallet syncs.  A GET issued while the same URL is already being fetched is
+coalesced into the fetch in flight, whose signals answer both.  Transient
+failures are retried with jittered exponential backoff.  generateTicket is
+written to an on-disk outbox before it is sent, with an Idempotency-Key; if
+the server cannot be reached it stays there and is replayed, with the same
+key, once requests get through again (at the latest every OUTBOX_RETRY_MS,
+and at start-up).  Queued calls are only replayed while the account that
+made them is signed in.
 """
 import base64
+import functools
 import logging
-import requests
-from PySide6.QtCore import QObject, Signal, Slot, QSettings, Property
+import threading
+import time
+from pathlib import Path
+from PySide6.QtCore import QObject, Signal, Slot, QSettings, Property, QStandardPaths, QTimer
 from PySide6.QtQml import QJSValue
+from http_cache import HttpCache
+import metrics
+from request_scheduler import (RequestScheduler, Outbox, INTERACTIVE, SYNC, BACKGROUND, RETRY_ATTEMPTS,
+                               IDEMPOTENCY_HEADER, new_idempotency_key, is_transient)
+from wallet_sync import ServerTicketStore, iter_json_array, iter_ndjson, CURSOR_HEADER, NDJSON
 
 # Configure logger for this module
 logger = logging.getLogger("rts.network")
 
+REQUEST_TIMEOUT = 8          # seconds, per request
+STREAM_CHUNK = 64 * 1024     # bytes handed to incremental decoders
+FRAME_BUDGET_MS = 1000 / 60  # one frame at 60 Hz
+OUTBOX_RETRY_MS = 30_000     # replay queued calls at least this often while any are waiting
+OUTBOX_STARTUP_MS = 2_000    # calls left queued by an earlier run go out this long after start-up
+
+# Scheduling priority per call (metric name); anything else is SYNC
+OP_PRIORITY = {
+    "login": INTERACTIVE, "register": INTERACTIVE, "checkout": INTERACTIVE,
+    "generate": INTERACTIVE, "qr": INTERACTIVE,
+    "wallet": SYNC, "wallet_delta": SYNC,
+    "replay": BACKGROUND,
+}
+
+
+def _frame_budget(func):
+    """Warn whenever a GUI-thread entry point holds the event loop for more than one frame."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._last_slot_ms = elapsed_ms
+            if elapsed_ms > FRAME_BUDGET_MS:
+                logger.warning("%s blocked the GUI thread for %.1f ms (budget %.1f ms)",
+                               func.__name__, elapsed_ms, FRAME_BUDGET_MS)
+    return wrapper
+
+
+def _js_callback(callback):
+    """Keep a private handle on a QML callback so it outlives the slot invocation."""
+    if callback is not None and callback.isCallable():
+        return QJSValue(callback)
+    return None
+
 class NetworkManager(QObject):
     # ----- Signals ---------------------------------------------------------
     loginFinished    = Signal(bool, str)   # success, message
@@ -24,108 +92,365 @@ class NetworkManager(QObject):
     ticketsFetched   = Signal(list)        # list of dicts
     errorOccurred    = Signal(str)         # generic error
     checkoutSessionCreated = Signal(str)   # emits URL user must visit
+    qrImageChanged   = Signal()            # qrImage holds a new image
+    # internal: (future, on_success, on_error), always delivered on the GUI thread
+    _requestFinished = Signal(object, object, object)
 
     # ----- Init ------------------------------------------------------------
-    def __init__(self, base_url: str = "http://127.0.0.1:8000"):
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:8000",
+        max_workers: int = 4,
+        blocking: bool = False,
+        data_dir: str | None = None,
+        qr_images=None
+    ):
+        """
+        max_workers: size of the worker pool and of the keep-alive connection pool.
+        blocking:    run requests inline on the calling thread (scripts and benchmarks only).
+        data_dir:    where the HTTP cache and synced wallet live, defaults to AppDataLocation.
+        qr_images:   QrImageProvider that decoded QR PNGs are handed to; without
+                     one qrImage falls back to a base64 data URI.
+        """
         super().__init__()
         self.settings = QSettings()
         self.base_url = base_url
         self._auth_header: str | None = None
+        self._account: str | None = None   # whose wallet the local stores hold
         self._ticket_list: list[dict] = []
         self._qr_image: str = ""
+        self._blocking = blocking
+        self._qr_images = qr_images
+        self._last_slot_ms = 0.0
+        self._max_workers = max_workers
+        self._session_obj = None
+        self._session_lock = threading.Lock()
+        self._scheduler = RequestScheduler(max_workers, "rts-net")
+        self._requestFinished.connect(self._dispatch)
+
+        if data_dir is None:
+            data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        Path(data_dir).mkdir(parents=True, exist_ok=True)
+        self._cache = HttpCache(Path(data_dir) / "http_cache")
+        self._sync = ServerTicketStore(Path(data_dir) / "server_wallet.db")
+        self._outbox = Outbox(Path(data_dir) / "outbox.db")
+        self._outbox_waiting = False   # the signed-in account may have calls queued for replay
+        self._replaying = False
+        self._sending: set[str] = set()   # idempotency keys whose first send is still going
+        self._flights: dict[str, dict] = {}   # single-flight key -> state of the fetch in flight
+        self._outbox_timer = QTimer(self)
+        self._outbox_timer.setSingleShot(True)
+        self._outbox_timer.timeout.connect(self._replay_outbox)
+
         # Load saved auth header, if any
         saved = self.settings.value("auth_header", "")
         if saved:
             self._auth_header = saved
-            logger.debug("Loaded auth_header from QSettings: %s...", saved[:10])
-        logger.debug("NetworkManager initialized with base_url=%s", self.base_url)
+            self._account = self.settings.value("account", "") or saved.split(" ", 1)[-1]
+            logger.debug("Loaded saved auth header from QSettings")
+        logger.debug("NetworkManager initialized with base_url=%s, workers=%d, blocking=%s",
+                     self.base_url, max_workers, blocking)
+        queued = self._outbox.count(self._account)
+        if queued:
+            logger.info("%d calls queued by an earlier run; replaying shortly", queued)
+            self._outbox_waiting = True
+            self._outbox_timer.start(OUTBOX_STARTUP_MS)
+
+    # ----- Worker plumbing -------------------------------------------------
+    @property
+    def _session(self):
+        """
+        One pooled session shared by every worker: connections stay alive
+        between calls instead of paying a TCP/TLS handshake per request.
+        Created (and requests imported) on first use, in a worker.
+        """
+        if self._session_obj is None:
+            with self._session_lock:
+                if self._session_obj is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self._max_workers)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session_obj = session
+        return self._session_obj
+
+    def _submit(self, work, on_success, on_error, op: str | None = None, key: str | None = None,
+                attempts: int = RETRY_ATTEMPTS):
+        """
+        Run work() off the GUI thread at op's priority, retrying transient
+        failures; on_success(result) or on_error(exc) is then invoked back
+        on the GUI thread.  With tracing on, every try of work() is timed as
+        the metric network.<op>.  A key already in flight is not run again.
+        """
+        priority = OP_PRIORITY.get(op, SYNC)
+        if op is not None and metrics.enabled():
+            work = metrics.timed(f"network.{op}")(work)
+        if self._blocking:
+            future = self._scheduler.call(work, attempts)
+            self._dispatch(future, on_success, on_error)
+            return future
+        future = self._scheduler.submit(work, priority, key, attempts)
+        # Emitted from the worker thread; Qt queues delivery onto our (GUI) thread.
+        future.add_done_callback(lambda f: self._requestFinished.emit(f, on_success, on_error))
+        return future
+
+    def _stale_then_fresh(self, read_stale, fetch_fresh, on_result, on_error, op: str | None = None,
+                          key: str | None = None):
+        """
+        Hand on_result(value) a locally stored copy straight away (read_stale,
+        in a worker) while fetch_fresh brings it up to date.  fetch_fresh
+        returns None when nothing changed; otherwise its value supersedes the
+        stale one, which is dropped if it has not been delivered yet.
+
+        While a fetch with the same key is in flight, no second fetch starts:
+        its callbacks emit the same signals this call would.  The stored copy
+        is still handed over, because a fetch that ends with nothing new (a
+        304) delivers nothing to a caller that joined after its stale read.
+        """
+        state = self._flights.get(key) if key is not None else None
+        if state is not None:
+            logger.debug("%s already in flight, coalesced", key)
+            fetch_fresh = None
+        else:
+            state = {"superseded": False}
+
+        if read_stale is not None:
+            def stale_ready(value):
+                if value is not None and not state["superseded"]:
+                    on_result(value)
+
+            self._submit(read_stale, stale_ready,
+                         lambda e: logger.warning("Stored copy unreadable: %s", e), op=None, attempts=1)
+
+        if fetch_fresh is None:
+            return
+
+        def fresh_ready(value):
+            self._flights.pop(key, None)
+            if value is not None:
+                state["superseded"] = True
+                on_result(value)
+
+        def fresh_failed(e):
+            self._flights.pop(key, None)
+            on_error(e)
+
+        if key is not None:
+            self._flights[key] = state
+        self._submit(fetch_fresh, fresh_ready, fresh_failed, op, key)
+
+    def _cached_get(self, url: str, headers: dict, decode, on_result, on_error, op: str | None = None):
+        """
+        GET through the HTTP cache.
+
+        decode(chunks, headers) turns the body, given as an iterable of byte
+        chunks, into the value passed to on_result; headers is None when
+        decoding the cached copy.  A cached copy is served right away while a
+        conditional GET revalidates it: a 304 costs nothing further, a changed
+        body is streamed through decode and supersedes it.
+        """
+        account = self._account
+        read_cached = None
+        if self._cache.contains(url):
+            def read_cached():
+                entry = self._cache.get(url)
+                if entry is None:
+                    return None
+                logger.debug("Serving cached copy of %s while revalidating", url)
+                body = entry.body
+                return decode((body[i:i + STREAM_CHUNK] for i in range(0, len(body), STREAM_CHUNK)), None)
+
+        def revalidate():
+            entry = self._cache.get(url)
+            req_headers = dict(headers)
+            if entry is not None:
+                req_headers.update(entry.conditional_headers())
+            with self._session.get(url, headers=req_headers, timeout=REQUEST_TIMEOUT, stream=True) as r:
+                logger.debug("GET %s -> %d", url, r.status_code)
+                if r.status_code == 304 and entry is not None:
+                    self._cache.revalidated(url, r.headers)
+                    return None
+                r.raise_for_status()
+                received = []
+
+                def chunks():
+                    for chunk in r.iter_content(STREAM_CHUNK):
+                        received.append(chunk)
+                        yield chunk
+
+                value = decode(chunks(), r.headers)
+            if account == self._account:   # not another user's copy to serve later
+                self._cache.store(url, b"".join(received), r.headers)
+            return value
+
+        self._stale_then_fresh(read_cached, revalidate, on_result, on_error, op, key=f"{account} {url}")
+
+    @_frame_budget
+    def _dispatch(self, future, on_success, on_error):
+        try:
+            result = future.result()
+        except Exception as e:
+            on_error(e)
+        else:
+            # A request got through: whatever is queued in the outbox can go too
+            if self._outbox_waiting and not self._replaying:
+                self._replay_outbox()
+            on_success(result)
+
+    @Slot()
+    def shutdown(self):
+        """Drop queued requests and close pooled connections (call on app exit)."""
+        logger.debug("NetworkManager shutting down")
+        self._outbox_timer.stop()
+        self._scheduler.shutdown()
+        if self._session_obj is not None:
+            self._session_obj.close()
+
+    @Property(float)
+    def lastSlotMs(self) -> float:
+        """GUI-thread time spent by the most recent slot or result dispatch."""
+        return self._last_slot_ms
 
     # ----- Already Logged In? ---------------------------------------------
     @Slot(result=bool)
     def isLoggedIn(self) -> bool:
-        logged_in = self._auth_header is not None
-        logger.debug("isLoggedIn called, result=%s", logged_in)
-        return logged_in
+        return self._auth_header is not None
 
     # ----- Auth token helpers ---------------------------------------------
-    def _set_token(self, token: str, token_type: str = "Bearer"):
+    def _set_token(self, token: str, token_type: str = "Bearer", account: str | None = None):
+        """
+        Adopt a new token.  account names the user it belongs to (the token
+        itself if unknown); signing in as anyone else first discards the
+        previous account's synced wallet and cached responses.
+        """
+        account = account or token
+        switched = account != self._account
+        if switched:
+            self._forget_account()
         self._auth_header = f"{token_type} {token}"
+        self._account = account
         self.settings.setValue("auth_header", self._auth_header)
-        logger.debug("Saved auth_header to QSettings: %s...", token[:10])
+        self.settings.setValue("account", account)
+        logger.debug("Saved %s auth header to QSettings", token_type)
+        if switched and self._outbox.count(account):
+            # Calls this account queued before it last signed out
+            self._outbox_waiting = True
+            self._outbox_timer.start(OUTBOX_STARTUP_MS)
+
+    def _forget_account(self):
+        """
+        Drop everything stored locally for the signed-in account.  Its queued
+        calls stay in the outbox, parked until it signs in again.
+        """
+        if self._account is not None:
+            logger.debug("Discarding local data of the previous account")
+        self._account = None
+        self._outbox_waiting = False
+        self._outbox_timer.stop()
+        self._ticket_list = []
+        self._qr_image = ""
+        self._sync.clear()
+        self._cache.clear()
+        self.ticketsFetched.emit(self._ticket_list)
 
     # ----- Exposed properties (for wallet.qml) ----------------------------
     def _get_ticket_list(self):
-        logger.debug("Retrieving ticket list, count=%d", len(self._ticket_list))
         return self._ticket_list
 
     ticketList = Property("QVariant", _get_ticket_list, constant=True)
 
+    def _get_qr_image(self):
+        return self._qr_image
+
+    qrImage = Property(str, _get_qr_image, notify=qrImageChanged)
+
     # ----- Login -----------------------------------------------------------
     @Slot(str, str, QJSValue, result=None)
+    @_frame_budget
     def login(self, username: str, password: str, callback: QJSValue | None = None):
         """OAuth2 password grant -> /token"""
         url = f"{self.base_url}/token"
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         data = {"username": username, "password": password}
+        callback = _js_callback(callback)
         logger.debug("Login request to %s with username=%s", url, username)
-        try:
-            r = requests.post(url, data=data, headers=headers, timeout=8)
+
+        def work():
+            r = self._session.post(url, data=data, headers=headers, timeout=REQUEST_TIMEOUT)
             logger.debug("Login response status=%d", r.status_code)
             r.raise_for_status()
-            resp_json = r.json()
-            logger.debug("Login response JSON: %s", resp_json)
-            self._set_token(resp_json["access_token"], resp_json["token_type"])
+            return r.json()
+
+        def done(resp_json):
+            logger.info("Logged in as %s", username)
+            self._set_token(resp_json["access_token"], resp_json["token_type"], username)
             msg = "Login successful."
             self.loginFinished.emit(True, msg)
-            if callback and callback.isCallable():
+            if callback:
                 callback.call([True, msg])
-        except Exception as e:
-            logger.exception("Login failed for user %s", username)
+
+        def failed(e):
+            logger.error("Login failed for user %s: %s", username, e)
             msg = f"Login failed: {e}"
             self.loginFinished.emit(False, msg)
-            if callback and callback.isCallable():
+            if callback:
                 callback.call([False, msg])
 
+        self._submit(work, done, failed, "login")
+
     # ----- Registration ----------------------------------------------------
     @Slot(str, str, str, QJSValue, result=None)
+    @_frame_budget
     def register(self, username: str, email: str, password: str, callback: QJSValue | None = None):
         """Create account -> /register"""
         url = f"{self.base_url}/register"
         payload = {"username": username, "email": email or None, "password": password}
-        logger.debug("Register request to %s payload=%s", url, payload)
-        try:
-            r = requests.post(url, json=payload, timeout=8)
+        headers = {IDEMPOTENCY_HEADER: new_idempotency_key()}
+        callback = _js_callback(callback)
+        logger.debug("Register request to %s with username=%s", url, username)
+
+        def work():
+            r = self._session.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
             logger.debug("Register response status=%d", r.status_code)
             r.raise_for_status()
-            resp_json = r.json()
-            logger.debug("Register response JSON: %s", resp_json)
+            return r.json()
+
+        def done(resp_json):
+            logger.info("Registered %s", username)
             # Store token from registration as well
-            self._set_token(resp_json["access_token"], resp_json["token_type"])
+            self._set_token(resp_json["access_token"], resp_json["token_type"], username)
             # auto-login for QML flow
             self.login(username, password)
             msg = "Registration successful."
             self.registerFinished.emit(True, msg)
-            if callback and callback.isCallable():
+            if callback:
                 callback.call([True, msg])
-        except Exception as e:
-            logger.exception("Registration failed for user %s", username)
+
+        def failed(e):
+            logger.error("Registration failed for user %s: %s", username, e)
             msg = f"Registration failed: {e}"
             self.registerFinished.emit(False, msg)
-            if callback and callback.isCallable():
+            if callback:
                 callback.call([False, msg])
 
+        self._submit(work, done, failed, "register")
+
     # ----- Logout ----------------------------------------------------------
     @Slot(result=None)
     def logout(self):
         """Clear JWT from memory (client-side logout)"""
         logger.debug("Logout called, clearing auth header and settings")
         self.settings.remove("auth_header")
+        self.settings.remove("account")
         self._auth_header = None
-        self._ticket_list = []
-        self._qr_image = ""
+        self._forget_account()
 
     # ----- Create Stripe Checkout Session ---------------------------------
     @Slot(str, "QJSValue", result=None)
+    @_frame_budget
     def createCheckoutSession(
         self,
         ticket_type: str,
@@ -134,90 +459,270 @@ class NetworkManager(QObject):
         """Ask server to create a Stripe checkout Session"""
         url = f"{self.base_url}/create-checkout-session"
         headers = {"Authorization": self._auth_header} if self._auth_header else {}
-        try:
-            logger.debug("Creating Stripe Checkout Session")
-            r = requests.post(
+        headers[IDEMPOTENCY_HEADER] = new_idempotency_key()
+        callback = _js_callback(callback)
+        logger.debug("Creating Stripe Checkout Session")
+
+        def work():
+            r = self._session.post(
                 url,
                 json={
                     "ticket_type": ticket_type
                 },
                 headers=headers,
-                timeout=8
+                timeout=REQUEST_TIMEOUT
             )
             r.raise_for_status()
-            session_url = r.json()["url"]
+            return r.json()["url"]
+
+        def done(session_url):
             self.checkoutSessionCreated.emit(session_url)
-            logger.debug(f"Stripe Checkout session created: {session_url}")
-            if callback and callback.isCallable():
+            logger.debug("Stripe Checkout session created: %s", session_url)
+            if callback:
                 callback.call([session_url])
-        except Exception as e:
-            logger.error(f"Stripe Checkout Session Creation Failed: {e}")
+
+        def failed(e):
+            logger.error("Stripe Checkout Session Creation Failed: %s", e)
             self.errorOccurred.emit(f"Failed to create checkout session: {e}")
 
+        self._submit(work, done, failed, "checkout")
+
     # ----- Ticket Generation ----------------------------------------------
     @Slot(str, result=None)
+    @_frame_budget
     def generateTicket(self, ticket_type: str):
-        """POST /generate -> emits ticketGenerated"""
+        """
+        POST /generate -> emits ticketGenerated.
+        Kept in the outbox until the server answers, and replayed if it cannot be reached.
+        """
         if not self._auth_header:
             logger.debug("generateTicket called without auth token")
             self.errorOccurred.emit("No auth token available.")
             return
         url = f"{self.base_url}/generate"
-        headers = {"Authorization": self._auth_header}
+        key = new_idempotency_key()
+        owner = self._account
+        headers = {"Authorization": self._auth_header, IDEMPOTENCY_HEADER: key}
         data = {"ticket_type": ticket_type}
         logger.debug("generateTicket request to %s with type=%s", url, ticket_type)
-        try:
-            r = requests.post(url, json=data, headers=headers, timeout=8)
-            logger.debug("generateTicket response status=%d", r.status_code)
-            r.raise_for_status()
-            payload = r.json().get("payload", "")
+        self._sending.add(key)
+
+        def work():
+            self._outbox.add(key, owner, "generate", "POST", "/generate", data)
+            try:
+                r = self._session.post(url, json=data, headers=headers, timeout=REQUEST_TIMEOUT)
+                logger.debug("generateTicket response status=%d", r.status_code)
+                r.raise_for_status()
+            except Exception as e:
+                if not is_transient(e):
+                    self._outbox.remove(key)
+                raise
+            self._outbox.remove(key)
+            return r.json().get("payload", "")
+
+        def done(payload):
+            self._sending.discard(key)
+            if owner != self._account:
+                return
             logger.debug("generateTicket payload length=%d", len(payload))
             self.ticketGenerated.emit(payload)
-        except Exception as e:
-            logger.exception("Ticket generation failed for type %s", ticket_type)
+
+        def failed(e):
+            self._sending.discard(key)
+            if is_transient(e):
+                logger.warning("Ticket generation for type %s queued until the server is reachable: %s",
+                               ticket_type, e)
+                if owner == self._account:
+                    self._outbox_waiting = True
+                    self._outbox_timer.start(OUTBOX_RETRY_MS)
+                self.errorOccurred.emit("Server unreachable: the ticket will be issued once the connection is back.")
+                return
+            logger.error("Ticket generation failed for type %s: %s", ticket_type, e)
             self.errorOccurred.emit(f"Ticket generation failed: {e}")
 
+        self._submit(work, done, failed, "generate")
+
+    # ----- Outbox replay -------------------------------------------------------
+    @Slot()
+    def _replay_outbox(self):
+        """
+        Send the signed-in account's queued calls again, oldest first, each
+        with its original Idempotency-Key.
+        """
+        if self._replaying or not self._auth_header:
+            return
+        self._replaying = True
+        self._outbox_timer.stop()
+        owner = self._account
+        auth = {"Authorization": self._auth_header}
+
+        def work():
+            answered, unreachable = [], None
+            for key, op, method, path, body in self._outbox.pending(owner):
+                if key in self._sending:
+                    continue   # its first send is still being retried
+                try:
+                    r = self._session.request(method, f"{self.base_url}{path}", json=body,
+                                              headers=dict(auth, **{IDEMPOTENCY_HEADER: key}),
+                                              timeout=REQUEST_TIMEOUT)
+                    r.raise_for_status()
+                    answered.append((op, r.json(), None))
+                except Exception as e:
+                    if is_transient(e):
+                        unreachable = e
+                        break
+                    answered.append((op, None, e))
+                self._outbox.remove(key)
+            return answered, unreachable, self._outbox.count(owner)
+
+        def done(result):
+            answered, unreachable, remaining = result
+            self._replaying = False
+            if owner != self._account:
+                # Sent with its owner's token; nothing to show the account now signed in
+                if self._outbox_waiting:
+                    self._outbox_timer.start(OUTBOX_STARTUP_MS)
+                return
+            self._outbox_waiting = remaining > 0
+            for op, resp_json, error in answered:
+                if error is not None:
+                    logger.error("Queued %s failed: %s", op, error)
+                    self.errorOccurred.emit(f"Queued {op} failed: {error}")
+                elif op == "generate":
+                    self.ticketGenerated.emit(resp_json.get("payload", ""))
+            if answered:
+                logger.info("Replayed %d queued calls, %d still waiting", len(answered), remaining)
+                self.fetchTickets()
+            if remaining:
+                if unreachable is not None:
+                    logger.debug("Outbox replay stopped, server unreachable: %s", unreachable)
+                self._outbox_timer.start(OUTBOX_RETRY_MS)
+
+        def failed(e):
+            self._replaying = False
+            logger.warning("Outbox replay failed: %s", e)
+            if owner == self._account:
+                self._outbox_timer.start(OUTBOX_RETRY_MS)
+
+        self._submit(work, done, failed, "replay", attempts=1)
+
     # ----- Fetch ticket list ----------------------------------------------
     @Slot(result=None)
+    @_frame_budget
     def fetchTickets(self):
-        """GET /wallet -> updates ticketList & emits ticketsFetched"""
+        """
+        GET /wallet -> updates ticketList & emits ticketsFetched.
+        Uses a delta sync (GET /wallet?since=<cursor>) once the server has issued a cursor.
+        """
         if not self._auth_header:
             logger.debug("fetchTickets called without auth token")
             self.errorOccurred.emit("No auth token available.")
             return
         url = f"{self.base_url}/wallet"
         headers = {"Authorization": self._auth_header}
-        logger.debug("fetchTickets request to %s", url)
-        try:
-            r = requests.get(url, headers=headers, timeout=8)
-            logger.debug("fetchTickets response status=%d", r.status_code)
-            r.raise_for_status()
-            tickets = r.json()
+        account = self._account
+
+        def done(tickets):
+            if account != self._account:
+                logger.debug("Dropping wallet fetched for the previous account")
+                return
             logger.debug("fetchTickets received %d tickets", len(tickets))
             self._ticket_list = tickets
             self.ticketsFetched.emit(self._ticket_list)
-        except Exception as e:
-            logger.exception("Fetch tickets failed")
+
+        def failed(e):
+            logger.error("Fetch tickets failed: %s", e)
             self.errorOccurred.emit(f"Fetch tickets failed: {e}")
 
+        cursor = self._sync.cursor
+        if cursor is None:
+            logger.debug("fetchTickets full request to %s", url)
+            self._cached_get(url, headers, lambda chunks, h: self._decode_wallet(chunks, h, account),
+                             done, failed, "wallet")
+        else:
+            logger.debug("fetchTickets delta request to %s since %s", url, cursor)
+            self._stale_then_fresh(self._sync.tickets,
+                                   lambda: self._sync_wallet(url, headers, cursor, account),
+                                   done, failed, "wallet_delta", key=f"{account} {url}")
+
+    def _decode_wallet(self, chunks, headers, account: str | None) -> list:
+        """
+        Incrementally decode a full /wallet array; adopt the server's cursor if
+        it sent one and account is still the one signed in.
+        """
+        tickets = list(iter_json_array(chunks))
+        cursor = headers.get(CURSOR_HEADER) if headers is not None else None
+        if cursor and account == self._account:
+            self._sync.replace_all(tickets, cursor)
+        return tickets
+
+    def _sync_wallet(self, url: str, headers: dict, cursor: str, account: str | None) -> list | None:
+        """
+        Worker: apply the changes since cursor to the synced wallet of account.
+        Returns the merged list, or None when nothing changed (or account has
+        signed out meanwhile).
+        """
+        delta_headers = dict(headers, Accept=NDJSON)
+        with self._session.get(url, params={"since": cursor}, headers=delta_headers,
+                               timeout=REQUEST_TIMEOUT, stream=True) as r:
+            logger.debug("Wallet delta response status=%d", r.status_code)
+            if r.status_code != 410:
+                r.raise_for_status()
+                upserts, revoked, new_cursor = [], [], cursor
+                for record in iter_ndjson(r.iter_lines(STREAM_CHUNK)):
+                    op = record.get("op")
+                    if op == "upsert":
+                        upserts.append(record["ticket"])
+                    elif op == "revoke":
+                        revoked.append(record["ticket_id"])
+                    elif "cursor" in record:
+                        new_cursor = record["cursor"]
+                if account != self._account:
+                    return None
+                self._sync.apply(upserts, revoked, new_cursor)
+                logger.debug("Wallet delta: %d upserted, %d revoked", len(upserts), len(revoked))
+                return self._sync.tickets() if upserts or revoked else None
+
+        # Cursor expired on the server: start over with a full fetch
+        logger.info("Wallet cursor %s expired, resyncing", cursor)
+        if account == self._account:
+            self._sync.clear()
+        with self._session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as r:
+            r.raise_for_status()
+            return self._decode_wallet(r.iter_content(STREAM_CHUNK), r.headers, account)
+
     # ----- Load QR image ---------------------------------------------------
     @Slot(str, result=None)
+    @_frame_budget
     def loadQRCode(self, ticket_id: str):
-        """GET /qr/{ticket_id} -> returns PNG as base64 data string"""
+        """GET /qr/{ticket_id} -> qrImage as an image:// source, emits qrImageChanged"""
         if not self._auth_header:
             logger.debug("loadQRCode called without auth token")
             self.errorOccurred.emit("No auth token available.")
             return
         url = f"{self.base_url}/qr/{ticket_id}"
         headers = {"Authorization": self._auth_header}
+        account = self._account
         logger.debug("loadQRCode request to %s", url)
-        try:
-            r = requests.get(url, headers=headers, timeout=8)
-            logger.debug("loadQRCode response status=%d, content-length=%s", r.status_code, r.headers.get("Content-Length"))
-            r.raise_for_status()
-            self._qr_image = "data:image/png;base64," + base64.b64encode(r.content).decode()
-            logger.debug("loadQRCode image encoded, length=%d", len(self._qr_image))
-        except Exception as e:
-            logger.exception("Load QR code failed for ticket_id %s", ticket_id)
+
+        def encode(chunks, _headers) -> str:
+            # Runs in a worker: the PNG is decoded once into the image provider
+            # and the GUI thread only swaps a short image:// URL.
+            png = b"".join(chunks)
+            if self._qr_images is not None:
+                return self._qr_images.insert_png(png)
+            return "data:image/png;base64," + base64.b64encode(png).decode()
+
+        def done(data_uri):
+            if account != self._account:
+                logger.debug("Dropping QR code fetched for the previous account")
+                return
+            self._qr_image = data_uri
+            logger.debug("loadQRCode image ready: %s", self._qr_image[:48])
+            self.qrImageChanged.emit()
+
+        def failed(e):
+            logger.error("Load QR code failed for ticket_id %s: %s", ticket_id, e)
             self.errorOccurred.emit(f"Load QR failed: {e}")
 
+        self._cached_get(url, headers, encode, done, failed, "qr")
@@ -0,0 +1,244 @@
+# page_cache.py
+"""
+page_cache.py
+
+Navigation for main.qml: pages are kept alive instead of being rebuilt on
+every switch.
+
+Each page's QQmlComponent is compiled once per run and its item is created
+once, parented to the pageHost item in main.qml.  Switching pages hides the
+current item and shows the next, which costs a visibility change rather than
+a parse, a compile and a full item tree.  Up to KEEP_ALIVE pages stay alive,
+least recently shown evicted first.  Pages that hold credentials or a payment
+session (TRANSIENT) are destroyed as soon as they are left, and showing the
+login page drops everything, the page it replaces included, so nothing of a
+signed-in session survives it.
+
+Once a page is on screen and the app has been idle for PRELOAD_DELAY_MS, its
+likely successors (NEXT) are created with an asynchronous QQmlIncubator,
+which spreads item creation over frames using the window's incubation time.
+Because a page is now created once, work it used to do in
+Component.onCompleted on every visit belongs in a pageShown(page) handler.
+
+QML is read from qml.rcc, the resource bundle build_qml_bundle.py packs,
+when one is present and newer than the sources, otherwise from the files
+next to this module.  The engine keeps compiled bytecode for either in its
+disk cache, so a page is compiled once per install rather than once per
+launch.
+"""
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from PySide6.QtCore import QObject, QResource, QTimer, QUrl, Signal
+from PySide6.QtQml import QQmlComponent, QQmlIncubator
+
+logger = logging.getLogger("rts.client.pages")
+
+APP_DIR = Path(__file__).resolve().parent
+QML_BUNDLE = APP_DIR / "qml.rcc"
+# Room for every page the drawer reaches (home, wallet, purchasing, routes,
+# settings, account) plus the transient page on screen, if any
+KEEP_ALIVE = 7
+PRELOAD_DELAY_MS = 300
+# Destroyed when left: they hold typed credentials or a checkout session
+TRANSIENT = {"login.qml", "register.qml", "stripe_checkout.qml"}
+# Showing one of these ends the session: every kept-alive page is dropped
+RESET = {"login.qml"}
+# Likely next pages, preloaded while idle
+NEXT = {
+    "login.qml": ["home.qml"],
+    "home.qml": ["wallet.qml", "purchasing.qml", "routes.qml"],
+    "wallet.qml": ["home.qml"],
+    "purchasing.qml": ["wallet.qml", "home.qml"],
+    "routes.qml": ["home.qml"],
+    "settings.qml": ["home.qml"],
+    "account.qml": ["home.qml"],
+}
+
+
+def qml_base_url(use_bundle: bool = True) -> QUrl:
+    """
+    Where main.qml and the pages are loaded from: qrc:/ once qml.rcc is
+    registered, else the app directory.  A bundle older than any QML source
+    beside it is ignored (with a warning) so edits show up during development.
+    """
+    if use_bundle and QML_BUNDLE.exists():
+        built = QML_BUNDLE.stat().st_mtime
+        stale = [p.name for p in APP_DIR.glob("*.qml") if p.stat().st_mtime > built]
+        if stale:
+            logger.warning("%s is older than %s; loading QML from files (rerun build_qml_bundle.py)",
+                           QML_BUNDLE.name, ", ".join(sorted(stale)))
+        elif QResource.registerResource(str(QML_BUNDLE)):
+            logger.debug("Loading QML from %s", QML_BUNDLE)
+            return QUrl("qrc:/")
+        else:
+            logger.warning("Could not register %s; loading QML from files", QML_BUNDLE)
+    return QUrl.fromLocalFile(str(APP_DIR) + "/")
+
+
+class _Incubator(QQmlIncubator):
+    """Creates a page hidden and already parented, so anchors and parent bindings resolve."""
+
+    def __init__(self, page: str, host, done, mode=QQmlIncubator.Asynchronous):
+        super().__init__(mode)
+        self.page = page
+        self._host = host
+        self._done = done
+
+    def setInitialState(self, obj):
+        obj.setParent(self._host)
+        obj.setParentItem(self._host)
+        obj.setVisible(False)
+
+    def statusChanged(self, status):
+        if status != QQmlIncubator.Loading:
+            self._done(self)
+
+
+class PageCache(QObject):
+    pageShown = Signal(str)
+
+    def __init__(self, engine, host, base_url: QUrl, capacity: int = KEEP_ALIVE,
+                 preload: bool = True, parent=None):
+        super().__init__(parent)
+        self._engine = engine
+        self._host = host
+        self._base = base_url
+        self._capacity = capacity
+        self._preload = preload
+        self._components: dict[str, QQmlComponent] = {}
+        self._pages: OrderedDict[str, object] = OrderedDict()   # page -> item, least recent first
+        self._incubating: dict[str, _Incubator] = {}
+        self._pending: list[str] = []
+        self._current: str | None = None
+        self._idle = QTimer(self)
+        self._idle.setSingleShot(True)
+        self._idle.setInterval(PRELOAD_DELAY_MS)
+        self._idle.timeout.connect(self._preload_next)
+
+    @property
+    def current(self) -> str | None:
+        return self._current
+
+    def cached(self) -> list[str]:
+        return list(self._pages)
+
+    # ----- Navigation ----------------------------------------------------------
+    def show(self, page: str) -> bool:
+        """Make page the visible one, creating it now if it is not alive yet."""
+        if page in RESET:
+            self.clear()
+        item = self._pages.get(page)
+        if item is None:
+            item = self._finish_preload(page) or self._create(page)
+            if item is None:
+                return False
+        previous = self._current
+        if previous is not None and previous != page:
+            old = self._pages.get(previous)
+            if old is not None:
+                old.setVisible(False)
+            # Leaving for a RESET page ends the session the previous page belonged to
+            if previous in TRANSIENT or page in RESET:
+                self._drop(previous)
+        item.setVisible(True)
+        self._pages[page] = item
+        self._pages.move_to_end(page)
+        self._current = page
+        self._trim()
+        self.pageShown.emit(page)
+
+        if self._preload:
+            self._pending = [p for p in NEXT.get(page, ()) if p not in self._pages]
+            self._idle.start()
+        return True
+
+    def clear(self):
+        """Destroy every page except the one on screen."""
+        self._pending = []
+        incubating, self._incubating = self._incubating, {}
+        for incubator in incubating.values():
+            incubator.clear()
+        for page in list(self._pages):
+            if page != self._current:
+                self._drop(page)
+
+    def _drop(self, page: str):
+        item = self._pages.pop(page, None)
+        if item is not None:
+            logger.debug("Dropping page %s", page)
+            # Left parented: pages bind parent.width and friends until deleted
+            item.setVisible(False)
+            item.deleteLater()
+
+    def _trim(self):
+        while len(self._pages) > max(self._capacity, 1):
+            oldest = next(iter(self._pages))
+            if oldest == self._current:
+                self._pages.move_to_end(oldest)
+                continue
+            self._drop(oldest)
+
+    # ----- Creation ------------------------------------------------------------
+    def _component(self, page: str) -> QQmlComponent | None:
+        component = self._components.get(page)
+        if component is None:
+            component = QQmlComponent(self._engine, self._base.resolved(QUrl(page)))
+            if component.isError():
+                logger.error("Failed to compile %s: %s", page,
+                             "; ".join(e.toString() for e in component.errors()))
+                return None
+            self._components[page] = component
+        return component
+
+    def _create(self, page: str):
+        component = self._component(page)
+        if component is None:
+            return None
+        incubator = _Incubator(page, self._host, lambda _: None, QQmlIncubator.Synchronous)
+        component.create(incubator, self._engine.rootContext())
+        if not incubator.isReady():
+            logger.error("Failed to create %s: %s", page,
+                         "; ".join(e.toString() for e in incubator.errors()))
+            return None
+        logger.debug("Created page %s", page)
+        return incubator.object()
+
+    # ----- Preloading ----------------------------------------------------------
+    def _preload_next(self):
+        while self._pending:
+            page = self._pending.pop(0)
+            if page in self._pages or page in self._incubating or page in TRANSIENT:
+                continue
+            component = self._component(page)
+            if component is None:
+                continue
+            incubator = _Incubator(page, self._host, self._preloaded)
+            self._incubating[page] = incubator
+            component.create(incubator, self._engine.rootContext())
+            return   # one at a time; the next starts when this one is done
+
+    def _preloaded(self, incubator: _Incubator):
+        if self._incubating.get(incubator.page) is not incubator:
+            return
+        del self._incubating[incubator.page]
+        if incubator.isReady():
+            logger.debug("Preloaded page %s", incubator.page)
+            # A likely next page outranks every kept page but the current one
+            self._pages[incubator.page] = incubator.object()
+            if self._current in self._pages:
+                self._pages.move_to_end(self._current)
+            self._trim()
+        elif incubator.isError():
+            logger.error("Failed to preload %s: %s", incubator.page,
+                         "; ".join(e.toString() for e in incubator.errors()))
+        if self._pending and not self._idle.isActive():
+            self._idle.start()
+
+    def _finish_preload(self, page: str):
+        """A page asked for while it is still being preloaded: finish it now."""
+        incubator = self._incubating.get(page)
+        if incubator is None:
+            return None
+        incubator.forceCompletion()
+        return self._pages.get(page)
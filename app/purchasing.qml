@@ -153,8 +153,8 @@ Item {
     // Listen for QR generation
     Connections {
         target: QrGen
-        function onQrGenerated(dataUri) {
-            qrImage.source = dataUri
+        function onQrGenerated(source) {
+            qrImage.source = source
             qrPopup.open()
         }
     }
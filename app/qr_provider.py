@@ -0,0 +1,176 @@
+# qr_provider.py
+"""
+qr_provider.py
+
+QQuickImageProvider serving QR codes to QML as image://qr/<key>.
+
+Payloads are registered once and rendered lazily, straight from segno's module
+matrix into a QImage (no PNG encode, no base64, no decode on the QML side).
+The one-pixel-per-module base image of every registered payload is kept (a
+few KB each); scaled copies live in a bounded LRU keyed by (key, scale), so
+showing the same ticket again is a dictionary hit.  prefetch() renders the
+base images of a whole wallet on a background pool, so the first tap on a
+ticket only has to scale.  PNGs fetched from the server can be inserted
+pre-decoded under their own content key.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QImage
+from PySide6.QtQuick import QQuickImageProvider
+import metrics
+
+logger = logging.getLogger("rts.client.qrprovider")
+
+PROVIDER_ID = "qr"
+DEFAULT_SCALE = 4
+PREFETCH_WORKERS = 2
+BORDER = None  # segno default: 4 modules for QR, 2 for Micro QR
+# Dark modules -> black, light -> white, for a Grayscale8 row
+_DARK_TO_GRAY = bytes([255] + [0] * 255)
+
+
+def render_qr(payload: str, scale: int = DEFAULT_SCALE, border: int | None = BORDER,
+              mask: int | None = None) -> QImage:
+    """
+    Encode payload and paint it into a Grayscale8 QImage, one byte per pixel.
+    segno picks the densest mode the text allows: byte mode for v1 (base64)
+    tickets, alphanumeric for v2 ("RR2:" + base45) ones.  A fixed mask (0-7)
+    skips segno's evaluation of all eight, about three quarters of the encode
+    time; the default picks the best-scoring one.
+    """
+    import segno  # deferred: only needed once a code is actually shown
+
+    qr = segno.make(payload, error='m', mask=mask)
+    width, height = qr.symbol_size(scale=1, border=border)
+    rows = b"".join(bytes(row).translate(_DARK_TO_GRAY)
+                    for row in qr.matrix_iter(scale=1, border=border))
+    image = QImage(rows, width, height, width, QImage.Format_Grayscale8).copy()
+    if scale > 1:
+        image = image.scaled(width * scale, height * scale,
+                             Qt.IgnoreAspectRatio, Qt.FastTransformation)
+    return image
+
+
+class QrImageProvider(QQuickImageProvider):
+    def __init__(self, capacity: int = 64):
+        super().__init__(QQuickImageProvider.ImageType.Image)
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self._payloads: dict[str, str] = {}
+        self._bases: dict[str, QImage] = {}
+        self._images: OrderedDict[tuple[str, int], QImage] = OrderedDict()
+        self._pool: ThreadPoolExecutor | None = None
+        self._queued: set[str] = set()
+        self._closed = False
+
+    # ----- Registration ----------------------------------------------------
+    @staticmethod
+    def _key(payload: str) -> str:
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def register(self, payload: str) -> str:
+        """Remember payload and return the image:// source QML should bind to."""
+        key = self._key(payload)
+        with self._lock:
+            self._payloads[key] = payload
+        return f"image://{PROVIDER_ID}/{key}"
+
+    def prefetch(self, payloads) -> int:
+        """Register payloads and render the ones not rendered yet in the background; returns how many."""
+        pending = []
+        with self._lock:
+            if self._closed:
+                return 0   # shutting down: a late wallet update renders nothing
+            for payload in payloads:
+                key = self._key(payload)
+                if key not in self._payloads:
+                    self._payloads[key] = payload
+                if key not in self._bases and key not in self._queued:
+                    pending.append(key)
+            self._queued.update(pending)
+            if pending and self._pool is None:
+                self._pool = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="rts-qr")
+            # Submitted under the lock, so shutdown() cannot close the pool in between
+            for key in pending:
+                self._pool.submit(self._base, key)
+        if pending:
+            logger.debug("Prefetching %d QR codes", len(pending))
+        return len(pending)
+
+    def shutdown(self):
+        """Stop prefetching for good: queued renders are cancelled and later prefetch() calls do nothing."""
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _base(self, key: str) -> QImage | None:
+        """The scale-1 image for a registered key, rendered on first use."""
+        with self._lock:
+            base = self._bases.get(key)
+            payload = self._payloads.get(key)
+        if base is not None or payload is None:
+            return base
+        logger.debug("Rendering QR %s", key)
+        with metrics.span("qr.render"):
+            base = render_qr(payload, scale=1)
+        with self._lock:
+            self._queued.discard(key)
+            return self._bases.setdefault(key, base)
+
+    def insert_png(self, png: bytes) -> str:
+        """Decode a server-rendered PNG once and serve it as image://qr/png-<digest>."""
+        key = "png-" + hashlib.sha1(png).hexdigest()
+        image = QImage.fromData(png, "PNG")
+        if image.isNull():
+            raise ValueError("server QR image is not a valid PNG")
+        with self._lock:
+            self._put((key, 0), image)
+        return f"image://{PROVIDER_ID}/{key}"
+
+    # ----- LRU ---------------------------------------------------------------
+    def _put(self, cache_key, image: QImage):
+        self._images[cache_key] = image
+        self._images.move_to_end(cache_key)
+        while len(self._images) > self._capacity:
+            self._images.popitem(last=False)
+
+    def image(self, key: str, scale: int = DEFAULT_SCALE) -> QImage | None:
+        """Return the rendered image for key, rendering and caching it on a miss."""
+        with self._lock:
+            for cache_key in ((key, scale), (key, 0)):
+                cached = self._images.get(cache_key)
+                if cached is not None:
+                    self._images.move_to_end(cache_key)
+                    return cached
+        base = self._base(key)
+        if base is None or scale == 1:
+            return base
+        image = base.scaled(base.width() * scale, base.height() * scale,
+                            Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        with self._lock:
+            self._put((key, scale), image)
+        return image
+
+    # ----- QQuickImageProvider -----------------------------------------------
+    @metrics.timed("qr.request")
+    def requestImage(self, id: str, size: QSize, requestedSize: QSize) -> QImage:
+        scale = DEFAULT_SCALE
+        if requestedSize.width() > 0 and not id.startswith("png-"):
+            # Pick the largest whole-module scale that fits the requested width
+            base = self.image(id, 1)
+            if base is not None:
+                scale = max(1, requestedSize.width() // base.width())
+        image = self.image(id, scale)
+        if image is None:
+            logger.warning("Unknown QR image requested: %s", id)
+            image = QImage()
+        if size is not None:
+            size.setWidth(image.width())
+            size.setHeight(image.height())
+        return image
@@ -0,0 +1,263 @@
+# request_scheduler.py
+"""
+request_scheduler.py
+
+The worker pool behind NetworkManager, plus the outbox that keeps mutating
+calls across a loss of connectivity.
+
+RequestScheduler runs jobs on a few worker threads in priority order (lower
+first, submission order within a priority):
+
+  INTERACTIVE  the user is waiting on it: login, a QR code on screen, a purchase
+  SYNC         wallet refreshes
+  BACKGROUND   outbox replays
+
+Single flight: a job submitted with a key while another job with that key
+is queued or running is not queued again; the caller gets the future of the
+one in flight.
+
+Retries: a job that fails with a connection error, a timeout or one of
+TRANSIENT_STATUS is run again, up to RETRY_ATTEMPTS tries in all, after a
+random delay between 0 and RETRY_BASE * 2**n seconds (capped at RETRY_CAP),
+or the server's Retry-After if that is longer.  A job waiting out its
+backoff sits in a delayed heap rather than holding a worker.  Any other
+failure is final at once.
+
+Mutating calls carry an Idempotency-Key generated once per logical call and
+reused by every retry and replay, so a server that honours it applies the
+call once however often it arrives.  Outbox (SQLite) keeps such calls until
+the server has answered them, so a purchase made offline is sent once the
+connection is back, even after a restart.  Each call is stored with the
+account that made it and is only ever replayed for that account.
+"""
+import heapq
+import itertools
+import json
+import logging
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future
+from pathlib import Path
+
+logger = logging.getLogger("rts.scheduler")
+
+INTERACTIVE, SYNC, BACKGROUND = 0, 1, 2
+RETRY_ATTEMPTS = 4           # tries per job, the first one included
+RETRY_BASE = 0.5             # seconds
+RETRY_CAP = 8.0              # seconds
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def new_idempotency_key() -> str:
+    return str(uuid.uuid4())
+
+
+def is_offline(exc) -> bool:
+    """The request never got an answer: no route, refused, reset or timed out."""
+    requests = sys.modules.get("requests")   # loaded by whichever request failed
+    return requests is not None and isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def is_transient(exc) -> bool:
+    """Worth another try: offline, or the server asked to come back later."""
+    response = getattr(exc, "response", None)
+    return is_offline(exc) or getattr(response, "status_code", None) in TRANSIENT_STATUS
+
+
+def backoff_delay(retry: int, exc=None) -> float:
+    """Seconds to wait before retry number retry (0-based): full jitter, or Retry-After if longer."""
+    delay = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** retry))
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        delay = max(delay, min(RETRY_CAP, float(headers.get("Retry-After", 0))))
+    except ValueError:
+        pass   # an HTTP date; the jittered delay will do
+    return delay
+
+
+class _Job:
+    __slots__ = ("work", "priority", "key", "attempts", "tries", "future")
+
+    def __init__(self, work, priority: int, key: str | None, attempts: int):
+        self.work = work
+        self.priority = priority
+        self.key = key
+        self.attempts = max(attempts, 1)
+        self.tries = 0
+        self.future = Future()
+
+
+class RequestScheduler:
+    def __init__(self, workers: int = 4, name: str = "rts-net"):
+        self._workers = workers
+        self._name = name
+        self._threads: list[threading.Thread] = []
+        self._cond = threading.Condition()
+        self._ready: list[tuple[int, int, _Job]] = []      # (priority, seq, job)
+        self._delayed: list[tuple[float, int, _Job]] = []  # (due, seq, job), waiting out a backoff
+        self._in_flight: dict[str, _Job] = {}
+        self._seq = itertools.count()
+        self._closed = False
+
+    def in_flight(self, key: str) -> bool:
+        with self._cond:
+            return key in self._in_flight
+
+    def submit(self, work, priority: int = SYNC, key: str | None = None,
+               attempts: int = RETRY_ATTEMPTS) -> Future:
+        """Queue work(); the future settles with its result once it succeeds or gives up."""
+        with self._cond:
+            if key is not None and key in self._in_flight:
+                logger.debug("Coalesced with the request in flight for %s", key)
+                return self._in_flight[key].future
+            job = _Job(work, priority, key, attempts)
+            if self._closed:
+                job.future.cancel()
+                return job.future
+            if key is not None:
+                self._in_flight[key] = job
+            heapq.heappush(self._ready, (priority, next(self._seq), job))
+            # Threads start on first use, as ThreadPoolExecutor's do
+            if len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._run, name=f"{self._name}_{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return job.future
+
+    def call(self, work, attempts: int = RETRY_ATTEMPTS) -> Future:
+        """Run work() on the calling thread, retries and backoff included; returns a settled future."""
+        job = _Job(work, INTERACTIVE, None, attempts)
+        job.future.set_running_or_notify_cancel()
+        while (error := self._attempt(job)) is not None:
+            time.sleep(backoff_delay(job.tries - 1, error))
+        return job.future
+
+    def shutdown(self):
+        """Cancel everything queued or backing off; running jobs finish their current try."""
+        with self._cond:
+            self._closed = True
+            queued = [job for _, _, job in self._ready + self._delayed]
+            self._ready.clear()
+            self._delayed.clear()
+            self._in_flight.clear()
+            self._cond.notify_all()
+        for job in queued:
+            if not job.future.cancel():   # a retry: already running
+                job.future.set_exception(CancelledError())
+
+    # ----- Workers -------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next()
+            if job is None:
+                return
+            if job.tries == 0 and not job.future.set_running_or_notify_cancel():
+                self._forget(job)
+                continue
+            error = self._attempt(job)
+            if error is None:
+                continue
+            with self._cond:
+                if not self._closed:
+                    due = time.monotonic() + backoff_delay(job.tries - 1, error)
+                    heapq.heappush(self._delayed, (due, next(self._seq), job))
+                    self._cond.notify()
+                    continue
+            job.future.set_exception(CancelledError())
+
+    def _next(self) -> _Job | None:
+        """Highest-priority job that is due; waits for one.  Called holding the condition."""
+        while not self._closed:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, seq, job = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (job.priority, seq, job))
+            if self._ready:
+                return heapq.heappop(self._ready)[2]
+            self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+        return None
+
+    def _attempt(self, job: _Job) -> Exception | None:
+        """One try of job: settles its future, or returns the error if it is to be retried."""
+        try:
+            result = job.work()
+        except Exception as e:
+            job.tries += 1
+            if job.tries < job.attempts and not self._closed and is_transient(e):
+                logger.info("Request failed (%s), retry %d of %d", e, job.tries, job.attempts - 1)
+                return e
+            self._forget(job)
+            job.future.set_exception(e)
+        else:
+            self._forget(job)
+            job.future.set_result(result)
+        return None
+
+    def _forget(self, job: _Job):
+        if job.key is not None:
+            with self._cond:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+
+
+class Outbox:
+    """
+    Mutating calls waiting for a server answer, oldest first, keyed by their
+    Idempotency-Key.  Every row records the account (owner) whose credentials
+    may send it; other accounts' rows wait until that account signs in again.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(Path(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        if columns and "owner" not in columns:
+            # Rows from before owners were recorded cannot be attributed to anyone
+            self._conn.execute("DROP TABLE outbox")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                idempotency_key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                op TEXT NOT NULL,
+                method TEXT NOT NULL,
+                path TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def add(self, key: str, owner: str, op: str, method: str, path: str, body: dict):
+        """Record a call before it is first sent; adding the same key again is a no-op."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, owner, op, method, path, body, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (key, owner, op, method, path, json.dumps(body), time.time()))
+
+    def remove(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE idempotency_key = ?", (key,))
+
+    def pending(self, owner: str) -> list[tuple[str, str, str, str, dict]]:
+        """(key, op, method, path, body) of every call queued by owner, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idempotency_key, op, method, path, body FROM outbox WHERE owner = ? "
+                "ORDER BY created_at", (owner,)).fetchall()
+        return [(key, op, method, path, json.loads(body)) for key, op, method, path, body in rows]
+
+    def count(self, owner: str | None) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE owner = ?", (owner,)).fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox")
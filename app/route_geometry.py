@@ -0,0 +1,265 @@
+# route_geometry.py
+"""
+route_geometry.py
+
+Route shapes and stops as NumPy arrays, decoded once and then loaded
+memory-mapped.
+
+The same route exists in three source formats under routes/: a GeoJSON
+FeatureCollection (one LineString, Point features for stops), a Google My
+Maps KML export (same placemarks), and the mygeodata CSV (stops only, one
+X,Y,Z,Name row each).  All three parse into a RouteGeometry: a float64
+(N, 2) lon/lat line and (M, 2) stop positions with their names.  The
+constant z=0 the exports carry on every vertex is dropped.
+
+Parsed routes are cached as plain .npy files keyed by the source's file
+name and SHA-1, so later loads are np.load(mmap_mode="r") plus a small JSON
+sidecar.
+
+The line cache also stores every vertex's Douglas-Peucker significance: the
+largest tolerance (in metres) at which the vertex survives simplification.
+Simplifying for a zoom level is then a single comparison against that
+column, with no recursion at draw time.
+"""
+import csv
+import glob
+import hashlib
+import json
+import logging
+import math
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("rts.client.routegeometry")
+
+ROUTES_DIR = Path(__file__).resolve().parent.parent / "routes"
+SOURCE_SUFFIXES = (".json", ".geojson", ".kml", ".csv")
+CACHE_VERSION = 1
+EARTH_RADIUS_M = 6_371_008.8
+# Web-mercator ground resolution at zoom 0, metres per pixel at the equator
+MERCATOR_M_PER_PX = 156_543.034
+ZOOMS = range(10, 19)
+TOLERANCE_PX = 0.5  # simplification error allowed at any zoom, in screen pixels
+
+_KML_NS = "{http://www.opengis.net/kml/2.2}"
+
+
+@dataclass
+class RouteGeometry:
+    name: str
+    line: np.ndarray                      # (N, 2) lon, lat
+    significance: np.ndarray              # (N,) metres, inf for the end points
+    stops: np.ndarray                     # (M, 2) lon, lat
+    stop_names: list[str] = field(default_factory=list)
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        """(min_lon, min_lat, max_lon, max_lat) over the line and the stops."""
+        points = np.concatenate([self.line, self.stops]) if len(self.stops) else self.line
+        if not len(points):
+            return (0.0, 0.0, 0.0, 0.0)
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        return (float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1]))
+
+    def tolerance(self, zoom: int) -> float:
+        """Metres covered by TOLERANCE_PX at this zoom and the route's latitude."""
+        lat = (self.bounds[1] + self.bounds[3]) / 2
+        return TOLERANCE_PX * MERCATOR_M_PER_PX * math.cos(math.radians(lat)) / 2 ** zoom
+
+    def simplified(self, zoom: int) -> np.ndarray:
+        """The line with every vertex that is invisible at this zoom removed."""
+        if not len(self.line):
+            return self.line
+        return self.line[self.significance > self.tolerance(zoom)]
+
+
+# ----- Parsers ---------------------------------------------------------------
+def _xy(coords) -> np.ndarray:
+    array = np.asarray(coords, dtype=np.float64)
+    if array.size == 0:
+        return np.empty((0, 2))
+    return np.ascontiguousarray(array.reshape(len(array), -1)[:, :2])
+
+
+def parse_geojson(path) -> tuple[str, np.ndarray, np.ndarray, list[str]]:
+    data = json.loads(Path(path).read_bytes())
+    features = data.get("features", [data] if data.get("type") == "Feature" else [])
+    name, lines, stops, stop_names = Path(path).stem, [], [], []
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        kind, coords = geometry.get("type"), geometry.get("coordinates", [])
+        label = (feature.get("properties") or {}).get("name", "")
+        if kind == "LineString":
+            lines.append(_xy(coords))
+            name = label or name
+        elif kind == "MultiLineString":
+            lines.extend(_xy(part) for part in coords)
+            name = label or name
+        elif kind == "Point":
+            stops.append(coords[:2])
+            stop_names.append(label)
+    return name, _join(lines), _xy(stops), stop_names
+
+
+def _kml_coordinates(text: str) -> np.ndarray:
+    """'lon,lat[,alt] lon,lat[,alt] ...' -> (N, 2), parsed in one pass."""
+    tuples = text.split()
+    if not tuples:
+        return np.empty((0, 2))
+    width = tuples[0].count(",") + 1
+    values = np.array(",".join(tuples).split(","), dtype=np.float64)
+    return np.ascontiguousarray(values.reshape(-1, width)[:, :2])
+
+
+def parse_kml(path) -> tuple[str, np.ndarray, np.ndarray, list[str]]:
+    name, lines, stops, stop_names = Path(path).stem, [], [], []
+    for _, element in ET.iterparse(path):
+        if element.tag != f"{_KML_NS}Placemark":
+            continue
+        label = element.findtext(f"{_KML_NS}name", default="")
+        for line in element.iter(f"{_KML_NS}LineString"):
+            lines.append(_kml_coordinates(line.findtext(f"{_KML_NS}coordinates", default="")))
+            name = label or name
+        for point in element.iter(f"{_KML_NS}Point"):
+            coords = _kml_coordinates(point.findtext(f"{_KML_NS}coordinates", default=""))
+            if len(coords):
+                stops.append(coords[0])
+                stop_names.append(label)
+        element.clear()
+    return name, _join(lines), _xy(stops), stop_names
+
+
+def parse_csv(path) -> tuple[str, np.ndarray, np.ndarray, list[str]]:
+    """
+    mygeodata export: one X,Y,Z,Name row per feature.  Lines are reduced to a
+    single label point named after the route, which is dropped here; the CSV
+    carries stops only.
+    """
+    name = Path(path).stem
+    stops, stop_names = [], []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            label = (row.get("Name") or "").strip()
+            if label == name:
+                continue
+            stops.append((float(row["X"]), float(row["Y"])))
+            stop_names.append(label)
+    return name, np.empty((0, 2)), _xy(stops), stop_names
+
+
+PARSERS = {".json": parse_geojson, ".geojson": parse_geojson, ".kml": parse_kml, ".csv": parse_csv}
+
+
+def _join(lines: list[np.ndarray]) -> np.ndarray:
+    lines = [line for line in lines if len(line)]
+    return np.concatenate(lines) if lines else np.empty((0, 2))
+
+
+# ----- Simplification --------------------------------------------------------
+def project(lonlat: np.ndarray) -> np.ndarray:
+    """Local equirectangular projection to metres; accurate to well under 1% across a city."""
+    if not len(lonlat):
+        return lonlat
+    lat0 = math.radians(float(lonlat[:, 1].mean()))
+    scale = np.radians(1.0) * EARTH_RADIUS_M
+    return np.column_stack((lonlat[:, 0] * scale * math.cos(lat0), lonlat[:, 1] * scale))
+
+
+def dp_significance(points: np.ndarray) -> np.ndarray:
+    """
+    Douglas-Peucker significance of each vertex of a projected polyline.
+
+    One DP pass with zero tolerance records the distance at which every vertex
+    was split off, capped by its parent's (a vertex can only survive if the
+    segment it was found in did).  DP at tolerance t keeps exactly the
+    vertices whose significance exceeds t.
+    """
+    n = len(points)
+    significance = np.zeros(n)
+    if n == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        inner = points[first + 1:last]
+        start, end = points[first], points[last]
+        segment = end - start
+        length = math.hypot(segment[0], segment[1])
+        if length == 0.0:
+            distances = np.hypot(*(inner - start).T)
+        else:
+            distances = np.abs(segment[0] * (inner[:, 1] - start[1])
+                               - segment[1] * (inner[:, 0] - start[0])) / length
+        split = int(distances.argmax())
+        value = min(float(distances[split]), cap)
+        index = first + 1 + split
+        significance[index] = value
+        stack.append((first, index, value))
+        stack.append((index, last, value))
+    return significance
+
+
+# ----- Cache -----------------------------------------------------------------
+def _default_cache_dir() -> Path:
+    from PySide6.QtCore import QStandardPaths
+
+    return Path(QStandardPaths.writableLocation(QStandardPaths.CacheLocation)) / "routes"
+
+
+def _cache_paths(cache_dir: Path, source: Path, digest: str) -> tuple[Path, Path, Path]:
+    # The full file name: the KML and CSV exports of a route share a stem
+    stem = f"{source.name}-{digest[:16]}"
+    return (cache_dir / f"{stem}.line.npy", cache_dir / f"{stem}.stops.npy",
+            cache_dir / f"{stem}.json")
+
+
+def load_route(path, cache_dir=None) -> RouteGeometry:
+    """Load one route source, parsing it only if no cache for this exact file exists."""
+    source = Path(path)
+    parser = PARSERS.get(source.suffix.lower())
+    if parser is None:
+        raise ValueError(f"unsupported route format: {source.suffix}")
+    cache_dir = Path(cache_dir) if cache_dir is not None else _default_cache_dir()
+    digest = hashlib.sha1(source.read_bytes()).hexdigest()
+    line_path, stops_path, meta_path = _cache_paths(cache_dir, source, digest)
+
+    try:
+        meta = json.loads(meta_path.read_text())
+        if meta.get("version") == CACHE_VERSION:
+            line = np.load(line_path, mmap_mode="r")
+            stops = np.load(stops_path, mmap_mode="r")
+            return RouteGeometry(meta["name"], line[:, :2], line[:, 2], stops, meta["stop_names"])
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning("Ignoring unreadable route cache for %s: %s", source.name, e)
+
+    name, line, stops, stop_names = parser(source)
+    significance = dp_significance(project(line))
+    logger.debug("Parsed %s: %d vertices, %d stops", source.name, len(line), len(stops))
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in cache_dir.glob(f"{glob.escape(source.name)}-{'?' * 16}.*"):
+            stale.unlink()  # entries for earlier versions of this file
+        np.save(line_path, np.column_stack((line, significance)))
+        np.save(stops_path, stops)
+        # The sidecar is written last: its presence marks a complete entry
+        meta_path.write_text(json.dumps({"version": CACHE_VERSION, "name": name,
+                                         "source": source.name, "stop_names": stop_names}))
+    except OSError as e:
+        logger.warning("Cannot cache route geometry for %s: %s", source.name, e)
+    return RouteGeometry(name, line, significance, stops, stop_names)
+
+
+def load_routes(directory=ROUTES_DIR, cache_dir=None) -> dict[str, RouteGeometry]:
+    """Every route source in a directory (recursively), keyed by file name."""
+    routes = {}
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() in SOURCE_SUFFIXES and path.is_file():
+            routes[path.name] = load_route(path, cache_dir)
+    return routes
@@ -0,0 +1,209 @@
+# route_tiles.py
+"""
+route_tiles.py
+
+Pre-rasterized route maps, served to QML as image://tiles/<id>.
+
+build_tiles.py renders every page of the route PDFs into a tile pyramid:
+zoom level z is the page at SCALES[z] pixels per PDF point, cut into
+TILE_SIZE x TILE_SIZE tiles, plus one thumbnail per map.  Everything lives in
+a single SQLite file (TileStore), one BLOB per tile keyed by
+(map, page, zoom, col, row), so the app never parses or renders a PDF to show
+a route.
+
+Image ids understood by TileImageProvider:
+
+    <map>/thumb                      thumbnail of the first page
+    <map>/<page>/<zoom>/<col>/<row>  one tile
+
+RouteMaps exposes the pyramid geometry to TileMapView.qml, which only asks
+for the tiles that intersect the viewport.
+"""
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from PySide6.QtCore import QObject, QSize, Slot
+from PySide6.QtGui import QImage
+from PySide6.QtQuick import QQuickImageProvider
+
+logger = logging.getLogger("rts.client.tiles")
+
+PROVIDER_ID = "tiles"
+TILE_SIZE = 256
+SCALES = (0.5, 1.0, 2.0, 4.0)  # pixels per PDF point, one entry per zoom level
+THUMB_WIDTH = 320
+DEFAULT_PATH = Path(__file__).resolve().parent / "assets" / "routes" / "tiles.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS maps (
+    name       TEXT PRIMARY KEY,
+    source     TEXT NOT NULL,   -- sha1 of the PDF the pyramid was built from
+    pages      INTEGER NOT NULL,
+    thumbnail  BLOB
+);
+CREATE TABLE IF NOT EXISTS levels (
+    name   TEXT NOT NULL,
+    page   INTEGER NOT NULL,
+    zoom   INTEGER NOT NULL,
+    width  INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    PRIMARY KEY (name, page, zoom)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tiles (
+    name  TEXT NOT NULL,
+    page  INTEGER NOT NULL,
+    zoom  INTEGER NOT NULL,
+    col   INTEGER NOT NULL,
+    row   INTEGER NOT NULL,
+    data  BLOB NOT NULL,
+    PRIMARY KEY (name, page, zoom, col, row)
+) WITHOUT ROWID;
+"""
+
+
+class TileStore:
+    """Tile pyramid storage.  Reads may come from several image-loader threads."""
+
+    def __init__(self, path=DEFAULT_PATH, readonly: bool = False):
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{self._path}?mode=ro", uri=True,
+                                         check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    # ----- Queries -----------------------------------------------------------
+    def source(self, name: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT source FROM maps WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT name FROM maps WHERE source != '' ORDER BY name")]
+
+    def levels(self, name: str, page: int = 0) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT zoom, width, height FROM levels WHERE name = ? AND page = ? ORDER BY zoom",
+                (name, page)).fetchall()
+        return [{"zoom": z, "width": w, "height": h} for z, w, h in rows]
+
+    def thumbnail(self, name: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute("SELECT thumbnail FROM maps WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def tile(self, name: str, page: int, zoom: int, col: int, row: int) -> bytes | None:
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT data FROM tiles WHERE name = ? AND page = ? AND zoom = ? AND col = ? AND row = ?",
+                (name, page, zoom, col, row)).fetchone()
+        return found[0] if found else None
+
+    # ----- Build -------------------------------------------------------------
+    def replace_map(self, name: str, pages: int, thumbnail: bytes):
+        """Start (re)building a map: drop its old pyramid.  The source stays empty until finish_map."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tiles WHERE name = ?", (name,))
+            self._conn.execute("DELETE FROM levels WHERE name = ?", (name,))
+            self._conn.execute("INSERT OR REPLACE INTO maps (name, source, pages, thumbnail) "
+                               "VALUES (?, '', ?, ?)", (name, pages, thumbnail))
+
+    def finish_map(self, name: str, source: str):
+        """Mark a map complete, so an interrupted build is redone next time."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE maps SET source = ? WHERE name = ?", (source, name))
+
+    def add_level(self, name: str, page: int, zoom: int, width: int, height: int, tiles):
+        """Store one rendered level; tiles is an iterable of (col, row, data)."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO levels (name, page, zoom, width, height) "
+                               "VALUES (?, ?, ?, ?, ?)", (name, page, zoom, width, height))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tiles (name, page, zoom, col, row, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [(name, page, zoom, col, row, data) for col, row, data in tiles])
+
+    def vacuum(self):
+        """Compact after a build and leave a single self-contained file (no -wal/-shm)."""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute("VACUUM")
+
+
+class TileImageProvider(QQuickImageProvider):
+    """Decodes single tiles on request; QML's pixmap cache keeps the recent ones."""
+
+    def __init__(self, store: TileStore | None):
+        super().__init__(QQuickImageProvider.ImageType.Image)
+        self._store = store
+
+    def requestImage(self, id: str, size: QSize, requestedSize: QSize) -> QImage:
+        image = QImage()
+        if self._store is not None:
+            parts = id.split("/")
+            try:
+                if len(parts) == 2 and parts[1] == "thumb":
+                    data = self._store.thumbnail(parts[0])
+                else:
+                    name, page, zoom, col, row = parts
+                    data = self._store.tile(name, int(page), int(zoom), int(col), int(row))
+            except ValueError:
+                data = None
+            if data:
+                image = QImage.fromData(data)
+        if image.isNull():
+            logger.warning("Unknown tile requested: %s", id)
+        if size is not None:
+            size.setWidth(image.width())
+            size.setHeight(image.height())
+        return image
+
+
+class RouteMaps(QObject):
+    """Pyramid geometry for QML; maps without tiles fall back to the PDF viewer."""
+
+    def __init__(self, store: TileStore | None):
+        super().__init__()
+        self._store = store
+        self._names = None  # read on first use, not during start-up
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH) -> "tuple[RouteMaps, TileImageProvider]":
+        """Open the built tile store if there is one; both objects work without it."""
+        store = None
+        if Path(path).exists():
+            try:
+                store = TileStore(path, readonly=True)
+            except sqlite3.Error as e:
+                logger.warning("Cannot open tile store %s: %s", path, e)
+        else:
+            logger.info("No tile store at %s, route maps open as PDFs", path)
+        return cls(store), TileImageProvider(store)
+
+    def _built(self) -> set[str]:
+        if self._names is None:
+            self._names = set(self._store.names()) if self._store is not None else set()
+        return self._names
+
+    @Slot(str, result=bool)
+    def has(self, name):
+        return name in self._built()
+
+    @Slot(str, result="QVariantList")
+    def levels(self, name):
+        if not self.has(name):
+            return []
+        return self._store.levels(name)
+
+    @Slot(result=int)
+    def tileSize(self):
+        return TILE_SIZE
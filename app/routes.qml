@@ -32,6 +32,7 @@ Item {
                     font.pointSize: 16
                     font.bold: true
                     text: modelData.name
+                    readonly property bool tiled: RouteMaps.has(modelData.file)
 
                     background: Rectangle {
                         color: Theme.buttonBackground
@@ -40,18 +41,55 @@ Item {
                         border.width: 1
                     }
 
-                    contentItem: Text {
-                        text: modelData.name
-                        anchors.centerIn: parent
-                        color: Theme.buttonText
-                        font.pointSize: 18
-                        font.bold: true
+                    contentItem: Row {
+                        spacing: 12
+                        Image {
+                            visible: tiled
+                            height: parent.height
+                            fillMode: Image.PreserveAspectFit
+                            // Not asynchronous: thumbnails are tiny, and an async Image
+                            // here intermittently hung the page's creation from Python
+                            source: tiled ? "image://tiles/" + modelData.file + "/thumb" : ""
+                            sourceSize.height: 48
+                        }
+                        Text {
+                            text: modelData.name
+                            anchors.verticalCenter: parent.verticalCenter
+                            color: Theme.buttonText
+                            font.pointSize: 18
+                            font.bold: true
+                        }
                     }
 
-                    onClicked: backend.open_pdf_viewer(modelData.file)
+                    // Pre-rendered tiles when the asset build produced them, the PDF otherwise
+                    onClicked: tiled ? mapLoader.mapName = modelData.file
+                                     : backend.open_pdf_viewer(modelData.file)
                 }
             }
         }
     }
+
+    Loader {
+        id: mapLoader
+        property string mapName: ""
+        anchors.fill: parent
+        active: mapName !== ""
+        sourceComponent: Rectangle {
+            color: Theme.background
+
+            TileMapView {
+                anchors.fill: parent
+                mapName: mapLoader.mapName
+            }
+
+            Button {
+                text: "✕"
+                anchors.top: parent.top
+                anchors.right: parent.right
+                anchors.margins: 12
+                onClicked: mapLoader.mapName = ""
+            }
+        }
+    }
 }
 
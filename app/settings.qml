@@ -10,6 +10,14 @@ Rectangle {
     color: Theme.background
 
     property alias selectedTheme: themeSelector.currentText
+    // Hidden diagnostics panel: tap the "Settings" title five times to toggle
+    property bool diagnosticsVisible: false
+    property int titleTaps: 0
+    property var diagnosticRows: []
+
+    function refreshDiagnostics() {
+        diagnosticRows = Diagnostics.summary()
+    }
 
     ColumnLayout {
         anchors.fill: parent
@@ -21,6 +29,25 @@ Rectangle {
             font.pixelSize: 24
             font.bold: true
             color: Theme.text
+
+            MouseArea {
+                anchors.fill: parent
+                onClicked: {
+                    settingsPage.titleTaps += 1
+                    tapReset.restart()
+                    if (settingsPage.titleTaps >= 5) {
+                        settingsPage.titleTaps = 0
+                        settingsPage.diagnosticsVisible = !settingsPage.diagnosticsVisible
+                        if (settingsPage.diagnosticsVisible)
+                            settingsPage.refreshDiagnostics()
+                    }
+                }
+            }
+            Timer {
+                id: tapReset
+                interval: 1500
+                onTriggered: settingsPage.titleTaps = 0
+            }
         }
 
         // Theme selection
@@ -28,14 +55,14 @@ Rectangle {
             id: themeSelector
             Layout.fillWidth: true
             model: ThemeList
-            currentIndex: ThemeList.indexOf(Theme.currentTheme)
-            onCurrentTextChanged: Theme.setTheme(currentText)
+            currentIndex: ThemeList.indexOf(ThemeController.currentTheme)
+            onCurrentTextChanged: ThemeController.setTheme(currentText)
         }
         // Keep QML dropdown in sync if theme changed from outside
         Connections {
-            target: Theme
-            function onCurrentThemeChanged() {
-                let idx = ThemeList.indexOf(Theme.currentTheme)
+            target: ThemeController
+            function onThemeChanged() {
+                let idx = ThemeList.indexOf(ThemeController.currentTheme)
                 if (idx >= 0 && themeSelector.currentIndex !== idx)
                     themeSelector.currentIndex = idx
             }
@@ -59,6 +86,7 @@ Rectangle {
             text: "Logout"
             Layout.fillWidth: true
             onClicked: {
+                Network.logout()
                 infoPopup.text = "You have been logged out."
                 infoPopup.open()
                 controller.loadPage("login.qml")
@@ -81,6 +109,95 @@ Rectangle {
             Layout.fillWidth: true
             onClicked: controller.loadPage("home.qml")
         }
+
+        // Diagnostics: latency quantiles per operation (see metrics.py)
+        ColumnLayout {
+            visible: settingsPage.diagnosticsVisible
+            Layout.fillWidth: true
+            Layout.fillHeight: true
+            spacing: 8
+
+            RowLayout {
+                Layout.fillWidth: true
+                Label {
+                    text: "Diagnostics"
+                    font.pixelSize: 18
+                    font.bold: true
+                    color: Theme.text
+                    Layout.fillWidth: true
+                }
+                Switch {
+                    text: "Tracing"
+                    checked: Diagnostics.enabled
+                    onToggled: Diagnostics.enabled = checked
+                }
+            }
+
+            Label {
+                text: "operation                      count    p50 ms    p95 ms    p99 ms"
+                font.family: "monospace"
+                color: Theme.placeholder
+            }
+            ListView {
+                Layout.fillWidth: true
+                Layout.fillHeight: true
+                Layout.minimumHeight: 120
+                clip: true
+                model: settingsPage.diagnosticRows
+                delegate: Label {
+                    width: ListView.view.width
+                    font.family: "monospace"
+                    color: modelData.errors > 0 ? Theme.accent : Theme.text
+                    text: modelData.op.padEnd(28).substring(0, 28)
+                          + String(modelData.count).padStart(8)
+                          + modelData.p50.toFixed(1).padStart(10)
+                          + modelData.p95.toFixed(1).padStart(10)
+                          + modelData.p99.toFixed(1).padStart(10)
+                }
+                Label {
+                    anchors.centerIn: parent
+                    visible: parent.count === 0
+                    text: Diagnostics.enabled ? "No samples yet" : "Tracing is off"
+                    color: Theme.placeholder
+                }
+            }
+            // Poll only while the panel is open and something is being recorded
+            Timer {
+                interval: 1000
+                repeat: true
+                running: settingsPage.diagnosticsVisible && Diagnostics.enabled
+                onTriggered: settingsPage.refreshDiagnostics()
+            }
+
+            RowLayout {
+                Layout.fillWidth: true
+                Button {
+                    text: "Export Prometheus"
+                    Layout.fillWidth: true
+                    onClicked: {
+                        let path = Diagnostics.exportTo("prom")
+                        infoPopup.text = path ? "Saved " + path : "Export failed"
+                        infoPopup.open()
+                    }
+                }
+                Button {
+                    text: "Export JSON lines"
+                    Layout.fillWidth: true
+                    onClicked: {
+                        let path = Diagnostics.exportTo("jsonl")
+                        infoPopup.text = path ? "Saved " + path : "Export failed"
+                        infoPopup.open()
+                    }
+                }
+                Button {
+                    text: "Reset"
+                    onClicked: {
+                        Diagnostics.reset()
+                        settingsPage.refreshDiagnostics()
+                    }
+                }
+            }
+        }
     }
 
     // Reusable popup
@@ -106,6 +223,7 @@ Rectangle {
 
             Text {
                 id: popupText
+                width: infoPopup.width - 40
                 text: infoPopup.text
                 color: Theme.text
                 font.pixelSize: 16
@@ -0,0 +1,42 @@
+# startup_profile.py
+"""
+startup_profile.py
+
+Phase timer for application start-up, reported by `main.py --startup-profile`.
+
+main.py records the clock before its first import and marks each phase as it
+completes (imports, QApplication, context objects, engine load, first frame,
+background wallet load).  The report lists each phase's own duration and the
+cumulative time since process start.
+"""
+import logging
+import sys
+import time
+
+logger = logging.getLogger("rts.client.startup")
+
+
+class StartupProfiler:
+    def __init__(self, t0: float | None = None, enabled: bool = True):
+        self._t0 = time.perf_counter() if t0 is None else t0
+        self._last = self._t0
+        self._phases: list[tuple[str, float, float]] = []   # (name, duration, cumulative)
+        self.enabled = enabled
+
+    def mark(self, phase: str):
+        """Close the phase that has been running since the previous mark."""
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last, now - self._t0))
+        self._last = now
+        logger.debug("Startup phase %s done at %.1f ms", phase, (now - self._t0) * 1000)
+
+    def report(self, title: str = "Startup profile") -> str:
+        width = max([len(name) for name, _, _ in self._phases] + [5])
+        lines = [title, f"  {'phase':<{width}}  {'ms':>8}  {'total':>8}"]
+        for name, duration, cumulative in self._phases:
+            lines.append(f"  {name:<{width}}  {duration * 1000:8.1f}  {cumulative * 1000:8.1f}")
+        return "\n".join(lines)
+
+    def print_report(self, title: str = "Startup profile"):
+        if self.enabled:
+            print(self.report(title), file=sys.stderr, flush=True)
@@ -0,0 +1,256 @@
+# stop_index.py
+"""
+stop_index.py
+
+Nearest-stop queries over all known stops.
+
+StopIndex buckets stops into a uniform lat/lon grid (CELL_M metres on a side).
+Stops are sorted by cell, so each grid row is one contiguous run of that array
+and a bounding-box lookup is one np.searchsorted pair per grid row.  Only
+stops from the touched cells are measured, with a single vectorized haversine
+call.
+
+    index = StopIndex.from_routes()          # every stop in routes/, deduplicated
+    rows, metres = index.nearest(lon, lat, k=3)
+    rows, metres = index.within(lon, lat, 400)
+    index.names[rows[0]]
+
+The batch API (nearest_batch / within_batch) answers thousands of points at
+once for analytics.  Queries are grouped by grid cell, and each group is
+measured against its candidate stops with one matrix multiply of unit
+vectors.  The nearest stop has the largest dot product, and the chord length
+converts back to great-circle metres exactly.
+"""
+import logging
+import math
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger("rts.client.stopindex")
+
+EARTH_RADIUS_M = 6_371_008.8
+CELL_M = 500.0
+BATCH_CELLS = 4_000_000  # query x stop products per matrix multiply in the batch API (32 MB)
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres; all arguments broadcast."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def unit_vectors(lonlat: np.ndarray) -> np.ndarray:
+    lon, lat = np.radians(lonlat[:, 0]), np.radians(lonlat[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def _chord_to_m(dot: np.ndarray) -> np.ndarray:
+    chord = np.sqrt(np.clip(2.0 - 2.0 * dot, 0.0, 4.0))
+    return 2 * EARTH_RADIUS_M * np.arcsin(chord / 2)
+
+
+class StopIndex:
+    def __init__(self, lonlat, names=None, cell_m: float = CELL_M):
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        self.names = list(names) if names is not None else [""] * len(lonlat)
+        if len(self.names) != len(lonlat):
+            raise ValueError("one name per stop expected")
+        self.lonlat = lonlat
+        self._xyz = unit_vectors(lonlat) if len(lonlat) else np.empty((0, 3))
+
+        # Grid geometry: cell edges in degrees at the stops' mean latitude
+        lat0 = float(lonlat[:, 1].mean()) if len(lonlat) else 0.0
+        self._dlat = math.degrees(cell_m / EARTH_RADIUS_M)
+        self._dlon = self._dlat / max(math.cos(math.radians(lat0)), 1e-6)
+        self._origin = lonlat.min(axis=0) if len(lonlat) else np.zeros(2)
+        extent = (lonlat.max(axis=0) - self._origin) if len(lonlat) else np.zeros(2)
+        self._cols = int(extent[0] // self._dlon) + 1
+        self._rows = int(extent[1] // self._dlat) + 1
+        self._density = len(lonlat) / (self._cols * self._rows * cell_m * cell_m)  # stops per m²
+
+        col, row = self._cell(lonlat[:, 0], lonlat[:, 1])
+        keys = row * self._cols + col
+        self._order = np.argsort(keys, kind="stable")      # stop rows, grouped by cell
+        self._keys = keys[self._order]
+        logger.debug("Indexed %d stops in a %dx%d grid", len(lonlat), self._cols, self._rows)
+
+    def __len__(self) -> int:
+        return len(self.lonlat)
+
+    @classmethod
+    def from_routes(cls, directory=None, cache_dir=None) -> "StopIndex":
+        """Index every stop in the route sources, one entry per distinct position."""
+        import route_geometry
+
+        routes = route_geometry.load_routes(directory or route_geometry.ROUTES_DIR, cache_dir)
+        points, names = [], []
+        for route in routes.values():
+            points.extend(np.asarray(route.stops).tolist())
+            names.extend(route.stop_names)
+        if not points:
+            return cls(np.empty((0, 2)), [])
+        # The same stop appears in each export of a route; keep the first copy
+        _, first = np.unique(np.round(np.asarray(points), 6), axis=0, return_index=True)
+        first.sort()
+        return cls(np.asarray(points)[first], [names[i] for i in first])
+
+    # ----- Grid --------------------------------------------------------------
+    def _cell(self, lon, lat):
+        col = np.clip(np.floor((np.asarray(lon) - self._origin[0]) / self._dlon), 0, self._cols - 1)
+        row = np.clip(np.floor((np.asarray(lat) - self._origin[1]) / self._dlat), 0, self._rows - 1)
+        return col.astype(np.int64), row.astype(np.int64)
+
+    @staticmethod
+    def _pad(radius_m: float, lat: float) -> tuple[float, float]:
+        """(dlon, dlat) degrees that cover radius_m everywhere up to latitude lat."""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        poleward = min(abs(lat) + dlat, 89.9)
+        return dlat / math.cos(math.radians(poleward)), dlat
+
+    def _box(self, lon0: float, lat0: float, lon1: float, lat1: float) -> np.ndarray:
+        """Rows of every stop in the cells overlapping a lon/lat box."""
+        col0, row0 = self._cell(lon0, lat0)
+        col1, row1 = self._cell(lon1, lat1)
+        rows = np.arange(row0, row1 + 1) * self._cols
+        starts = np.searchsorted(self._keys, rows + col0, side="left")
+        ends = np.searchsorted(self._keys, rows + col1, side="right")
+        if not len(starts):
+            return np.empty(0, dtype=np.int64)
+        return self._order[np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])]
+
+    def _candidates(self, lon: float, lat: float, radius_m: float) -> np.ndarray:
+        """Rows of every stop that may lie within radius_m of (lon, lat)."""
+        dlon, dlat = self._pad(radius_m, lat)
+        return self._box(lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+    def _first_radius(self, k: int) -> float:
+        """Radius expected to hold k stops at the index's mean density; the search starts there."""
+        return max(CELL_M, math.sqrt(k / (math.pi * self._density)))
+
+    # ----- Single-point queries ----------------------------------------------
+    def within(self, lon: float, lat: float, radius_m: float) -> tuple[np.ndarray, np.ndarray]:
+        """Stops within radius_m, nearest first, as (rows, metres)."""
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        rows = self._candidates(lon, lat, radius_m)
+        metres = haversine_m(lon, lat, self.lonlat[rows, 0], self.lonlat[rows, 1])
+        keep = metres <= radius_m
+        rows, metres = rows[keep], metres[keep]
+        order = np.argsort(metres, kind="stable")
+        return rows[order], metres[order]
+
+    def nearest(self, lon: float, lat: float, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """The k nearest stops, nearest first, as (rows, metres)."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # Widen the search radius until it provably holds k stops or the box covers every cell
+        radius = self._first_radius(k)
+        while True:
+            rows = self._candidates(lon, lat, radius)
+            metres = haversine_m(lon, lat, self.lonlat[rows, 0], self.lonlat[rows, 1])
+            if np.count_nonzero(metres <= radius) >= k or len(rows) == len(self):
+                break
+            radius *= 2
+        top = np.argsort(metres, kind="stable")[:k]
+        return rows[top], metres[top]
+
+    # ----- Batch queries -----------------------------------------------------
+    def _groups(self, points: np.ndarray) -> list[np.ndarray]:
+        """Query rows grouped by grid cell; each group shares one candidate set."""
+        col, row = self._cell(points[:, 0], points[:, 1])
+        keys = row * self._cols + col
+        order = np.argsort(keys, kind="stable")
+        return np.split(order, np.flatnonzero(np.diff(keys[order])) + 1)
+
+    def _group_candidates(self, points: np.ndarray, radius_m: float) -> np.ndarray:
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        dlon, dlat = self._pad(radius_m, max(abs(lo[1]), abs(hi[1])))
+        return self._box(lo[0] - dlon, lo[1] - dlat, hi[0] + dlon, hi[1] + dlat)
+
+    def _dots(self, points: np.ndarray, candidates: np.ndarray):
+        """Yield (first query row, dot products) blocks of at most BATCH_CELLS entries."""
+        xyz = self._xyz[candidates]
+        step = max(1, BATCH_CELLS // max(1, len(candidates)))
+        for start in range(0, len(points), step):
+            yield start, unit_vectors(points[start:start + step]) @ xyz.T
+
+    def _dense_nearest(self, points, candidates, k) -> tuple[np.ndarray, np.ndarray]:
+        rows = np.empty((len(points), k), dtype=np.int64)
+        metres = np.empty((len(points), k))
+        for start, dots in self._dots(points, candidates):
+            block = slice(start, start + len(dots))
+            if k < len(candidates):
+                top = np.argpartition(-dots, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(k), (len(dots), k))
+            top_dots = np.take_along_axis(dots, top, axis=1)
+            order = np.argsort(-top_dots, axis=1, kind="stable")
+            rows[block] = candidates[np.take_along_axis(top, order, axis=1)]
+            metres[block] = _chord_to_m(np.take_along_axis(top_dots, order, axis=1))
+        return rows, metres
+
+    def nearest_batch(self, points, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """k nearest stops for each (lon, lat) row: (Q, k) rows and (Q, k) metres, nearest first."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        k = min(k, len(self))
+        rows = np.empty((len(points), k), dtype=np.int64)
+        metres = np.empty((len(points), k))
+        if k <= 0 or not len(points):
+            return rows, metres
+        # Same widening search as nearest(), per cell group: a query is settled once
+        # its k-th stop lies inside the searched radius (or everything was searched)
+        pending, radius = self._groups(points), self._first_radius(k)
+        while pending:
+            retry = []
+            for group in pending:
+                candidates = self._group_candidates(points[group], radius)
+                searched_all = len(candidates) == len(self)
+                if len(candidates) < k and not searched_all:
+                    retry.append(group)
+                    continue
+                found, distances = self._dense_nearest(points[group], candidates, k)
+                settled = searched_all | (distances[:, -1] <= radius)
+                rows[group[settled]] = found[settled]
+                metres[group[settled]] = distances[settled]
+                if not settled.all():
+                    retry.append(group[~settled])
+            pending, radius = retry, radius * 2
+        return rows, metres
+
+    def within_batch(self, points, radius_m: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Every (query, stop) pair at most radius_m apart, as flat arrays
+        (query rows, stop rows, metres) ordered by query, nearest first.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        if not len(self) or not len(points):
+            return empty
+        # Compare dot products against the threshold instead of converting every pair
+        min_dot = math.cos(min(radius_m / EARTH_RADIUS_M, math.pi))
+        queries, stops, metres = [], [], []
+        for group in self._groups(points):
+            candidates = self._group_candidates(points[group], radius_m)
+            if not len(candidates):
+                continue
+            for start, dots in self._dots(points[group], candidates):
+                q, s = np.nonzero(dots >= min_dot)
+                queries.append(group[start + q])
+                stops.append(candidates[s])
+                metres.append(_chord_to_m(dots[q, s]))
+        if not queries:
+            return empty
+        queries, stops, metres = np.concatenate(queries), np.concatenate(stops), np.concatenate(metres)
+        order = np.lexsort((metres, queries))
+        return queries[order], stops[order], metres[order]
+
+
+@lru_cache(maxsize=1)
+def default_index() -> StopIndex:
+    """The stop index for the bundled routes, built on first use and then shared."""
+    return StopIndex.from_routes()
@@ -1,6 +1,7 @@
 # theme_manager.py
 # Handles loading and saving the selected theme persistently within the app directory.
 # Provides simple accessors for the currently selected theme.
+# colors.json is parsed once, when the manager is created.
 
 import json
 from pathlib import Path
@@ -53,14 +54,11 @@ class ThemeManager:
         return self._theme
 
     def get_theme_data(self):
-        try:
-            with open(self.colors_path, "r") as f:
-                themes = json.load(f)
-                return themes.get(self._theme, {})
-        except Exception as e:
-            print(f"Error loading theme data: {e}")
-            return {}
+        return self._colors.get(self._theme, {})
 
+    def themes(self):
+        """Every theme's colors as parsed from colors.json, by theme name."""
+        return self._colors
 
     def get_color(self, key):
         return self._colors.get(self._theme, {}).get(key, "#ff00ff")  # Magenta fallback
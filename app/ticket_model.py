@@ -0,0 +1,195 @@
+# ticket_model.py
+"""
+ticket_model.py
+
+QAbstractListModel behind the wallet's ListView.
+
+Tickets arrive from two sources: the server list (NetworkManager.ticketsFetched)
+and the local wallet (WalletStore.walletLoaded / walletUpdated).  Each source
+replaces only its own contribution; rows are matched by ticket_id and the
+model emits row inserts, removals and per-role dataChanged for exactly the
+tickets that changed, so QML keeps every other delegate as it is.
+
+The remaining (countdown text) and expired roles are computed from the
+clock on read.  An ExpiryScheduler tells the model when they change: at a
+ticket's expiry, and at countdown rollovers for the tickets delegates have
+asked to watch.
+"""
+import logging
+import time
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QByteArray, Signal, Slot, Property
+from expiry_scheduler import ExpiryScheduler, countdown
+import ticket_payload
+
+logger = logging.getLogger("rts.client.ticketmodel")
+
+ROLES = ["ticket_id", "ticket_type", "issued_at", "expires_at", "payload", "source"]
+CLOCK_ROLES = ["remaining", "expired"]
+ROLE_IDS = {name: Qt.UserRole + 1 + i for i, name in enumerate(ROLES + CLOCK_ROLES)}
+
+SERVER = "server"
+LOCAL = "local"
+
+
+def _normalize(ticket: dict) -> dict:
+    """Map a server or local ticket dict onto the model's role names."""
+    payload = ticket.get("payload", "") or ""
+    record = ticket_payload.parse_ticket(payload) if payload else {}
+    fields = {
+        "ticket_id": str(ticket.get("ticket_id") or record.get("ticket_id")
+                         or (ticket_payload.ticket_id(payload) if payload else "")),
+        "ticket_type": ticket.get("ticket_type") or ticket.get("type") or record.get("ticket_type", ""),
+        "issued_at": ticket.get("issued_at") or record.get("issued_at") or ticket.get("purchasedAt", ""),
+        "expires_at": ticket.get("expires_at") or record.get("expires_at") or "",
+        "payload": payload,
+    }
+    expires = ticket_payload.expiry(fields)
+    fields["expires_ts"] = expires.timestamp() if expires else None
+    return fields
+
+
+class _Row:
+    __slots__ = ("parts", "values")
+
+    def __init__(self):
+        self.parts: dict[str, dict] = {}
+        self.values: dict = {}
+
+    def merge(self) -> dict:
+        """Local fields first, server fields win wherever they are set."""
+        merged = {}
+        for source in (LOCAL, SERVER):
+            for key, value in self.parts.get(source, {}).items():
+                if value or key not in merged:
+                    merged[key] = value
+        merged["source"] = "+".join(s for s in (SERVER, LOCAL) if s in self.parts)
+        return merged
+
+
+class TicketListModel(QAbstractListModel):
+    countChanged = Signal()
+
+    def __init__(self, parent=None, clock=time.time):
+        super().__init__(parent)
+        self._rows: list[_Row] = []
+        self._index: dict[str, int] = {}
+        self._clock = clock
+        self._expiry = ExpiryScheduler(self, clock)
+        self._expiry.expired.connect(lambda ticket_id: self._clock_changed(ticket_id, CLOCK_ROLES))
+        self._expiry.countdownChanged.connect(lambda ticket_id: self._clock_changed(ticket_id, ["remaining"]))
+
+    # ----- QAbstractListModel ------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return None
+        values = self._rows[index.row()].values
+        if role == Qt.DisplayRole:
+            return values.get("ticket_id")
+        if role in (ROLE_IDS["remaining"], ROLE_IDS["expired"]):
+            expires = values.get("expires_ts")
+            left = float("inf") if expires is None else expires - self._clock()
+            if role == ROLE_IDS["expired"]:
+                return left <= 0
+            return countdown(left) if expires is not None else ""
+        for name, role_id in ROLE_IDS.items():
+            if role_id == role:
+                return values.get(name)
+        return None
+
+    def roleNames(self):
+        return {role_id: QByteArray(name.encode()) for name, role_id in ROLE_IDS.items()}
+
+    @Property(int, notify=countChanged)
+    def count(self) -> int:
+        return len(self._rows)
+
+    @Slot(int, result="QVariant")
+    def get(self, row: int):
+        """Row values as a JS object, for QML code outside a delegate."""
+        return dict(self._rows[row].values) if 0 <= row < len(self._rows) else None
+
+    @Slot(str, bool)
+    def watch(self, ticket_id: str, watched: bool):
+        """Delegates call this as they appear and go away, so only on-screen countdowns tick."""
+        self._expiry.watch(ticket_id, watched)
+
+    def _clock_changed(self, ticket_id: str, roles: list[str]):
+        row = self._index.get(ticket_id)
+        if row is not None:
+            idx = self.index(row, 0)
+            self.dataChanged.emit(idx, idx, [ROLE_IDS[r] for r in roles])
+
+    # ----- Merging -------------------------------------------------------------
+    @Slot(list)
+    def setServerTickets(self, tickets: list):
+        self._replace(SERVER, tickets)
+
+    @Slot(list)
+    def setLocalTickets(self, tickets: list):
+        self._replace(LOCAL, tickets)
+
+    def _replace(self, source: str, tickets: list):
+        """Make `source`'s contribution equal to tickets, touching only rows that differ."""
+        incoming = {}
+        for ticket in tickets:
+            fields = _normalize(ticket)
+            if fields["ticket_id"]:
+                incoming[fields["ticket_id"]] = fields
+        count_before = len(self._rows)
+        inserted = removed = updated = 0
+
+        # Drop this source from rows it no longer lists; remove rows left empty
+        for row in range(len(self._rows) - 1, -1, -1):
+            entry = self._rows[row]
+            if source not in entry.parts or entry.values["ticket_id"] in incoming:
+                continue
+            del entry.parts[source]
+            if entry.parts:
+                updated += self._refresh(row)
+            else:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+                removed += 1
+        if removed:
+            self._index = {r.values["ticket_id"]: i for i, r in enumerate(self._rows)}
+
+        for ticket_id, fields in incoming.items():
+            row = self._index.get(ticket_id)
+            if row is None:
+                entry = _Row()
+                entry.parts[source] = fields
+                entry.values = entry.merge()
+                row = len(self._rows)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.append(entry)
+                self._index[ticket_id] = row
+                self.endInsertRows()
+                inserted += 1
+            elif self._rows[row].parts.get(source) != fields:
+                self._rows[row].parts[source] = fields
+                updated += self._refresh(row)
+
+        if len(self._rows) != count_before:
+            self.countChanged.emit()
+        if inserted or removed or updated:
+            self._expiry.sync({r.values["ticket_id"]: r.values.get("expires_ts") for r in self._rows})
+        logger.debug("Merged %d %s tickets: +%d -%d ~%d",
+                     len(incoming), source, inserted, removed, updated)
+
+    def _refresh(self, row: int) -> int:
+        """Recompute a row's merged values; emit dataChanged for the roles that moved."""
+        entry = self._rows[row]
+        merged = entry.merge()
+        changed = [ROLE_IDS[k] for k in ROLES if merged.get(k) != entry.values.get(k)]
+        if merged.get("expires_ts") != entry.values.get("expires_ts"):
+            changed += [ROLE_IDS[k] for k in CLOCK_ROLES]
+        entry.values = merged
+        if not changed:
+            return 0
+        idx = self.index(row, 0)
+        self.dataChanged.emit(idx, idx, changed)
+        return 1
@@ -0,0 +1,198 @@
+# ticket_payload.py
+"""
+ticket_payload.py
+
+Helpers for the signed ticket payloads issued by the backend.
+
+A payload is message || signature, where signature is the 64-byte Ed25519
+signature over message.  Two encodings are in circulation:
+
+  v1  base64(message || signature); message is the JSON ticket record
+      (ticket_id, ticket_type, issued_at, ...).  About 300-500 characters.
+  v2  "RR2:" + base45(message || signature); message is the fixed 27-byte
+      layout below.  All characters are in the QR alphanumeric set, so the
+      code is a low version that renders and scans quickly (141 characters
+      with the prefix).
+
+      offset  size  field
+      0       1     format version (2)
+      1       16    ticket_id (UUID bytes)
+      17      1     ticket_type (TYPE_CODES)
+      18      4     issued_at, Unix seconds, big-endian
+      22      4     expires_at, Unix seconds, 0 = none
+      26      1     rides, 0 = the type's default
+
+split_signed and decode_record accept both, and decode_record turns a v2
+message into the same dict a v1 record gives.  These helpers never verify
+anything: callers check the signature first (WalletStore.validateTicket,
+validator.Validator).
+"""
+import base64
+import hashlib
+import json
+import struct
+import uuid
+from datetime import datetime, timedelta, timezone
+
+SIGNATURE_SIZE = 64
+
+V2_PREFIX = "RR2:"
+V2_VERSION = 2
+V2_LAYOUT = struct.Struct(">B16sBIIB")
+TYPE_CODES = {"single_use": 1, "ten_ride": 2, "monthly_pass": 3, "day_pass": 4}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+# RFC 9285: exactly the 45 characters of the QR alphanumeric mode
+BASE45 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+_BASE45_VALUES = {c: i for i, c in enumerate(BASE45)}
+
+# Rides a ticket is good for; types not listed are unlimited until they expire
+RIDES = {"single_use": 1, "one_time": 1, "ten_ride": 10}
+# Lifetime from issued_at for types whose record carries no expires_at
+VALID_FOR = {"day_pass": timedelta(days=1), "monthly_pass": timedelta(days=30)}
+
+
+def b45encode(data: bytes) -> str:
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        n = data[i] * 256 + data[i + 1]
+        chars += (BASE45[n % 45], BASE45[n // 45 % 45], BASE45[n // 2025])
+    if len(data) % 2:
+        chars += (BASE45[data[-1] % 45], BASE45[data[-1] // 45])
+    return "".join(chars)
+
+
+def b45decode(text: str) -> bytes:
+    try:
+        values = [_BASE45_VALUES[c] for c in text]
+    except KeyError as e:
+        raise ValueError(f"invalid base45 character {e}") from None
+    tail = len(values) % 3
+    if tail == 1:
+        raise ValueError("invalid base45 length")
+    end = len(values) - tail
+    words = [a + b * 45 + c * 2025 for a, b, c in zip(values[0:end:3], values[1:end:3], values[2:end:3])]
+    if tail:
+        words.append(values[-2] + values[-1] * 45)
+    if max(words, default=0) > 0xFFFF or (tail and words[-1] > 0xFF):
+        raise ValueError("invalid base45 group")
+    out = struct.pack(f">{len(words) - (1 if tail else 0)}H", *words[:end // 3])
+    return out + bytes(words[-1:]) if tail else out
+
+
+def split_signed(payload: str) -> tuple[bytes, bytes]:
+    """Return (message, signature) from a v1 (base64) or v2 (RR2:base45) payload."""
+    if payload.startswith(V2_PREFIX):
+        blob = b45decode(payload[len(V2_PREFIX):])
+    else:
+        blob = base64.b64decode(payload)
+    return blob[:-SIGNATURE_SIZE], blob[-SIGNATURE_SIZE:]
+
+
+def _epoch(moment: datetime | None) -> int:
+    return int(moment.timestamp()) if moment else 0
+
+
+def _iso(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if seconds else ""
+
+
+def pack_record(record: dict) -> bytes:
+    """
+    The v2 message for a ticket record (the issuer's side).  Raises
+    ValueError for anything the fixed layout cannot carry: a ticket_id that
+    is not a UUID, an unknown ticket_type or a missing issued_at.
+    """
+    ticket_type = "single_use" if record.get("ticket_type") == "one_time" else record.get("ticket_type")
+    if ticket_type not in TYPE_CODES:
+        raise ValueError(f"ticket type {ticket_type!r} has no v2 code")
+    issued = parse_time(record.get("issued_at"))
+    if issued is None:
+        raise ValueError("v2 tickets need an issued_at")
+    rides = int(record.get("rides") or 0)
+    return V2_LAYOUT.pack(V2_VERSION, uuid.UUID(str(record["ticket_id"])).bytes, TYPE_CODES[ticket_type],
+                          _epoch(issued), _epoch(parse_time(record.get("expires_at"))), rides)
+
+
+def encode_v2(message: bytes, signature: bytes) -> str:
+    return V2_PREFIX + b45encode(message + signature)
+
+
+def _unpack_record(message: bytes) -> dict:
+    _, raw_id, type_code, issued, expires, rides = V2_LAYOUT.unpack(message)
+    record = {
+        "ticket_id": str(uuid.UUID(bytes=raw_id)),
+        "ticket_type": TYPE_NAMES.get(type_code, f"type_{type_code}"),
+        "issued_at": _iso(issued),
+        "expires_at": _iso(expires),
+    }
+    if rides:
+        record["rides"] = rides
+    return record
+
+
+def parse_ticket(payload: str) -> dict:
+    """Best-effort decode of the ticket record carried by payload; {} if it is opaque."""
+    try:
+        message, _ = split_signed(payload)
+    except Exception:
+        return {}
+    return decode_record(message)
+
+
+def decode_record(message: bytes) -> dict:
+    """The ticket record in a signed message (v2 layout or JSON); {} if it is neither."""
+    if len(message) == V2_LAYOUT.size and message[0] == V2_VERSION:
+        return _unpack_record(message)
+    try:
+        record = json.loads(message)
+    except Exception:
+        return {}
+    if not isinstance(record, dict):
+        return {}
+    # Tolerate the {"ticket": {...}, "signature": ...} envelope as well
+    return record.get("ticket", record) if isinstance(record.get("ticket"), dict) else record
+
+
+def ticket_id(payload: str) -> str:
+    """The ticket's own id when the payload carries one, else a stable digest of the payload."""
+    record_id = parse_ticket(payload).get("ticket_id")
+    if record_id:
+        return str(record_id)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def parse_time(value) -> datetime | None:
+    """
+    A record timestamp as an aware datetime: ISO 8601 ("2025-07-02T18:26:00Z")
+    or the issuer's compact "20250702_1826-0600".  None if empty or unreadable.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    for parse in (lambda v: datetime.fromisoformat(v.replace("Z", "+00:00")),
+                  lambda v: datetime.strptime(v, "%Y%m%d_%H%M%z")):
+        try:
+            moment = parse(value)
+        except ValueError:
+            continue
+        return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    return None
+
+
+def ride_allowance(record: dict) -> int | None:
+    """Rides the ticket is good for in total, or None for unlimited (passes)."""
+    if "rides" in record:
+        try:
+            return int(record["rides"])
+        except (TypeError, ValueError):
+            return 0
+    return RIDES.get(record.get("ticket_type", ""))
+
+
+def expiry(record: dict) -> datetime | None:
+    """When the ticket stops being valid: expires_at, else issued_at + the type's lifetime."""
+    expires = parse_time(record.get("expires_at"))
+    if expires is not None:
+        return expires
+    lifetime = VALID_FOR.get(record.get("ticket_type", ""))
+    issued = parse_time(record.get("issued_at"))
+    return issued + lifetime if lifetime and issued else None
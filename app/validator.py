@@ -0,0 +1,458 @@
+# validator.py
+"""
+validator.py
+
+Offline ticket validator: the on-bus half of Phase III.  Scanned QR payloads
+are checked in batches and each one is answered with a ScanResult:
+
+  valid      signature good, not expired, a ride left (which is now spent)
+  invalid    unreadable payload or bad Ed25519 signature
+  expired    past expires_at, or issued_at + the pass lifetime
+  used       single ride already taken, or all ten rides of a ten_ride used
+  revoked    refunded or cancelled ticket, learned from the last sync
+
+Rides are counted in a UsageLedger (SQLite, WAL) next to the validator, so a
+restart or a dead battery never forgets a scan.  An in-memory Bloom filter
+over every ticket id in the ledger answers "never seen" for the common
+first-scan case without touching the database; only ids the filter may have
+seen are looked up, in one query per batch.  Tickets that are already spent
+or revoked are rejected before their signature is checked.  Signatures are
+verified on a process pool once a batch is large enough to pay for it.
+
+The validator never needs the network.  Every scan is logged with this
+device's id and a sequence number; sync() hands the unsynced scans to an
+exchange callable and merges whatever scans and revocations it returns from
+other devices.  Merging is idempotent, so a sync that is retried or a file
+that is read twice does not count a ride twice.
+
+    python app/validator.py --key public_key.pem --db validator.db [--sync-dir DIR] < scans.txt
+
+reads one payload per line and writes one JSON result per line.
+"""
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import ticket_payload
+
+logger = logging.getLogger("rts.client.validator")
+
+VALID = "valid"
+INVALID = "invalid"
+EXPIRED = "expired"
+USED = "used"
+REVOKED = "revoked"
+
+# Below this many signatures per batch the process pool costs more than it saves
+PARALLEL_VERIFY_MIN = 256
+VERIFY_CHUNK = 128
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    ticket_id TEXT PRIMARY KEY,
+    rides     INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scans (
+    device     TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    ticket_id  TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (device, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revoked (
+    ticket_id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class ScanResult:
+    status: str
+    ticket_id: str = ""
+    ticket_type: str = ""
+    rides_left: int | None = None   # None: unlimited until expiry
+    expires_at: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status == VALID
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over byte strings: no false negatives, about
+    error_rate false positives at capacity.  Two halves of one BLAKE2b digest
+    drive the k probe positions (Kirsch-Mitzenmacher double hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: bytes):
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class UsageLedger:
+    """
+    Rides taken per ticket, the scan log behind them and the revocation list.
+    Same storage pattern as WalletDatabase: one SQLite file in WAL mode, a
+    lock around the shared connection, one transaction per batch.
+    """
+
+    def __init__(self, path, device: str | None = None, expected_tickets: int = 100_000):
+        self._path = Path(path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self._path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.device = device or self._state("device") or uuid.uuid4().hex[:12]
+        self._set_state("device", self.device)
+        self._seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM scans WHERE device = ?", (self.device,)).fetchone()[0]
+        self.revoked = {r[0] for r in self._conn.execute("SELECT ticket_id FROM revoked")}
+        self._rebuild_filter(expected_tickets)
+        logger.debug("Opened usage ledger %s (device %s, %d tickets seen)",
+                     self._path, self.device, len(self._seen))
+
+    def close(self):
+        self._conn.close()
+
+    def _state(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _rebuild_filter(self, expected: int):
+        """Size the filter for twice what is stored (or expected) and load every known id."""
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+            self._seen = BloomFilter(2 * max(expected, stored))
+            for (ticket_id,) in self._conn.execute("SELECT ticket_id FROM usage"):
+                self._seen.add(ticket_id.encode())
+
+    # ----- Queries -----------------------------------------------------------
+    def rides_taken(self, ticket_ids) -> dict[str, int]:
+        """Rides used so far for each id the ledger knows; ids the filter rules out cost nothing."""
+        maybe = [t for t in set(ticket_ids) if t.encode() in self._seen]
+        if not maybe:
+            return {}
+        taken = {}
+        with self._lock:
+            for i in range(0, len(maybe), 500):
+                chunk = maybe[i:i + 500]
+                taken.update(self._conn.execute(
+                    f"SELECT ticket_id, rides FROM usage WHERE ticket_id IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall())
+        return taken
+
+    # ----- Mutations -----------------------------------------------------------
+    def record(self, ticket_ids: list[str], scanned_at: float):
+        """Log one ride for each id (repeats allowed) in a single transaction."""
+        if not ticket_ids:
+            return
+        with self._lock, self._conn:
+            rows = []
+            for ticket_id in ticket_ids:
+                self._seq += 1
+                rows.append((self.device, self._seq, ticket_id, scanned_at))
+            self._conn.executemany(
+                "INSERT INTO scans (device, seq, ticket_id, scanned_at) VALUES (?, ?, ?, ?)", rows)
+            self._count(ticket_ids)
+
+    def _count(self, ticket_ids):
+        self._conn.executemany(
+            "INSERT INTO usage (ticket_id, rides) VALUES (?, 1) "
+            "ON CONFLICT(ticket_id) DO UPDATE SET rides = rides + 1", [(t,) for t in ticket_ids])
+        for ticket_id in ticket_ids:
+            self._seen.add(ticket_id.encode())
+        if len(self._seen) > self._seen.capacity:
+            self._rebuild_filter(len(self._seen))
+
+    def unsynced(self, limit: int = 10_000) -> tuple[list[dict], int]:
+        """This device's scans not yet handed to a sync, and the sequence number they end at."""
+        since = int(self._state("synced_seq") or 0)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, ticket_id, scanned_at FROM scans WHERE device = ? AND seq > ? "
+                "ORDER BY seq LIMIT ?", (self.device, since, limit)).fetchall()
+        scans = [{"device": self.device, "seq": seq, "ticket_id": ticket_id, "scanned_at": at}
+                 for seq, ticket_id, at in rows]
+        return scans, rows[-1][0] if rows else since
+
+    def mark_synced(self, seq: int):
+        self._set_state("synced_seq", str(seq))
+
+    def merge(self, scans: list[dict], revoked: list[str]) -> int:
+        """Apply other devices' scans and the revocation list; returns the number of new scans."""
+        with self._lock, self._conn:
+            fresh = []
+            for scan in scans:
+                if scan.get("device") == self.device:
+                    continue
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO scans (device, seq, ticket_id, scanned_at) VALUES (?, ?, ?, ?)",
+                    (scan["device"], int(scan["seq"]), scan["ticket_id"], float(scan["scanned_at"])))
+                if cur.rowcount:
+                    fresh.append(scan["ticket_id"])
+            self._count(fresh)
+            new_revoked = set(revoked) - self.revoked
+            self._conn.executemany("INSERT OR IGNORE INTO revoked (ticket_id) VALUES (?)",
+                                   [(t,) for t in new_revoked])
+            self.revoked |= new_revoked
+        return len(fresh)
+
+
+# ----- Signature checks (module level so the process pool can pickle them) ----
+_worker_key = None
+
+
+def _load_key(raw_key: bytes):
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    return Ed25519PublicKey.from_public_bytes(raw_key)
+
+
+def _init_worker(raw_key: bytes):
+    global _worker_key
+    _worker_key = _load_key(raw_key)
+
+
+def _verify(public_key, signed: list[tuple[bytes, bytes]]) -> list[bool]:
+    results = []
+    for message, signature in signed:
+        try:
+            public_key.verify(signature, message)
+            results.append(True)
+        except Exception:
+            results.append(False)
+    return results
+
+
+def _verify_chunk(signed: list[tuple[bytes, bytes]]) -> list[bool]:
+    return _verify(_worker_key, signed)
+
+
+class Validator:
+    """
+    Batch front end over a public key and a UsageLedger.  validate_batch()
+    is the hot path; validate() is a batch of one.
+    """
+
+    def __init__(self, raw_key: bytes, ledger: UsageLedger, workers: int | None = None):
+        """
+        raw_key: the 32-byte Ed25519 public key (the format of public_key.pem).
+        workers: verification processes, defaults to the CPU count; 1 verifies in-process.
+        """
+        self._raw_key = raw_key
+        self._key = _load_key(raw_key)
+        self.ledger = ledger
+        self._workers = workers or os.cpu_count() or 1
+        self._pool: ProcessPoolExecutor | None = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _verify_many(self, signed: list[tuple[bytes, bytes]]) -> list[bool]:
+        if len(signed) < PARALLEL_VERIFY_MIN or self._workers == 1:
+            return _verify(self._key, signed)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(self._raw_key,))
+        chunks = [signed[i:i + VERIFY_CHUNK] for i in range(0, len(signed), VERIFY_CHUNK)]
+        return [ok for chunk in self._pool.map(_verify_chunk, chunks) for ok in chunk]
+
+    def validate(self, payload: str, now: datetime | None = None) -> ScanResult:
+        return self.validate_batch([payload], now)[0]
+
+    def validate_batch(self, payloads: list[str], now: datetime | None = None) -> list[ScanResult]:
+        """
+        Check and spend a ride for each payload, in scan order: the second scan
+        of a single ticket in the same batch is already "used".
+        """
+        now = now or datetime.now(timezone.utc)
+        results: list[ScanResult | None] = [None] * len(payloads)
+        decoded = []   # (index, message, signature, record)
+        for i, payload in enumerate(payloads):
+            try:
+                message, signature = ticket_payload.split_signed(payload)
+            except Exception:
+                results[i] = ScanResult(INVALID)
+                continue
+            record = ticket_payload.decode_record(message)
+            if not record.get("ticket_id") or len(signature) != ticket_payload.SIGNATURE_SIZE:
+                results[i] = ScanResult(INVALID)
+                continue
+            decoded.append((i, message, signature, record))
+
+        # Cheap rejections first: revoked or spent tickets never reach the signature check
+        taken = self.ledger.rides_taken(str(r["ticket_id"]) for *_, r in decoded)
+        to_verify = []
+        for entry in decoded:
+            i, _, _, record = entry
+            ticket_id = str(record["ticket_id"])
+            allowance = ticket_payload.ride_allowance(record)
+            if ticket_id in self.ledger.revoked:
+                results[i] = self._result(REVOKED, record, allowance, taken.get(ticket_id, 0))
+            elif allowance is not None and taken.get(ticket_id, 0) >= allowance:
+                results[i] = self._result(USED, record, allowance, taken[ticket_id])
+            else:
+                to_verify.append(entry)
+
+        spent = []
+        signatures = self._verify_many([(message, signature) for _, message, signature, _ in to_verify])
+        for (i, _, _, record), ok in zip(to_verify, signatures):
+            ticket_id = str(record["ticket_id"])
+            allowance = ticket_payload.ride_allowance(record)
+            expires = ticket_payload.expiry(record)
+            used = taken.get(ticket_id, 0)
+            if not ok:
+                status = INVALID
+            elif expires is not None and now >= expires:
+                status = EXPIRED
+            elif allowance is not None and used >= allowance:
+                status = USED
+            else:
+                status = VALID
+                used += 1
+                taken[ticket_id] = used
+                spent.append(ticket_id)
+            results[i] = self._result(status, record, allowance, used)
+        self.ledger.record(spent, now.timestamp())
+        return results
+
+    @staticmethod
+    def _result(status: str, record: dict, allowance: int | None, used: int) -> ScanResult:
+        expires = ticket_payload.expiry(record)
+        return ScanResult(
+            status=status,
+            ticket_id=str(record.get("ticket_id", "")),
+            ticket_type=record.get("ticket_type", ""),
+            rides_left=None if allowance is None else max(0, allowance - used),
+            expires_at=expires.isoformat() if expires else "",
+        )
+
+    def sync(self, exchange) -> int:
+        """
+        One sync round: exchange(scans) uploads this device's unsynced scans
+        and returns {"scans": [...], "revoked": [...]} from everyone else.
+        If it or the merge raises, nothing is marked synced and the next round
+        retries; scans sent twice are ignored by the receivers' merge.
+        """
+        scans, upto = self.ledger.unsynced()
+        incoming = exchange(scans)
+        merged = self.ledger.merge(incoming.get("scans", []), incoming.get("revoked", []))
+        self.ledger.mark_synced(upto)
+        logger.info("Synced: sent %d scans, merged %d, %d revoked",
+                    len(scans), merged, len(self.ledger.revoked))
+        return merged
+
+
+def directory_exchange(sync_dir):
+    """
+    An exchange for sync() over a shared directory (a depot share, a USB
+    stick): each device appends its scans to <device>.ndjson and reads every
+    other device's file; revoked.txt lists revoked ticket ids, one per line.
+    """
+    sync_dir = Path(sync_dir)
+
+    def exchange(scans: list[dict]) -> dict:
+        sync_dir.mkdir(parents=True, exist_ok=True)
+        if scans:
+            with open(sync_dir / f"{scans[0]['device']}.ndjson", "a") as f:
+                f.writelines(json.dumps(s) + "\n" for s in scans)
+        incoming = []
+        for path in sync_dir.glob("*.ndjson"):
+            with open(path) as f:
+                incoming.extend(json.loads(line) for line in f if line.strip())
+        revoked_path = sync_dir / "revoked.txt"
+        revoked = revoked_path.read_text().split() if revoked_path.exists() else []
+        return {"scans": incoming, "revoked": revoked}
+
+    return exchange
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline RapidRide ticket validator")
+    parser.add_argument("--key", required=True, help="raw 32-byte Ed25519 public key file")
+    parser.add_argument("--db", default="validator.db", help="usage ledger")
+    parser.add_argument("--device", help="device id (defaults to the one stored in the ledger)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch", type=int, default=64, help="payloads read per batch")
+    parser.add_argument("--sync-dir", help="shared directory for sync")
+    parser.add_argument("--sync-interval", type=float, default=300, help="seconds between syncs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    validator = Validator(Path(args.key).read_bytes(), UsageLedger(args.db, args.device), args.workers)
+    exchange = directory_exchange(args.sync_dir) if args.sync_dir else None
+    last_sync = 0.0
+
+    def flush(batch):
+        for result in validator.validate_batch(batch):
+            print(json.dumps(asdict(result)), flush=True)
+
+    batch = []
+    for line in sys.stdin:
+        if line.strip():
+            batch.append(line.strip())
+        if len(batch) >= args.batch:
+            flush(batch)
+            batch = []
+        if exchange and time.monotonic() - last_sync >= args.sync_interval:
+            try:
+                validator.sync(exchange)
+            except Exception as e:
+                logger.warning("Sync failed, staying offline: %s", e)
+            last_sync = time.monotonic()
+    flush(batch)
+    if exchange:
+        try:
+            validator.sync(exchange)
+        except Exception as e:
+            logger.warning("Final sync failed, scans stay queued for the next run: %s", e)
+    validator.close()
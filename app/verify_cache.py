@@ -0,0 +1,78 @@
+# verify_cache.py
+"""
+verify_cache.py
+
+Remembers which ticket payloads have already passed Ed25519 verification, so
+WalletStore.load only pays for signatures it has not seen before.
+
+Entries are SHA-256 digests of the payload; the whole cache is bound to the
+fingerprint of the public key it was built with and is discarded when the key
+changes.  Stored as JSON next to the wallet.
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger("rts.client.verifycache")
+
+
+def payload_digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def key_fingerprint(public_key) -> str:
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    raw = public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+class VerificationCache:
+    def __init__(self, path, fingerprint: str):
+        self._path = Path(path)
+        self._fingerprint = fingerprint
+        self._digests: set[str] = set()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self._path.exists():
+            return
+        try:
+            data = json.loads(self._path.read_text())
+        except Exception as e:
+            logger.warning("Discarding unreadable verification cache: %s", e)
+            return
+        if data.get("key") != self._fingerprint:
+            logger.debug("Public key changed, verification cache reset")
+            self._dirty = True
+            return
+        self._digests = set(data.get("verified", []))
+        logger.debug("Loaded %d verified digests from %s", len(self._digests), self._path)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, digest: str):
+        if digest not in self._digests:
+            self._digests.add(digest)
+            self._dirty = True
+
+    def retain(self, digests):
+        """Forget digests of tickets that are no longer in the wallet."""
+        keep = self._digests.intersection(digests)
+        if len(keep) != len(self._digests):
+            self._digests = keep
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp = self._path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"key": self._fingerprint, "verified": sorted(self._digests)}))
+        tmp.replace(self._path)
+        self._dirty = False
@@ -7,7 +7,20 @@ Rectangle {
     id: root
     anchors.fill: parent
     color: Theme.background
-    Component.onCompleted: Network.fetchTickets()
+    // The page is kept alive between visits (see page_cache.py): refresh
+    // when it is shown, at most every refreshInterval ms, rather than on creation
+    readonly property int refreshInterval: 30000
+    property double fetchedAt: 0
+
+    Connections {
+        target: controller
+        function onPageShown(page) {
+            if (page === "wallet.qml" && Date.now() - root.fetchedAt > root.refreshInterval) {
+                root.fetchedAt = Date.now()
+                Network.fetchTickets()
+            }
+        }
+    }
 
     ColumnLayout {
         anchors.fill: parent
@@ -23,7 +36,7 @@ Rectangle {
         // Empty state
         Label {
             id: emptyHint
-            visible: Network.ticketList.length === 0
+            visible: TicketModel.count === 0
             text: "No tickets found. Purchase one to get started."
             color: Theme.text
             wrapMode: Text.Wrap
@@ -38,15 +51,21 @@ Rectangle {
             Layout.fillHeight: true
             spacing: 10
             clip: true
-            model: Network.ticketList
+            model: TicketModel
 
             delegate: Rectangle {
+                // Kept so onDestruction still knows which ticket to unwatch
+                property string ticketId: model.ticket_id
                 width: parent.width
                 height: 80
                 radius: 8
                 color: Theme.card
                 border.color: Theme.accent
                 border.width: 1
+                opacity: model.expired ? 0.5 : 1.0
+                // Countdowns only tick for tickets that have a delegate
+                Component.onCompleted: TicketModel.watch(ticketId, true)
+                Component.onDestruction: TicketModel.watch(ticketId, false)
 
                 RowLayout {
                     anchors.fill: parent
@@ -65,14 +84,27 @@ Rectangle {
                             color: Theme.text
                             font.pixelSize: 12
                         }
+                        Label {
+                            visible: model.expired || model.remaining !== ""
+                            text: model.expired ? "Expired" : "Expires in " + model.remaining
+                            color: Theme.text
+                            font.pixelSize: 12
+                        }
                     }
                     Item { Layout.fillWidth: true }
                     Button {
                         text: "QR"
                         onClicked: {
-                            busy.visible = true
-                            currentTicketId = model.ticket_id
-                            Network.loadQRCode(model.ticket_id)
+                            qrPopup.currentTicketId = model.ticket_id
+                            if (model.payload) {
+                                // Drawn on-device from the signed payload, usually
+                                // already prefetched: no network, no spinner.
+                                busy.visible = false
+                                qrImage.source = QrGen.imageSource(model.payload)
+                            } else {
+                                busy.visible = true
+                                Network.loadQRCode(model.ticket_id)
+                            }
                             qrPopup.open()
                         }
                     }
@@ -110,7 +142,6 @@ Rectangle {
 
             Image {
                 id: qrImage
-                source: Network.qrImage
                 fillMode: Image.PreserveAspectFit
                 anchors.fill: parent
                 visible: !busy.visible
@@ -123,7 +154,7 @@ Rectangle {
             }
         }
 
-        // Show/hide spinner as qrImage arrives
+        // Tickets without a payload fall back to the server-rendered PNG
         Connections {
             target: Network
             onQrImageChanged: {
@@ -0,0 +1,107 @@
+# wallet_db.py
+"""
+wallet_db.py
+
+SQLite storage engine behind WalletStore.
+
+One row per ticket keyed by ticket_id, so adding or deleting a ticket is a
+single-row statement in its own transaction instead of a rewrite of the whole
+wallet.  The database runs in WAL mode: a crash mid-write leaves the last
+committed state intact.  A legacy wallet.json found next to the database is
+imported once and renamed to wallet.json.migrated.  The connection may be
+used from the background loader as well as the GUI thread; a lock
+serialises access.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("rts.client.walletdb")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id    TEXT PRIMARY KEY,
+    payload      TEXT NOT NULL,
+    type         TEXT NOT NULL DEFAULT '',
+    purchased_at TEXT NOT NULL DEFAULT ''
+);
+"""
+
+
+class WalletDatabase:
+    def __init__(self, path):
+        self._path = Path(path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self._path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        logger.debug("Opened wallet database %s", self._path)
+
+    def close(self):
+        self._conn.close()
+
+    # ----- Migration ---------------------------------------------------------
+    def migrate_json(self, json_path, ticket_id) -> int:
+        """
+        Import a legacy wallet.json in one transaction, then rename it.
+        ticket_id(payload) derives the primary key.  Safe to repeat if the
+        rename never happened: rows already present are left alone.
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        tickets = json.loads(json_path.read_text())
+        rows = [
+            (ticket_id(t.get("payload", "")), t.get("payload", ""),
+             t.get("type", ""), t.get("purchasedAt", ""))
+            for t in tickets
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tickets (ticket_id, payload, type, purchased_at) "
+                "VALUES (?, ?, ?, ?)", rows)
+        json_path.replace(json_path.with_name(json_path.name + ".migrated"))
+        logger.info("Migrated %d tickets from %s", len(rows), json_path)
+        return len(rows)
+
+    # ----- Queries -----------------------------------------------------------
+    def tickets(self) -> list[dict]:
+        """All tickets in purchase (insertion) order, in WalletStore's dict shape."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ticket_id, payload, type, purchased_at FROM tickets ORDER BY rowid").fetchall()
+        return [
+            {"ticket_id": r["ticket_id"], "payload": r["payload"],
+             "type": r["type"], "purchasedAt": r["purchased_at"]}
+            for r in rows
+        ]
+
+    def contains(self, ticket_id: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute("SELECT 1 FROM tickets WHERE ticket_id = ?", (ticket_id,))
+            return cur.fetchone() is not None
+
+    # ----- Mutations (each one atomic) ---------------------------------------
+    def insert(self, ticket: dict) -> bool:
+        """Insert one ticket; False if a ticket with that id is already stored."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO tickets (ticket_id, payload, type, purchased_at) "
+                "VALUES (?, ?, ?, ?)",
+                (ticket["ticket_id"], ticket["payload"], ticket.get("type", ""),
+                 ticket.get("purchasedAt", "")))
+        return cur.rowcount == 1
+
+    def delete(self, ticket_ids) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.executemany(
+                "DELETE FROM tickets WHERE ticket_id = ?", [(i,) for i in ticket_ids])
+        return cur.rowcount
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tickets")
@@ -1,39 +1,128 @@
-import json
-import base64
 import logging
-import requests
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import TYPE_CHECKING
 from PySide6.QtCore import QObject, Signal, Slot, QStandardPaths
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from verify_cache import VerificationCache, payload_digest, key_fingerprint
+from wallet_db import WalletDatabase
+import metrics
+import ticket_payload
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+# Below this many unverified tickets a thread pool costs more than it saves
+PARALLEL_VERIFY_MIN = 64
+VERIFY_CHUNK = 256
+# After a failed public key fetch, the next try waits this long
+KEY_RETRY_SECONDS = 60
 
 class WalletStore(QObject):
     """
     Persistent wallet storage with ticket validation and debug logging.
-    Stores tickets in wallet.json under AppDataLocation.
-    Loads ED25519 public key from ConfigLocation or app directory, or fetches it from server.
+    Stores tickets in wallet.db (SQLite, one row per ticket id) under
+    AppDataLocation; a legacy wallet.json is migrated on first start.
+    Loads ED25519 public key from ConfigLocation or app directory, or fetches it from
+    server on a background thread.
+    Payloads that already verified are remembered in verified.json (keyed by
+    payload digest and key fingerprint) and skipped on later loads; the rest
+    are verified on a thread pool.
+    Nothing is read at construction: call load(), or loadAsync() to do the
+    database read, key lookup and verification on a background thread.
     Signals:
       - walletLoaded(list): emitted after initial load
-      - walletUpdated(list): emitted after add/clear
+      - walletUpdated(list): emitted after add/delete/clear
     """
     walletLoaded = Signal(list)
     walletUpdated = Signal(list)
+    # internal: verified ticket list from the background loader
+    _loadFinished = Signal(list)
 
-    def __init__(self):
+    def __init__(
+        self,
+        data_dir: str | None = None,
+        public_key: "Ed25519PublicKey | None" = None,
+        verify_workers: int | None = None
+    ):
+        """
+        data_dir:       wallet location, defaults to AppDataLocation.
+        public_key:     verification key; when omitted it is located or fetched on load.
+        verify_workers: thread pool size for signature checks, defaults to the CPU count.
+        """
         super().__init__()
         self.logger = logging.getLogger("rts.client.walletstore")
         self.logger.debug("Initializing WalletStore")
 
         # Determine storage paths
-        data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
-        cfg_dir  = QStandardPaths.writableLocation(QStandardPaths.ConfigLocation)
-        self._file = Path(data_dir) / "wallet.json"
-        Path(data_dir).mkdir(parents=True, exist_ok=True)
+        if data_dir is None:
+            data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        self._data_dir = Path(data_dir)
+        self._verify_workers = verify_workers or os.cpu_count() or 1
         self.logger.debug("Data directory: %s", data_dir)
-        self.logger.debug("Config directory: %s", cfg_dir)
 
-        # Locate or fetch public key
+        self._db: WalletDatabase | None = None
+        self._pubkey = public_key
+        self._verified: VerificationCache | None = None
+        self._key_failed_at: float | None = None
+        self._key_fetch: threading.Thread | None = None
+        self._init_lock = threading.Lock()
+
+        # Internal ticket list
+        self._tickets = []
+        # Changes made while background loads are reading, undone on what they return
+        self._loads = 0
+        self._removed: set[str] = set()
+        self._cleared = False
+        self._loadFinished.connect(self._finish_background_load)
+
+    # ----- Lazy setup --------------------------------------------------------
+    def _database(self) -> WalletDatabase:
+        with self._init_lock:
+            if self._db is None:
+                self._data_dir.mkdir(parents=True, exist_ok=True)
+                self._db = WalletDatabase(self._data_dir / "wallet.db")
+                self._db.migrate_json(self._data_dir / "wallet.json", ticket_payload.ticket_id)
+            return self._db
+
+    def _public_key(self):
+        """
+        The verification key, located or fetched on first use; None if unavailable.
+        The lookup runs without holding _init_lock, so a slow fetch does not
+        stall _database() callers on the GUI thread.
+        """
+        if self._verified is not None:
+            return self._pubkey   # set up; both are only ever set once
+        public_key = self._pubkey
+        if public_key is None:
+            try:
+                public_key = self._locate_public_key()
+            except Exception as e:
+                self.logger.error("Public key unavailable: %s", e)
+                return None
+            if public_key is None:
+                return None
+        with self._init_lock:
+            if self._pubkey is None:
+                self._pubkey = public_key
+            if self._verified is None:
+                self._verified = VerificationCache(self._data_dir / "verified.json",
+                                                   key_fingerprint(self._pubkey))
+            return self._pubkey
+
+    def _locate_public_key(self) -> "Ed25519PublicKey | None":
+        """
+        Load the public key from ConfigLocation or the app directory, or fetch it from the server.
+        The fetch only happens off the GUI thread and at most every KEY_RETRY_SECONDS
+        after a failure; None when it is skipped.
+        """
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+        cfg_dir = QStandardPaths.writableLocation(QStandardPaths.ConfigLocation)
+        self.logger.debug("Config directory: %s", cfg_dir)
         pubkey_path = None
         search_paths = [Path(cfg_dir) / "public_key.pem", Path(__file__).parent / "public_key.pem"]
         for p in search_paths:
@@ -42,7 +131,16 @@ class WalletStore(QObject):
                 self.logger.debug("Using public key at %s", p)
                 break
         if not pubkey_path:
+            if threading.current_thread() is threading.main_thread():
+                self.logger.debug("No local public key; not fetching it on the GUI thread")
+                return None
+            if (self._key_failed_at is not None
+                    and time.monotonic() - self._key_failed_at < KEY_RETRY_SECONDS):
+                self.logger.debug("No local public key; last fetch failed too recently")
+                return None
             # Fetch from server
+            import requests
+
             base_url = os.getenv("API_URL", "http://127.0.0.1:8000")
             key_url = f"{base_url}/public_key"
             try:
@@ -56,95 +154,193 @@ class WalletStore(QObject):
                 pubkey_path = target
                 self.logger.debug("Fetched and saved public key to %s", target)
             except Exception as e:
+                self._key_failed_at = time.monotonic()
                 self.logger.error("Failed to fetch public key from server: %s", e)
                 raise FileNotFoundError(f"Missing public key and cannot fetch from server: {e}")
 
         # Load public key
         raw_key = pubkey_path.read_bytes()
-        self._pubkey = Ed25519PublicKey.from_public_bytes(raw_key)
+        public_key = Ed25519PublicKey.from_public_bytes(raw_key)
         self.logger.debug("Loaded ED25519 public key from %s", pubkey_path)
+        return public_key
 
-        # Internal ticket list
-        self._tickets = []
-        self.load()
-
+    # ----- Loading -------------------------------------------------------------
     def load(self):
-        """Load wallet.json, validate each payload, emit walletLoaded."""
-        self.logger.debug("Loading wallet from %s", self._file)
-        if self._file.exists():
-            data = json.loads(self._file.read_text())
-            valid = []
-            for ticket in data:
-                payload = ticket.get("payload", "")
-                if self.validateTicket(payload):
-                    valid.append(ticket)
-                else:
-                    self.logger.warning("Invalid ticket dropped: %s...", payload[:10])
-            self._tickets = valid
-        else:
-            self.logger.debug("Wallet file does not exist, starting empty")
-            self._tickets = []
+        """Load stored tickets, validate each payload not already verified, emit walletLoaded."""
+        self._finish_load(self._read_verified())
+
+    @Slot()
+    def loadAsync(self):
+        """Like load(), but the disk read, key lookup and verification run on a background thread."""
+        def run():
+            try:
+                tickets = self._read_verified()
+            except Exception:
+                self.logger.exception("Background wallet load failed")
+                tickets = []
+            self._loadFinished.emit(tickets)
+
+        self._loads += 1
+        threading.Thread(target=run, name="rts-wallet-load", daemon=True).start()
+
+    @metrics.timed("wallet.load")
+    def _read_verified(self) -> list:
+        """Read every stored ticket and drop (and delete) the ones whose signature fails."""
+        db = self._database()
+        data = db.tickets()
+        self.logger.debug("Loaded %d tickets from wallet database", len(data))
+        if self._public_key() is None:
+            # Everything stored was verified when it was added; keep showing it
+            # rather than failing the whole wallet while offline.
+            self.logger.warning("Showing %d stored tickets without re-verification", len(data))
+            return data
+        digests = [payload_digest(t["payload"]) for t in data]
+        pending = [i for i, d in enumerate(digests) if d not in self._verified]
+        self.logger.debug("%d of %d tickets need signature verification",
+                          len(pending), len(data))
+        results = self._verify_many([data[i]["payload"] for i in pending])
+        invalid = set()
+        for i, ok in zip(pending, results):
+            if ok:
+                self._verified.add(digests[i])
+            else:
+                invalid.add(i)
+        valid = []
+        for i, ticket in enumerate(data):
+            if i in invalid:
+                self.logger.warning("Invalid ticket dropped: %s...", ticket["payload"][:10])
+            else:
+                valid.append(ticket)
+        if invalid:
+            db.delete(data[i]["ticket_id"] for i in invalid)
+        self._verified.retain(d for i, d in enumerate(digests) if i not in invalid)
+        self._verified.save()
+        return valid
+
+    def _finish_background_load(self, tickets: list):
+        # Tickets deleted or cleared while the load was reading stay gone
+        if self._cleared:
+            tickets = []
+        elif self._removed:
+            tickets = [t for t in tickets if t["ticket_id"] not in self._removed]
+        self._loads -= 1
+        if not self._loads:
+            self._removed.clear()
+            self._cleared = False
+        self._finish_load(tickets)
+
+    def _finish_load(self, tickets: list):
+        # Keep anything added while a background load was still reading
+        loaded = {t["ticket_id"] for t in tickets}
+        self._tickets = tickets + [t for t in self._tickets if t["ticket_id"] not in loaded]
         self.walletLoaded.emit(self._tickets)
         self.logger.debug("Emitted walletLoaded with %d tickets", len(self._tickets))
 
-    def save(self):
-        """Write current tickets to disk and emit walletUpdated."""
-        self.logger.debug("Saving %d tickets to %s", len(self._tickets), self._file)
-        self._file.write_text(json.dumps(self._tickets, indent=2))
+    def _emit_updated(self):
         self.walletUpdated.emit(self._tickets)
         self.logger.debug("Emitted walletUpdated")
 
     def validateTicket(self, payload: str) -> bool:
         """
         Verify ED25519 signature appended to payload bytes.
-        Assumes payload is base64(message||signature).
+        Accepts v1 base64(message||signature) and v2 "RR2:" payloads.
         """
+        public_key = self._public_key()
+        if public_key is None:
+            return False
         try:
-            blob = base64.b64decode(payload)
-            msg, sig = blob[:-64], blob[-64:]
-            self._pubkey.verify(sig, msg)
+            msg, sig = ticket_payload.split_signed(payload)
+            public_key.verify(sig, msg)
             return True
         except Exception as e:
             self.logger.debug("validateTicket failed: %s", e)
             return False
 
+    def _verify_many(self, payloads: list[str]) -> list[bool]:
+        """validateTicket over many payloads, in parallel chunks when it pays off."""
+        if len(payloads) < PARALLEL_VERIFY_MIN or self._verify_workers == 1:
+            return [self.validateTicket(p) for p in payloads]
+        chunks = [payloads[i:i + VERIFY_CHUNK] for i in range(0, len(payloads), VERIFY_CHUNK)]
+        with ThreadPoolExecutor(max_workers=self._verify_workers,
+                                thread_name_prefix="rts-verify") as pool:
+            results = pool.map(lambda chunk: [self.validateTicket(p) for p in chunk], chunks)
+            return [ok for chunk in results for ok in chunk]
+
+    def _fetch_public_key(self):
+        """Look the key up on a background thread, unless that is already happening."""
+        if self._key_fetch is None or not self._key_fetch.is_alive():
+            self._key_fetch = threading.Thread(target=self._public_key, name="rts-wallet-key",
+                                               daemon=True)
+            self._key_fetch.start()
+
     @Slot(str, str)
     def addTicket(self, payload: str, ticket_type: str):
-        """Validate and append a new ticket."""
+        """
+        Validate and store a new ticket.  Without a public key yet it is stored
+        unverified, as a load does offline, and the next load verifies it.
+        """
         self.logger.debug("Adding ticket of type %s", ticket_type)
-        if not self.validateTicket(payload):
+        if self._public_key() is None:
+            try:
+                message, signature = ticket_payload.split_signed(payload)
+            except Exception as e:
+                self.logger.error("Payload unreadable, not adding: %s", e)
+                return
+            if not message or len(signature) != ticket_payload.SIGNATURE_SIZE:
+                self.logger.error("Payload carries no signature, not adding")
+                return
+            self.logger.warning("No public key yet, storing ticket unverified")
+            self._fetch_public_key()
+        elif self.validateTicket(payload):
+            self._verified.add(payload_digest(payload))
+        else:
             self.logger.error("Payload failed validation, not adding")
             return
         ticket = {
+            "ticket_id": ticket_payload.ticket_id(payload),
             "payload": payload,
             "type": ticket_type,
             "purchasedAt": datetime.utcnow().isoformat() + "Z"
         }
+        if not self._database().insert(ticket):
+            self.logger.warning("Ticket %s already in wallet, not adding", ticket["ticket_id"])
+            return
         self._tickets.append(ticket)
-        self.save()
+        self._emit_updated()
 
     @Slot(int)
     def deleteTicket(self, index: int):
-        """Remove a ticket by its index in the list and save."""
+        """Remove a ticket by its index in the list."""
         if 0 <= index < len(self._tickets):
             self.logger.debug("Deleting ticket at index %d", index)
-            del self._tickets[index]
-            self.save()
+            self.deleteTicketById(self._tickets[index]["ticket_id"])
         else:
             self.logger.warning("deleteTicket called with invalid index %d", index)
 
+    @Slot(str)
+    def deleteTicketById(self, ticket_id: str):
+        """Remove a ticket by its id."""
+        if not self._database().delete([ticket_id]):
+            self.logger.warning("deleteTicketById called with unknown id %s", ticket_id)
+            return
+        self.logger.debug("Deleted ticket %s", ticket_id)
+        if self._loads:
+            self._removed.add(ticket_id)
+        self._tickets = [t for t in self._tickets if t["ticket_id"] != ticket_id]
+        self._emit_updated()
+
     @Slot()
     def clearWallet(self):
-        """Remove all tickets and delete the storage file."""
-        self.logger.debug("Clearing wallet and deleting file %s", self._file)
+        """Remove all tickets from storage."""
+        self.logger.debug("Clearing wallet")
         self._tickets = []
-        if self._file.exists():
-            self._file.unlink()
-        self.walletUpdated.emit(self._tickets)
+        if self._loads:
+            self._cleared = True
+        self._database().clear()
+        self._emit_updated()
 
     @Slot(result=list)
     def getTickets(self) -> list:
         """Return current in-memory ticket list."""
-        self.logger.debug("getTickets called, returning %d tickets", len(self._tickets))
         return self._tickets
 
@@ -0,0 +1,134 @@
+# wallet_sync.py
+"""
+wallet_sync.py
+
+Delta sync support for the server-side ticket wallet.
+
+A server that supports delta sync answers a full GET /wallet with an
+X-Wallet-Cursor header.  Later syncs send GET /wallet?since=<cursor> and get
+back newline-delimited JSON, one change per line, ending with the new cursor:
+
+    {"op": "upsert", "ticket": {"ticket_id": "...", ...}}
+    {"op": "revoke", "ticket_id": "..."}
+    {"cursor": "..."}
+
+A cursor the server no longer recognises is answered with 410 Gone and the
+client falls back to a full fetch.  Synced tickets and the cursor live in
+ServerTicketStore (SQLite) so a restart resumes from the last cursor.
+
+Both wire formats are decoded incrementally as bytes arrive instead of
+through one response.json() call.
+"""
+import codecs
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("rts.walletsync")
+
+CURSOR_HEADER = "X-Wallet-Cursor"
+NDJSON = "application/x-ndjson"
+_WS = " \t\r\n"
+
+
+def iter_json_array(chunks, encoding: str = "utf-8"):
+    """
+    Yield the elements of a top-level JSON array from an iterable of byte
+    chunks, decoding each element as soon as it is complete.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder(encoding)()
+    buf, pos = "", 0
+    opened = closed = False
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while not closed:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos == len(buf):
+                break
+            if not opened:
+                if buf[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                opened = True
+                pos += 1
+                continue
+            if buf[pos] == ",":
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                closed = True
+                break
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # element split across chunks, wait for more
+            if not isinstance(value, (dict, list, str)) and (end == len(buf) or buf[end] not in _WS + ",]"):
+                break  # a bare number may still be growing
+            pos = end
+            yield value
+    if not closed:
+        raise ValueError("truncated JSON array")
+
+
+def iter_ndjson(lines):
+    """Yield one decoded record per non-empty line (bytes or str)."""
+    for line in lines:
+        if line and line.strip():
+            yield json.loads(line)
+
+
+class ServerTicketStore:
+    """Synced server tickets plus the delta cursor, updated atomically per sync."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(Path(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tickets (ticket_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+
+    @property
+    def cursor(self) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        return row[0] if row else None
+
+    def tickets(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM tickets ORDER BY rowid").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def replace_all(self, tickets: list[dict], cursor: str | None):
+        """Store the result of a full fetch."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tickets")
+            self._write(tickets, (), cursor)
+
+    def apply(self, upserts: list[dict], revoked: list[str], cursor: str | None):
+        """Merge one delta: upserts replace by ticket_id, revoked ids are removed."""
+        with self._lock, self._conn:
+            self._write(upserts, revoked, cursor)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tickets")
+            self._conn.execute("DELETE FROM meta")
+
+    def _write(self, upserts, revoked, cursor):
+        self._conn.executemany(
+            "INSERT INTO tickets (ticket_id, data) VALUES (?, ?) "
+            "ON CONFLICT(ticket_id) DO UPDATE SET data = excluded.data",
+            [(str(t["ticket_id"]), json.dumps(t)) for t in upserts if t.get("ticket_id")])
+        self._conn.executemany("DELETE FROM tickets WHERE ticket_id = ?",
+                               [(str(i),) for i in revoked])
+        if cursor is None:
+            self._conn.execute("DELETE FROM meta WHERE key = 'cursor'")
+        else:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)",
+                               (cursor,))
@@ -0,0 +1,129 @@
+# bench_gtfs.py
+# Compiles a synthetic GTFS feed with gtfs_store and times next-departure lookups.
+#
+# The feed is a grid city: --grid x --grid stops 400 m apart, one route along
+# every row and every column, trips in both directions every --headway minutes
+# from 05:00 until after midnight, separate weekday and weekend services, and a
+# holiday in calendar_dates.txt.  The defaults give about 1M stop_times.
+#   compile    - CSV -> .npy columns
+#   open       - GtfsStore() on the compiled store (memory-mapped)
+#   query      - next_departures() at random stops and times, p50 / p99 / max
+# Run from the repository root:
+#
+#   python testing/bench_gtfs.py [--grid 40] [--headway 15] [--queries 5000]
+
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from gtfs_store import GtfsStore, compile_feed  # noqa: E402
+
+ORIGIN = (-103.30, 44.05)     # lon, lat of the grid's south-west corner
+SPACING_DEG = (0.005, 0.0036)  # ~400 m east-west and north-south at this latitude
+HOP_S = 90                    # running time between neighbouring stops
+START_DATE = date(2025, 9, 1)
+END_DATE = date(2025, 12, 31)
+
+
+def _time(seconds: int) -> str:
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def make_feed(path: Path, grid: int = 40, headway_min: int = 15):
+    """Write a synthetic grid-city feed into directory `path`; returns the stop_times count."""
+    path.mkdir(parents=True, exist_ok=True)
+
+    def write(name, header, rows):
+        with open(path / name, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def stop_id(x, y):
+        return f"S{x:03d}_{y:03d}"
+
+    write("stops.txt", ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+          ((stop_id(x, y), f"Street {x} & Avenue {y}",
+            f"{ORIGIN[1] + y * SPACING_DEG[1]:.6f}", f"{ORIGIN[0] + x * SPACING_DEG[0]:.6f}")
+           for x in range(grid) for y in range(grid)))
+
+    lines = {}
+    for i in range(grid):
+        lines[f"H{i}"] = [stop_id(x, i) for x in range(grid)]
+        lines[f"V{i}"] = [stop_id(i, y) for y in range(grid)]
+    write("routes.txt", ["route_id", "route_short_name", "route_type"],
+          ((route, route, 3) for route in lines))
+
+    write("calendar.txt", ["service_id", "monday", "tuesday", "wednesday", "thursday", "friday",
+                           "saturday", "sunday", "start_date", "end_date"],
+          [("WKD", 1, 1, 1, 1, 1, 0, 0, START_DATE.strftime("%Y%m%d"), END_DATE.strftime("%Y%m%d")),
+           ("WKE", 0, 0, 0, 0, 0, 1, 1, START_DATE.strftime("%Y%m%d"), END_DATE.strftime("%Y%m%d"))])
+    holiday = date(2025, 11, 27).strftime("%Y%m%d")  # a Thursday run on the weekend timetable
+    write("calendar_dates.txt", ["service_id", "date", "exception_type"],
+          [("WKD", holiday, 2), ("WKE", holiday, 1)])
+
+    trips, stop_times = [], []
+    for route, stops in lines.items():
+        for service, headway in (("WKD", headway_min), ("WKE", headway_min * 2)):
+            for direction, pattern in enumerate((stops, stops[::-1])):
+                start = 5 * 3600 + direction * 60
+                while start <= 24 * 3600 + 1800:
+                    trip = f"{route}_{service}_{direction}_{start}"
+                    trips.append((route, service, trip, f"{route} to {pattern[-1]}"))
+                    for seq, stop in enumerate(pattern):
+                        t = _time(start + seq * HOP_S)
+                        stop_times.append((trip, t, t, stop, seq + 1))
+                    start += headway * 60
+    write("trips.txt", ["route_id", "service_id", "trip_id", "trip_headsign"], trips)
+    write("stop_times.txt", ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+          stop_times)
+    return len(stop_times)
+
+
+def percentile(values, p):
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GTFS store benchmark")
+    parser.add_argument("--grid", type=int, default=40)
+    parser.add_argument("--headway", type=int, default=15, help="weekday headway in minutes")
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        feed, store_dir = Path(tmp) / "feed", Path(tmp) / "store"
+        start = time.perf_counter()
+        n = make_feed(feed, args.grid, args.headway)
+        print(f"generate   {time.perf_counter() - start:8.2f} s   ({n} stop_times)")
+
+        start = time.perf_counter()
+        counts = compile_feed(feed, store_dir)
+        feed_mb = sum(f.stat().st_size for f in feed.iterdir()) / 1e6
+        store_mb = sum(f.stat().st_size for f in store_dir.iterdir()) / 1e6
+        print(f"compile    {time.perf_counter() - start:8.2f} s   ({feed_mb:.1f} MB CSV -> {store_mb:.1f} MB)")
+
+        start = time.perf_counter()
+        store = GtfsStore(store_dir)
+        print(f"open       {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        rng = random.Random(7)
+        latencies = []
+        for _ in range(args.queries):
+            stop = str(store.stop_id[rng.randrange(counts["stops"])])
+            when = datetime.combine(START_DATE + timedelta(days=rng.randrange(120)),
+                                    datetime.min.time()) + timedelta(seconds=rng.randrange(86_400))
+            t0 = time.perf_counter()
+            store.next_departures(stop, when, limit=5)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+        print(f"query      p50 {statistics.median(latencies):7.1f} us   p99 {percentile(latencies, 0.99):7.1f} us"
+              f"   max {max(latencies):7.1f} us   ({args.queries} queries)")
@@ -0,0 +1,88 @@
+# bench_logging.py
+# GUI-thread cost of logging per wallet frame, before and after log_setup.
+# A "frame" is the logging the wallet page used to do while QML re-evaluates
+# its bindings: one ticketList read per delegate, isLoggedIn, getTickets and a
+# themed palette line, plus one GET line from the network layer.
+#   before        - logging.basicConfig at DEBUG (the old CLIConfig default),
+#                   every record formatted and written on the calling thread
+#   queue DEBUG   - log_setup pipeline at DEBUG, same call sites: records are
+#                   queued unformatted, sampled and rate limited
+#   after         - log_setup at its default level with the trimmed call sites
+# Output goes to os.devnull, so the numbers are formatting and handler
+# overhead, not terminal speed (a real console is slower still).
+# Run from the repository root:
+#
+#   python testing/bench_logging.py [--frames 2000] [--delegates 40]
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import log_setup  # noqa: E402
+
+network = logging.getLogger("rts.network")
+wallet = logging.getLogger("rts.client.walletstore")
+main = logging.getLogger("rts.client.main")
+TICKETS = [{"ticket_id": f"t{i}", "ticket_type": "ten_ride"} for i in range(40)]
+
+
+def frame_before(delegates: int):
+    for _ in range(delegates):
+        network.debug("Retrieving ticket list, count=%d", len(TICKETS))
+    network.debug("isLoggedIn called, result=%s", True)
+    wallet.debug("getTickets called, returning %d tickets", len(TICKETS))
+    theme = "dark"
+    main.debug(f"Applying palette for theme {theme}")
+    network.debug("GET %s -> %d", "http://127.0.0.1:8000/wallet", 200)
+
+
+def frame_after(delegates: int):
+    # The per-read lines are gone; what is left is lazy and below the default level
+    main.debug("Applying palette for theme %s", "dark")
+    network.debug("GET %s -> %d", "http://127.0.0.1:8000/wallet", 200)
+
+
+def run(frame, frames: int, delegates: int) -> list[float]:
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        frame(delegates)
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def report(label: str, times: list[float], drain: float):
+    times.sort()
+    print(f"{label:12} {statistics.mean(times):9.1f} {times[len(times) // 2]:9.1f} "
+          f"{times[int(len(times) * 0.99)]:9.1f} {drain * 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-frame logging cost")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--delegates", type=int, default=40, help="ticket delegates on screen")
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    root = logging.getLogger()
+    print(f"{'':12} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'drain ms':>9}")
+
+    logging.basicConfig(level="DEBUG", stream=devnull, format=log_setup.FORMAT, force=True)
+    report("before", run(frame_before, args.frames, args.delegates), 0.0)
+
+    log_setup.configure("DEBUG", stream=devnull)
+    times = run(frame_before, args.frames, args.delegates)
+    start = time.perf_counter()
+    log_setup.shutdown()   # time for the listener to write out what was queued
+    report("queue DEBUG", times, time.perf_counter() - start)
+
+    log_setup.configure(stream=devnull)
+    times = run(frame_after, args.frames, args.delegates)
+    start = time.perf_counter()
+    log_setup.shutdown()
+    report(f"after {logging.getLevelName(root.level)}", times, time.perf_counter() - start)
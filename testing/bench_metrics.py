@@ -0,0 +1,65 @@
+# bench_metrics.py
+# Cost of metrics.py instrumentation per call, tracing off and on.
+#   bare         - the function called directly
+#   timed off    - through @metrics.timed with tracing disabled
+#   span off     - inside metrics.span() with tracing disabled
+#   timed on     - @metrics.timed, recording into a histogram
+#   span on      - metrics.span(), recording into a histogram
+# Run from the repository root:
+#
+#   python testing/bench_metrics.py [--calls 1000000]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import metrics  # noqa: E402
+
+
+def work():
+    return None
+
+
+timed_work = metrics.timed("bench.timed")(work)
+
+
+def loop_bare(n):
+    for _ in range(n):
+        work()
+
+
+def loop_timed(n):
+    for _ in range(n):
+        timed_work()
+
+
+def loop_span(n):
+    for _ in range(n):
+        with metrics.span("bench.span"):
+            work()
+
+
+def per_call_ns(loop, n) -> float:
+    start = time.perf_counter()
+    loop(n)
+    return (time.perf_counter() - start) / n * 1e9
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="metrics.py instrumentation overhead")
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    bare = per_call_ns(loop_bare, args.calls)
+    print(f"{'bare':10} {bare:7.0f} ns/call")
+    for on in (False, True):
+        metrics.set_enabled(on)
+        state = "on" if on else "off"
+        for name, loop in (("timed", loop_timed), ("span", loop_span)):
+            cost = per_call_ns(loop, args.calls)
+            print(f"{name + ' ' + state:10} {cost:7.0f} ns/call  (+{cost - bare:.0f})")
+    hist = metrics.histogram("bench.span")
+    print(f"recorded {hist.count} spans, p50 {hist.quantile(0.5) * 1e9:.0f} ns, p99 {hist.quantile(0.99) * 1e9:.0f} ns")
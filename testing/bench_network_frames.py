@@ -0,0 +1,103 @@
+# bench_network_frames.py
+# Measures how long NetworkManager holds the Qt event loop while requests are in flight.
+#
+# A throwaway HTTP server answers /token and /qr/<id> after an artificial delay
+# (a slow cellular link); a 1 ms heartbeat timer records the largest gap between
+# ticks.  Every GET is for a different ticket, so none is coalesced with
+# another in flight.  Run from the repository root:
+#
+#   python testing/bench_network_frames.py [--delay 0.5] [--requests 20]
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication, QTimer  # noqa: E402
+from network import NetworkManager, FRAME_BUDGET_MS  # noqa: E402
+
+
+def make_handler(delay):
+    class SlowHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, body):
+            time.sleep(delay)
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._reply({"access_token": "bench-token", "token_type": "Bearer"})
+
+        def do_GET(self):
+            self._reply([{"ticket_id": str(i), "ticket_type": "single_use"} for i in range(50)])
+
+        def log_message(self, *args):
+            pass
+
+    return SlowHandler
+
+
+def run(app, base_url, blocking, count):
+    network = NetworkManager(base_url, blocking=blocking)
+    network._set_token("bench-token")
+    state = {"pending": count, "last": time.perf_counter(), "worst": 0.0}
+
+    def tick():
+        now = time.perf_counter()
+        state["worst"] = max(state["worst"], (now - state["last"]) * 1000)
+        state["last"] = now
+
+    def finished(*_):
+        tick()
+        state["pending"] -= 1
+        if state["pending"] == 0:
+            app.quit()
+
+    network.qrImageChanged.connect(finished)
+    network.loginFinished.connect(finished)
+    heartbeat = QTimer()
+    heartbeat.setInterval(1)
+    heartbeat.timeout.connect(tick)
+
+    heartbeat.start()
+    for i in range(count):
+        QTimer.singleShot(i * 5, (lambda i=i: network.loadQRCode(f"bench-{i}")) if i % 2
+                          else lambda: network.login("bench", "bench"))
+    started = time.perf_counter()
+    app.exec()
+    elapsed = time.perf_counter() - started
+    heartbeat.stop()
+    network.shutdown()
+    return state["worst"], elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NetworkManager event-loop stall benchmark")
+    parser.add_argument("--delay", type=float, default=0.5, help="server latency in seconds")
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    app = QCoreApplication(sys.argv)
+    app.setOrganizationName("RapidRideBench")
+    for label, blocking in (("blocking (old)", True), ("worker pool", False)):
+        worst, elapsed = run(app, base_url, blocking, args.requests)
+        verdict = "OK" if worst <= FRAME_BUDGET_MS else "OVER BUDGET"
+        print(f"{label:15s} longest event-loop stall {worst:8.1f} ms "
+              f"(budget {FRAME_BUDGET_MS:.1f} ms, {verdict}), total {elapsed:.2f} s")
+    server.shutdown()
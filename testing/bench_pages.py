@@ -0,0 +1,119 @@
+# bench_pages.py
+# Page-switch cost in the real main.qml, with and without the keep-alive cache.
+# The app's context objects are built as main.py builds them (data in a
+# temporary directory, no server), then each page is visited from home and
+# back (home, wallet, home, purchasing, ...) for --rounds rounds, idling
+# --idle ms after each switch as a user would.  Per switch it records the
+# time Controller.loadPage holds the GUI thread, and the time until the next
+# frame is on screen.
+#   loader      - capacity 1, no preloading: every switch creates the page,
+#                 as the old Loader did
+#   keep-alive  - the default PageCache: pages stay alive, successors preload
+# Run from the repository root (build app/qml.rcc first to measure the bundle):
+#
+#   python testing/bench_pages.py [--rounds 10] [--idle 400] [--no-bundle]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import main  # noqa: E402
+from PySide6.QtCore import QCoreApplication, QEvent, QEventLoop, QTimer  # noqa: E402
+from PySide6.QtQml import QQmlApplicationEngine  # noqa: E402
+from PySide6.QtQuick import QQuickItem, QQuickWindow, QSGRendererInterface  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+from page_cache import KEEP_ALIVE, PageCache, qml_base_url  # noqa: E402
+from network import FRAME_BUDGET_MS  # noqa: E402
+
+# Visited from home and back, as the home page's buttons and the drawer lead
+SPOKES = ["wallet.qml", "purchasing.qml", "routes.qml", "settings.qml", "account.qml"]
+PAGES = [page for spoke in SPOKES for page in (spoke, "home.qml")]
+
+
+def build_engine(data_dir: str, base):
+    engine = QQmlApplicationEngine()
+    theme = main.ThemeController()
+    qr_provider = main.QrImageProvider()
+    engine.addImageProvider(main.PROVIDER_ID, qr_provider)
+    route_maps, tiles = main.RouteMaps.open()
+    engine.addImageProvider(main.TILES_PROVIDER_ID, tiles)
+    objects = {
+        "ThemeController": theme, "ThemeManager": theme, "Theme": theme.colors,
+        "ThemeList": theme.available_themes, "QrGen": main.QrGenerator(qr_provider),
+        "WalletStore": main.WalletStore(data_dir=data_dir), "TicketModel": main.TicketListModel(),
+        "RouteMaps": route_maps, "Diagnostics": main.Diagnostics(), "backend": main.AppBackend(),
+        "Network": main.NetworkManager("http://127.0.0.1:9", data_dir=data_dir, qr_images=qr_provider),
+    }
+    for name, obj in objects.items():
+        engine.rootContext().setContextProperty(name, obj)
+    engine.load(base.resolved(main.QUrl("main.qml")))
+    root = engine.rootObjects()[0]
+    return engine, root, objects
+
+
+def wait(ms: int):
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec()
+
+
+def run(app, base, capacity: int, preload: bool, rounds: int, idle: int):
+    with tempfile.TemporaryDirectory() as data_dir:
+        engine, root, objects = build_engine(data_dir, base)
+        host = root.findChild(QQuickItem, "pageHost")
+        controller = main.Controller(root, PageCache(engine, host, base, capacity, preload))
+        engine.rootContext().setContextProperty("controller", controller)
+        controller.loadPage("home.qml")
+        wait(idle)
+
+        calls, frames = [], []
+        for _ in range(rounds):
+            for page in PAGES:
+                swapped = QEventLoop()
+                root.frameSwapped.connect(swapped.quit)
+                start = time.perf_counter()
+                controller.loadPage(page)
+                calls.append((time.perf_counter() - start) * 1000)
+                QTimer.singleShot(1000, swapped.quit)
+                swapped.exec()
+                frames.append((time.perf_counter() - start) * 1000)
+                root.frameSwapped.disconnect(swapped.quit)
+                wait(idle)
+        objects["Network"].shutdown()
+        # Pages and main.qml go before the context objects their bindings read
+        engine.deleteLater()
+        QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+    return calls, frames
+
+
+def row(label: str, values: list[float]):
+    values = sorted(values)
+    over = sum(v > FRAME_BUDGET_MS for v in values)
+    print(f"  {label:18} p50 {statistics.median(values):6.1f}  p90 {values[int(len(values) * 0.9)]:6.1f}  "
+          f"max {values[-1]:6.1f} ms   {over}/{len(values)} over {FRAME_BUDGET_MS:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page-switch latency")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--idle", type=int, default=400, help="ms idle after each switch")
+    parser.add_argument("--no-bundle", action="store_true", help="load QML files instead of qml.rcc")
+    args = parser.parse_args()
+
+    QCoreApplication.setOrganizationName("RapidRide-bench")
+    QQuickWindow.setGraphicsApi(QSGRendererInterface.GraphicsApi.Software)
+    app = QApplication(sys.argv[:1])
+    base = qml_base_url(not args.no_bundle)
+    print(f"QML from {base.toString()}, {args.rounds} rounds of {len(PAGES)} switches")
+    for label, capacity, preload in (("loader", 1, False), ("keep-alive", KEEP_ALIVE, True)):
+        calls, frames = run(app, base, capacity, preload, args.rounds, args.idle)
+        print(label)
+        row("loadPage", calls)
+        row("to next frame", frames)
@@ -0,0 +1,120 @@
+# bench_planner.py
+# Journey-planner latency on the synthetic grid-city feed from bench_gtfs.py.
+#   setup      - JourneyPlanner(): route patterns + walking links
+#   timetable  - first query of a day builds that day's patterns (cached afterwards)
+#   earliest   - earliest_arrival between random stops, p50 / p99 / max
+#   latest     - latest_departure between random stops
+#   profile    - profile() over a two-hour departure window
+#   check      - profile() against earliest_arrival() run every minute of a
+#                one-hour window; prints the windows where they disagree
+# Run from the repository root:
+#
+#   python testing/bench_planner.py [--grid 40] [--headway 15] [--queries 200] [--check 20]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from bench_gtfs import START_DATE, make_feed, percentile  # noqa: E402
+from gtfs_store import GtfsStore, compile_feed  # noqa: E402
+from journey_planner import JourneyPlanner  # noqa: E402
+
+
+def timed(fn, queries):
+    latencies = []
+    for args in queries:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return (f"p50 {statistics.median(latencies):7.2f} ms   p99 {percentile(latencies, 0.99):7.2f} ms"
+            f"   max {max(latencies):7.2f} ms")
+
+
+def latest_start(journey):
+    """When journey can leave at the latest: its first boarding less the walking before it; None if it only walks."""
+    walked = timedelta()
+    for leg in journey.legs:
+        if leg.mode == "ride":
+            return leg.depart - walked
+        walked += leg.arrive - leg.depart
+    return None
+
+
+def check_profile(planner, origin, destination, start, end) -> list[str]:
+    """
+    Disagreements between profile() and earliest_arrival() over [start, end]:
+    every profile journey must be reachable by leaving at its departure, and
+    every riding earliest-arrival journey that can leave in the window must be
+    matched by a profile journey leaving no earlier, arriving no later, with
+    no more transfers.
+    """
+    found = planner.profile(origin, destination, start, end)
+    problems = []
+    for j in found:
+        if not any(e.arrive <= j.arrive and e.transfers <= j.transfers
+                   for e in planner.earliest_arrival(origin, destination, j.depart)):
+            problems.append(f"profile {j.depart:%H:%M:%S}->{j.arrive:%H:%M:%S} ({j.transfers}) not reachable")
+    when = start
+    while when <= end:
+        for e in planner.earliest_arrival(origin, destination, when):
+            depart = latest_start(e)
+            if depart is None or depart > end:
+                continue
+            if not any(o.depart >= depart and o.arrive <= e.arrive and o.transfers <= e.transfers
+                       for o in found):
+                problems.append(f"earliest {depart:%H:%M:%S}->{e.arrive:%H:%M:%S} ({e.transfers}) missing")
+        when += timedelta(minutes=1)
+    return sorted(set(problems))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Journey planner benchmark")
+    parser.add_argument("--grid", type=int, default=40)
+    parser.add_argument("--headway", type=int, default=15, help="weekday headway in minutes")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--check", type=int, default=20, help="profile windows to check")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_feed(Path(tmp) / "feed", args.grid, args.headway)
+        compile_feed(Path(tmp) / "feed", Path(tmp) / "store")
+        store = GtfsStore(Path(tmp) / "store")
+
+        start = time.perf_counter()
+        planner = JourneyPlanner(store)
+        print(f"setup      {(time.perf_counter() - start) * 1000:8.1f} ms  ({len(store.stop_id)} stops)")
+        day = START_DATE + timedelta(days=15)  # a Tuesday
+        start = time.perf_counter()
+        planner.timetable((day - store.start_date).days)
+        print(f"timetable  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        rng = random.Random(11)
+        stops = [str(s) for s in store.stop_id]
+
+        def pair_at(hours):
+            when = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(*hours))
+            return rng.choice(stops), rng.choice(stops), when
+
+        print(f"earliest   {timed(planner.earliest_arrival, [pair_at((6 * 3600, 21 * 3600)) for _ in range(args.queries)])}")
+        print(f"latest     {timed(planner.latest_departure, [pair_at((8 * 3600, 23 * 3600)) for _ in range(args.queries)])}")
+        windows = []
+        for _ in range(max(1, args.queries // 10)):
+            origin, destination, when = pair_at((6 * 3600, 19 * 3600))
+            windows.append((origin, destination, when, when + timedelta(hours=2)))
+        print(f"profile    {timed(planner.profile, windows)}")
+
+        wrong = 0
+        for _ in range(args.check):
+            origin, destination, when = pair_at((6 * 3600, 20 * 3600))
+            problems = check_profile(planner, origin, destination, when, when + timedelta(hours=1))
+            if problems:
+                wrong += 1
+                print(f"  {origin} -> {destination} from {when:%H:%M:%S}: {'; '.join(problems)}")
+        print(f"check      {args.check - wrong} of {args.check} profile windows agree with earliest_arrival")
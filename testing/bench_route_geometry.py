@@ -0,0 +1,52 @@
+# bench_route_geometry.py
+# Times route_geometry.load_route on every route source under routes/:
+#   json.load  - the old way: json.load of the GeoJSON, nested lists and all
+#   cold       - parse + Douglas-Peucker significance + write the .npy cache
+#   warm       - memory-mapped load from that cache
+# and prints the vertex count kept at each zoom level.  Run from the repository root:
+#
+#   python testing/bench_route_geometry.py [--repeat 50]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from route_geometry import ROUTES_DIR, SOURCE_SUFFIXES, ZOOMS, load_route  # noqa: E402
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route geometry load benchmark")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    sources = sorted(p for p in ROUTES_DIR.rglob("*") if p.suffix.lower() in SOURCE_SUFFIXES)
+    print(f"{'source':<40} {'bytes':>7} {'json.load':>9} {'cold ms':>8} {'warm ms':>8}  vertices per zoom {list(ZOOMS)}")
+    for path in sources:
+        baseline = "-"
+        if path.suffix == ".json":
+            baseline = f"{best_of(args.repeat, lambda: json.loads(path.read_text())):9.2f}"
+
+        def cold():
+            with tempfile.TemporaryDirectory() as tmp:
+                load_route(path, tmp)
+
+        with tempfile.TemporaryDirectory() as cache:
+            route = load_route(path, cache)
+            warm = best_of(args.repeat, lambda: load_route(path, cache))
+        counts = [len(route.simplified(z)) for z in ZOOMS]
+        print(f"{path.name:<40} {path.stat().st_size:7d} {baseline:>9} "
+              f"{best_of(args.repeat, cold):8.2f} {warm:8.2f}  {counts}")
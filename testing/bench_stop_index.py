@@ -0,0 +1,68 @@
+# bench_stop_index.py
+# Nearest-stop query latency on a synthetic city of stops (20k by default):
+#   loop       - math.haversine over every stop in a Python loop (the naive way)
+#   nearest    - StopIndex.nearest, grid lookup + vectorized haversine
+#   within     - StopIndex.within, 400 m radius
+#   batch      - StopIndex.nearest_batch over all query points at once
+# Run from the repository root:
+#
+#   python testing/bench_stop_index.py [--stops 20000] [--queries 20000] [-k 5]
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from stop_index import EARTH_RADIUS_M, StopIndex  # noqa: E402
+
+# Roughly the Rapid City service area
+LON = (-103.40, -103.10)
+LAT = (43.95, 44.20)
+
+
+def loop_nearest(stops, lon, lat, k):
+    distances = []
+    for i, (slon, slat) in enumerate(stops):
+        p1, p2 = math.radians(lat), math.radians(slat)
+        a = (math.sin((p2 - p1) / 2) ** 2
+             + math.cos(p1) * math.cos(p2) * math.sin(math.radians(slon - lon) / 2) ** 2)
+        distances.append((2 * EARTH_RADIUS_M * math.asin(math.sqrt(a)), i))
+    return sorted(distances)[:k]
+
+
+def per_query_us(fn, points):
+    start = time.perf_counter()
+    for lon, lat in points:
+        fn(lon, lat)
+    return (time.perf_counter() - start) / len(points) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="StopIndex query benchmark")
+    parser.add_argument("--stops", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(2025)
+    stops = np.column_stack((rng.uniform(*LON, args.stops), rng.uniform(*LAT, args.stops)))
+    points = np.column_stack((rng.uniform(*LON, args.queries), rng.uniform(*LAT, args.queries)))
+
+    start = time.perf_counter()
+    index = StopIndex(stops)
+    print(f"build      {(time.perf_counter() - start) * 1000:9.1f} ms  ({args.stops} stops)")
+
+    sample = points[:100]  # the loop is slow; 100 queries are plenty
+    stop_list = stops.tolist()
+    print(f"loop       {per_query_us(lambda lon, lat: loop_nearest(stop_list, lon, lat, args.k), sample):9.1f} us/query")
+    print(f"nearest    {per_query_us(lambda lon, lat: index.nearest(lon, lat, args.k), points):9.1f} us/query")
+    print(f"within     {per_query_us(lambda lon, lat: index.within(lon, lat, 400), points):9.1f} us/query")
+    start = time.perf_counter()
+    index.nearest_batch(points, args.k)
+    elapsed = time.perf_counter() - start
+    print(f"batch      {elapsed / len(points) * 1e6:9.1f} us/query  ({len(points)} points in {elapsed * 1000:.1f} ms)")
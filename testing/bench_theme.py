@@ -0,0 +1,176 @@
+# bench_theme.py
+# Theme switch cost on a window with many themed items, before and after the
+# precomputed theme tables.
+#   legacy      - the previous ThemeController: colors.json re-read, QPalette
+#                 rebuilt and one themeChanged notifying all 12 colors, so
+#                 every bound item re-evaluates
+#   tables      - main.ThemeController: precomputed QColor and QPalette tables
+#                 behind a QQmlPropertyMap that notifies changed keys only
+# Each delegate binds five colors, as a list row in the app does.  Two
+# sequences are measured: every theme in colors.json order, where nearly all
+# colors differ from one theme to the next, and Light and Solarized Light in
+# turn, which share their accent, highlight and link colors.  Per switch it
+# records the time setTheme holds the GUI thread, and the time until the next
+# frame is on screen.
+# Run from the repository root:
+#
+#   python testing/bench_theme.py [--items 500] [--rounds 20]
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import main  # noqa: E402
+from PySide6.QtCore import Property, QByteArray, QCoreApplication, QEvent, QEventLoop, QObject, QTimer, QUrl, Signal, Slot  # noqa: E402
+from PySide6.QtGui import QColor, QGuiApplication, QPalette  # noqa: E402
+from PySide6.QtQml import QQmlApplicationEngine  # noqa: E402
+from PySide6.QtQuick import QQuickWindow, QSGRendererInterface  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+from theme_manager import ThemeManager  # noqa: E402
+from network import FRAME_BUDGET_MS  # noqa: E402
+
+WINDOW = """
+import QtQuick
+Window {
+    width: 480; height: 800; visible: true
+    color: Theme.background
+    Flow {
+        anchors.fill: parent
+        Repeater {
+            model: %d
+            Rectangle {
+                width: 96; height: 32
+                color: Theme.buttonBackground
+                border.color: Theme.border
+                Rectangle { width: 4; height: parent.height; color: Theme.accent }
+                Text { x: 8; text: "Stop " + index; color: Theme.text }
+                Text { x: 8; y: 16; text: "12:0" + (index %% 10); color: Theme.placeholder; font.pixelSize: 9 }
+            }
+        }
+    }
+}
+"""
+
+
+class LegacyThemeController(QObject):
+    """The ThemeController this replaces, trimmed to what the window binds."""
+    themeChanged = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self._theme_manager = ThemeManager()
+        self._current_theme = self._theme_manager.get_theme()
+        self._theme_data = self._read()
+
+    def _read(self):
+        with open(self._theme_manager.colors_path, "r") as f:
+            return json.load(f).get(self._theme_manager.get_theme(), {})
+
+    @Slot(str)
+    def setTheme(self, name):
+        self._theme_manager._theme = name   # not saved: the bench leaves theme.json alone
+        self._current_theme = name
+        self._theme_data = self._read()
+        self.applyPalette()
+        self.themeChanged.emit()
+
+    def applyPalette(self):
+        palette = QPalette()
+        for role, key in main.PALETTE_ROLES:
+            palette.setColor(role, QColor(self._theme_data.get(key, main.THEME_DEFAULTS[key])))
+        palette.setColor(QPalette.BrightText, QColor("#ff0000"))
+        QGuiApplication.setPalette(palette)
+
+    def _color(key, notify=themeChanged):
+        return Property(str, lambda self: self._theme_data.get(key, main.THEME_DEFAULTS[key]), notify=notify)
+
+    currentTheme = Property(str, lambda self: self._current_theme, notify=themeChanged)
+    background = _color("background")
+    text = _color("text")
+    accent = _color("accent")
+    border = _color("border")
+    buttonBackground = _color("buttonBackground")
+    buttonText = _color("buttonText")
+    toolTipBase = _color("toolTipBase")
+    toolTipText = _color("toolTipText")
+    highlight = _color("highlight")
+    highlightedText = _color("highlightedText")
+    placeholder = _color("placeholder")
+    link = _color("link")
+
+
+class TablesTheme:
+    """main.ThemeController, with theme.json left alone."""
+
+    def __init__(self):
+        self.controller = main.ThemeController()
+        self.controller._theme_manager.save_theme = lambda theme: None
+        self.context = self.controller.colors
+
+    def setTheme(self, name):
+        self.controller.setTheme(name)
+
+
+class LegacyTheme:
+    def __init__(self):
+        self.controller = LegacyThemeController()
+        self.context = self.controller
+
+    def setTheme(self, name):
+        self.controller.setTheme(name)
+
+
+def run(theme, sequence: list[str], items: int, rounds: int):
+    engine = QQmlApplicationEngine()
+    engine.rootContext().setContextProperty("Theme", theme.context)
+    engine.loadData(QByteArray((WINDOW % items).encode()), QUrl("bench_theme.qml"))
+    window = engine.rootObjects()[0]
+    QCoreApplication.processEvents()
+
+    calls, frames = [], []
+    for _ in range(rounds):
+        for name in sequence:
+            swapped = QEventLoop()
+            window.frameSwapped.connect(swapped.quit)
+            start = time.perf_counter()
+            theme.setTheme(name)
+            calls.append((time.perf_counter() - start) * 1000)
+            QTimer.singleShot(1000, swapped.quit)
+            swapped.exec()
+            frames.append((time.perf_counter() - start) * 1000)
+            window.frameSwapped.disconnect(swapped.quit)
+    # The window goes before the theme object its bindings read
+    engine.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+    return calls, frames
+
+
+def row(label: str, values: list[float]):
+    values = sorted(values)
+    over = sum(v > FRAME_BUDGET_MS for v in values)
+    print(f"  {label:20} p50 {statistics.median(values):6.1f}  p90 {values[int(len(values) * 0.9)]:6.1f}  "
+          f"max {values[-1]:6.1f} ms   {over}/{len(values)} over {FRAME_BUDGET_MS:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Theme switch latency")
+    parser.add_argument("--items", type=int, default=500, help="themed delegates in the window")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    QQuickWindow.setGraphicsApi(QSGRendererInterface.GraphicsApi.Software)
+    app = QApplication(sys.argv[:1])
+    sequences = {"all themes": list(ThemeManager().themes()), "Light / Solarized Light": ["Light", "Solarized Light"]}
+    print(f"{args.items} delegates x 5 colors, {args.rounds} rounds")
+    for title, sequence in sequences.items():
+        print(title)
+        for label, make in (("legacy", LegacyTheme), ("tables", TablesTheme)):
+            calls, frames = run(make(), sequence, args.items, args.rounds)
+            row(f"{label} setTheme", calls)
+            row(f"{label} next frame", frames)
@@ -0,0 +1,77 @@
+# bench_ticket_format.py
+# QR size and render time for the ticket payload formats, plus decode cost:
+#   envelope   - base64 of {"ticket": {...}, "signature": "<base64>"} (testing/qr.py)
+#   v1         - base64(JSON record || signature)
+#   v2         - "RR2:" + base45(27-byte record || signature)
+# For each: payload length, the QR mode and version segno picks at error
+# level M, render_qr time, and split + decode + Ed25519 verify time.
+# Run from the repository root:
+#
+#   python testing/bench_ticket_format.py [--rounds 200]
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import segno  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+import ticket_payload  # noqa: E402
+from qr_provider import render_qr  # noqa: E402
+
+RECORD = {
+    "ticket_id": str(uuid.uuid4()),
+    "user_id": "001132",
+    "ticket_type": "monthly_pass",
+    "valid_for": "None",
+    "issued_at": "2025-07-02T18:26:00Z",
+    "expires_at": "2025-08-01T18:26:00Z",
+    "issuer": "RTS RapidRide",
+}
+
+
+def payloads(key: Ed25519PrivateKey) -> dict[str, str]:
+    message = json.dumps(RECORD).encode()
+    signature = key.sign(message)
+    envelope = json.dumps({"ticket": RECORD, "signature": base64.b64encode(signature).decode()})
+    packed = ticket_payload.pack_record(RECORD)
+    return {
+        "envelope": base64.b64encode(envelope.encode()).decode(),
+        "v1": base64.b64encode(message + signature).decode(),
+        "v2": ticket_payload.encode_v2(packed, key.sign(packed)),
+    }
+
+
+def per_call_us(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ticket payload format benchmark")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    key = Ed25519PrivateKey.generate()
+    public_key = key.public_key()
+
+    def decode_and_verify(payload):
+        message, signature = ticket_payload.split_signed(payload)
+        ticket_payload.decode_record(message)
+        public_key.verify(signature, message)
+
+    print(f"{'format':10} {'chars':>6} {'mode':>13} {'version':>8} {'modules':>8} {'render':>10} {'verify':>10}")
+    for name, payload in payloads(key).items():
+        qr = segno.make(payload, error='m')
+        render = per_call_us(lambda: render_qr(payload), args.rounds) / 1000
+        verify = (f"{per_call_us(lambda: decode_and_verify(payload), args.rounds):7.0f} us"
+                  if name != "envelope" else "       n/a")
+        print(f"{name:10} {len(payload):6d} {qr.mode:>13} {qr.version:>8} "
+              f"{qr.symbol_size(border=0)[0]:>8} {render:7.2f} ms {verify:>10}")
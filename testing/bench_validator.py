@@ -0,0 +1,85 @@
+# bench_validator.py
+# Scans per second through the offline validator on freshly signed tickets
+# (20k by default; a mix of single_use, ten_ride and monthly_pass):
+#   single     - validate() one payload at a time, in-process
+#   batch      - validate_batch() in batches of --batch, in-process verification
+#   pool       - validate_batch() with --workers verification processes
+#   replay     - the same tickets scanned again; spent ones are rejected before
+#                the signature check
+# plus the Bloom filter's size and measured false-positive rate.
+# Run from the repository root:
+#
+#   python testing/bench_validator.py [--tickets 20000] [--batch 512] [--workers 4]
+
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat  # noqa: E402
+from validator import BloomFilter, UsageLedger, Validator  # noqa: E402
+
+TYPES = ["single_use", "ten_ride", "monthly_pass"]
+
+
+def make_payloads(key: Ed25519PrivateKey, count: int) -> list[str]:
+    payloads = []
+    for i in range(count):
+        msg = json.dumps({
+            "ticket_id": str(uuid.uuid4()),
+            "ticket_type": TYPES[i % len(TYPES)],
+            "issued_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "issuer": "RTS RapidRide",
+        }).encode()
+        payloads.append(base64.b64encode(msg + key.sign(msg)).decode())
+    return payloads
+
+
+def run(label, validator, payloads, batch):
+    start = time.perf_counter()
+    statuses = Counter()
+    for i in range(0, len(payloads), batch):
+        statuses.update(r.status for r in validator.validate_batch(payloads[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    print(f"{label:10} {len(payloads) / elapsed:9.0f} scans/s   {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline validator benchmark")
+    parser.add_argument("--tickets", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    key = Ed25519PrivateKey.generate()
+    raw_key = key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    print(f"Signing {args.tickets} tickets...")
+    payloads = make_payloads(key, args.tickets)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single = Validator(raw_key, UsageLedger(Path(tmp) / "single.db"), workers=1)
+        run("single", single, payloads[: args.tickets // 10], 1)
+
+        batched = Validator(raw_key, UsageLedger(Path(tmp) / "batch.db"), workers=1)
+        run("batch", batched, payloads, args.batch)
+
+        pooled = Validator(raw_key, UsageLedger(Path(tmp) / "pool.db"), workers=args.workers)
+        run(f"pool x{args.workers}", pooled, payloads, args.batch)
+        run("replay", pooled, payloads, args.batch)
+        pooled.close()
+
+    bloom = BloomFilter(args.tickets)
+    for p in payloads:
+        bloom.add(p.encode())
+    false_hits = sum(str(uuid.uuid4()).encode() in bloom for _ in range(100_000))
+    print(f"bloom      {len(bloom._bits) / 1024:9.1f} KiB for {args.tickets} ids, "
+          f"{bloom.hashes} hashes, {false_hits / 1000:.3f}% false positives")
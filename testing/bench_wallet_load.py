@@ -0,0 +1,68 @@
+# bench_wallet_load.py
+# Times WalletStore.load on a wallet of signed tickets (10k by default).
+#
+# Builds a throwaway legacy wallet.json signed with a fresh Ed25519 key (migrated
+# into wallet.db by the first load), then loads it:
+#   serial     - no verification cache, one thread (the old behaviour)
+#   cold       - no verification cache, thread pool
+#   warm       - verification cache populated by the previous load
+# Run from the repository root:
+#
+#   python testing/bench_wallet_load.py [--tickets 10000]
+
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+from wallet_store import WalletStore  # noqa: E402
+
+
+def make_wallet(path: Path, key: Ed25519PrivateKey, count: int):
+    tickets = []
+    for i in range(count):
+        msg = json.dumps({
+            "ticket_id": str(uuid.uuid4()),
+            "ticket_type": "single_use",
+            "issued_at": "2025-07-02T18:26:00Z",
+            "issuer": "RTS RapidRide",
+        }).encode()
+        payload = base64.b64encode(msg + key.sign(msg)).decode()
+        tickets.append({"payload": payload, "type": "single_use", "purchasedAt": "2025-07-02T18:26:00Z"})
+    path.write_text(json.dumps(tickets))
+
+
+def timed_load(data_dir, public_key, workers):
+    start = time.perf_counter()
+    store = WalletStore(data_dir=data_dir, public_key=public_key, verify_workers=workers)
+    store.load()
+    return time.perf_counter() - start, len(store.getTickets())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WalletStore load benchmark")
+    parser.add_argument("--tickets", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    key = Ed25519PrivateKey.generate()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Signing {args.tickets} tickets...")
+        make_wallet(Path(tmp) / "wallet.json", key, args.tickets)
+        cache = Path(tmp) / "verified.json"
+
+        elapsed, n = timed_load(tmp, key.public_key(), 1)
+        print(f"serial       {elapsed * 1000:9.1f} ms  ({n} valid)")
+        cache.unlink()
+        elapsed, n = timed_load(tmp, key.public_key(), args.workers)
+        print(f"cold x{args.workers:<5d} {elapsed * 1000:9.1f} ms  ({n} valid)")
+        elapsed, n = timed_load(tmp, key.public_key(), args.workers)
+        print(f"warm         {elapsed * 1000:9.1f} ms  ({n} valid)")
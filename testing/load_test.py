@@ -0,0 +1,159 @@
+# load_test.py
+# Drives many simulated clients through the client API surface and reports
+# latency percentiles per endpoint.
+#
+# Each client is a thread with its own keep-alive requests.Session, making
+# the same calls NetworkManager makes, in the order a rider would:
+#   POST /register, POST /token (login), GET /public_key, GET /wallet,
+#   then --rounds rounds of: GET /wallet?since=<cursor> (delta sync),
+#   POST /generate, GET /qr/<id>, GET /qr/<id> again with If-None-Match (304).
+# Clients start over --ramp seconds and pause --think seconds between calls.
+# Requests answered 5xx or dropped count as errors; the client carries on.
+#
+# By default a stand-in server (stand_in_server.py) is started in a separate
+# process, so the server is not competing with the clients for the GIL; the
+# fault options are passed through to it.  --url targets a running server.
+# Run from the repository root:
+#
+#   python testing/load_test.py [--clients 200] [--rounds 5] [--latency 50 --error-rate 0.01]
+#   python testing/load_test.py --url http://127.0.0.1:8000 --clients 500
+
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+TICKET_TYPES = ["single_use", "ten_ride", "monthly_pass"]
+
+
+class Recorder:
+    """Latencies (ms) and error counts per endpoint label, shared by all client threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def call(self, label: str, fn, *args, ok=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = fn(*args, timeout=30, **kwargs)
+        except requests.RequestException:
+            response = None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies[label].append(elapsed)
+            if response is None or response.status_code not in ok:
+                self.errors[label] += 1
+                return None
+        return response
+
+
+def percentile(values, p):
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))]
+
+
+def client(base_url: str, index: int, rounds: int, think: float, recorder: Recorder):
+    session = requests.Session()
+    username, password = f"load{index}-{random.getrandbits(32):08x}", "secret"
+
+    def pause():
+        if think:
+            time.sleep(random.uniform(0, 2 * think))
+
+    r = recorder.call("register", session.post, f"{base_url}/register",
+                      json={"username": username, "email": None, "password": password})
+    r = recorder.call("login", session.post, f"{base_url}/token",
+                      data={"username": username, "password": password})
+    if r is None:
+        return
+    auth = {"Authorization": f"{r.json()['token_type']} {r.json()['access_token']}"}
+    pause()
+    recorder.call("public_key", session.get, f"{base_url}/public_key")
+    r = recorder.call("wallet", session.get, f"{base_url}/wallet", headers=auth)
+    cursor = r.headers.get("X-Wallet-Cursor") if r is not None else None
+    qr_etags = {}
+    for _ in range(rounds):
+        pause()
+        if cursor:
+            r = recorder.call("wallet delta", session.get, f"{base_url}/wallet",
+                              params={"since": cursor}, headers=dict(auth, Accept="application/x-ndjson"))
+            if r is not None:
+                cursor = json.loads(r.text.strip().rsplit("\n", 1)[-1]).get("cursor", cursor)
+        pause()
+        r = recorder.call("generate", session.post, f"{base_url}/generate",
+                          json={"ticket_type": random.choice(TICKET_TYPES)}, headers=auth)
+        if r is None:
+            continue
+        ticket_id = r.json()["ticket_id"]
+        pause()
+        r = recorder.call("qr", session.get, f"{base_url}/qr/{ticket_id}", headers=auth)
+        if r is not None:
+            qr_etags[ticket_id] = r.headers.get("ETag")
+            recorder.call("qr 304", session.get, f"{base_url}/qr/{ticket_id}", ok=(304,),
+                          headers=dict(auth, **{"If-None-Match": qr_etags[ticket_id]}))
+    session.close()
+
+
+def start_server(args) -> tuple[subprocess.Popen, str]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    command = [sys.executable, os.path.join(os.path.dirname(__file__), "stand_in_server.py"),
+               "--port", str(port), "--tickets", str(args.tickets), "--format", args.format,
+               "--strict-auth", "--latency", str(args.latency), "--jitter", str(args.jitter),
+               "--error-rate", str(args.error_rate), "--drop-rate", str(args.drop_rate)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    print(server.stdout.readline().strip())
+    return server, f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client API load generator")
+    parser.add_argument("--url", help="target a running server instead of starting a stand-in")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="sync/generate/QR rounds per client")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which clients start")
+    parser.add_argument("--think", type=float, default=0.05, help="mean pause between calls, seconds")
+    parser.add_argument("--tickets", type=int, default=20, help="stand-in: tickets seeded per wallet")
+    parser.add_argument("--format", choices=["v1", "v2"], default="v1", help="stand-in: payload format")
+    parser.add_argument("--latency", type=float, default=0, help="stand-in: mean added latency, ms")
+    parser.add_argument("--jitter", type=float, default=0, help="stand-in: latency deviation, ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="stand-in: fraction answered 503")
+    parser.add_argument("--drop-rate", type=float, default=0, help="stand-in: fraction dropped")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url = start_server(args)
+    recorder = Recorder()
+    threads = [threading.Thread(target=client, args=(base_url, i, args.rounds, args.think, recorder), daemon=True)
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+            time.sleep(args.ramp / args.clients)
+        for thread in threads:
+            thread.join()
+    finally:
+        if server is not None:
+            server.terminate()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"{args.clients} clients, {total} requests in {elapsed:.1f} s = {total / elapsed:.0f} req/s")
+    print(f"{'endpoint':14} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, values in recorder.latencies.items():
+        print(f"{label:14} {len(values):7d} {recorder.errors[label]:7d} {statistics.median(values):8.1f} "
+              f"{percentile(values, 0.90):8.1f} {percentile(values, 0.99):8.1f} {max(values):8.1f}")
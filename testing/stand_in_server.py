@@ -0,0 +1,462 @@
+# stand_in_server.py
+# Local stand-in for the RapidRide backend, for exercising the client offline
+# and under load (see load_test.py).
+#
+# Implements the endpoints NetworkManager and WalletStore talk to:
+#   POST /register              JSON {username, email, password} -> bearer token, 409 if taken
+#   POST /token                 form login; any username/password gets a token, except a
+#                               registered user with the wrong password (401)
+#   GET  /wallet                full JSON array, with ETag and X-Wallet-Cursor
+#   GET  /wallet?since=<cursor> NDJSON delta (upsert / revoke records, then the new cursor),
+#                               410 Gone if the cursor is older than the retained change log
+#   POST /generate              JSON {ticket_type} -> {"payload": ...}, ticket added to the wallet;
+#                               a repeated Idempotency-Key gets the first reply, no new ticket
+#   GET  /qr/<ticket_id>        PNG of the ticket's payload, with ETag (304 on a match)
+#   POST /create-checkout-session  JSON {ticket_type} -> {"url": .../checkout/<session>}
+#   GET  /checkout/<session>    "payment page": issues the ticket and says so
+#   GET  /public_key            raw 32-byte Ed25519 verification key
+#   POST /_admin/issue          add a ticket to the demo wallet     (testing aid)
+#   POST /_admin/revoke/<id>    revoke a demo-wallet ticket         (testing aid)
+#
+# Every ticket carries a payload signed with a real Ed25519 key (generated at
+# start-up, or --key), in the v1 (base64 JSON) or v2 (RR2:) format, so the
+# client's signature checks run for real.  Each user has their own wallet,
+# seeded with --tickets tickets; a token the server does not know (say, one
+# saved by the client before a server restart) is treated as the demo user
+# unless --strict-auth is given.
+#
+# Fault injection, applied to every route except /_admin:
+#   --latency MS --jitter MS    normally distributed delay before each response
+#   --error-rate P              fraction answered 503 with Retry-After
+#   --drop-rate P               fraction whose connection is closed without a response
+#
+# Run from the repository root and point the client at it:
+#
+#   python testing/stand_in_server.py --port 8000 --tickets 2000 --churn 5
+#   python testing/stand_in_server.py --latency 150 --jitter 50 --error-rate 0.02
+#   API_URL=http://127.0.0.1:8000 python app/main.py
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat  # noqa: E402
+import ticket_payload  # noqa: E402
+
+TICKET_TYPES = ["single_use", "ten_ride", "monthly_pass"]
+DEMO_USER = "demo"
+
+
+class Issuer:
+    """Signs ticket records into payloads of one format."""
+
+    def __init__(self, key: Ed25519PrivateKey | None = None, fmt: str = "v1"):
+        self.key = key or Ed25519PrivateKey.generate()
+        self.format = fmt
+        self.public_bytes = self.key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+    def sign(self, record: dict) -> str:
+        if self.format == "v2":
+            message = ticket_payload.pack_record(record)
+            return ticket_payload.encode_v2(message, self.key.sign(message))
+        message = json.dumps(record).encode()
+        return base64.b64encode(message + self.key.sign(message)).decode()
+
+
+class WalletState:
+    """Tickets plus an append-only change log; the cursor is the last change's sequence number."""
+
+    def __init__(self, log_limit: int = 10_000, issuer: Issuer | None = None):
+        self._lock = threading.Lock()
+        self.tickets: dict[str, dict] = {}
+        self.log: list[tuple[int, str, str]] = []   # (seq, op, ticket_id)
+        self.seq = 0
+        self.log_limit = log_limit
+        self.issuer = issuer or Issuer()
+
+    def _record(self, op: str, ticket_id: str):
+        self.seq += 1
+        self.log.append((self.seq, op, ticket_id))
+        if len(self.log) > self.log_limit:
+            del self.log[: len(self.log) - self.log_limit]
+
+    def issue(self, ticket_type: str | None = None) -> dict:
+        now = time.time()
+        ticket_type = ticket_type or random.choice(TICKET_TYPES)
+        ticket = {
+            "ticket_id": str(uuid.uuid4()),
+            "ticket_type": ticket_type,
+            "issued_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+            "expires_at": (time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now + 30 * 86400))
+                           if ticket_type == "monthly_pass" else ""),
+        }
+        ticket["payload"] = self.issuer.sign(ticket)
+        with self._lock:
+            self.tickets[ticket["ticket_id"]] = ticket
+            self._record("upsert", ticket["ticket_id"])
+        return ticket
+
+    def revoke(self, ticket_id: str) -> bool:
+        with self._lock:
+            if self.tickets.pop(ticket_id, None) is None:
+                return False
+            self._record("revoke", ticket_id)
+            return True
+
+    def get(self, ticket_id: str) -> dict | None:
+        with self._lock:
+            return self.tickets.get(ticket_id)
+
+    def snapshot(self) -> tuple[list[dict], int]:
+        with self._lock:
+            return list(self.tickets.values()), self.seq
+
+    def changes_since(self, since: int) -> tuple[list[dict], int] | None:
+        """Collapsed delta records after `since`, or None if the log no longer reaches back that far."""
+        with self._lock:
+            if since > self.seq or (self.log and since < self.log[0][0] - 1):
+                return None
+            latest: dict[str, str] = {}
+            for seq, op, ticket_id in self.log:
+                if seq > since:
+                    latest[ticket_id] = op
+            records = []
+            for ticket_id, op in latest.items():
+                if op == "upsert" and ticket_id in self.tickets:
+                    records.append({"op": "upsert", "ticket": self.tickets[ticket_id]})
+                else:
+                    records.append({"op": "revoke", "ticket_id": ticket_id})
+            return records, self.seq
+
+
+class Accounts:
+    """Users, their password hashes, bearer tokens, wallets and pending checkout sessions."""
+
+    def __init__(self, issuer: Issuer, seed_tickets: int = 0, strict: bool = False):
+        self._lock = threading.Lock()
+        self.issuer = issuer
+        self.seed_tickets = seed_tickets
+        self.strict = strict
+        self.passwords: dict[str, str] = {}
+        self.tokens: dict[str, str] = {}
+        self.wallets: dict[str, WalletState] = {}
+        self.checkouts: dict[str, tuple[str, str]] = {}   # session -> (user, ticket_type)
+        self.replies: dict[str, dict] = {}                # Idempotency-Key -> first reply
+
+    @staticmethod
+    def _hash(password: str) -> str:
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def register(self, username: str, password: str) -> str | None:
+        with self._lock:
+            if username in self.passwords:
+                return None
+            self.passwords[username] = self._hash(password)
+        return self.login(username, password)
+
+    def login(self, username: str, password: str) -> str | None:
+        with self._lock:
+            known = self.passwords.get(username)
+            if known is not None and known != self._hash(password):
+                return None
+            token = uuid.uuid4().hex
+            self.tokens[token] = username
+            return token
+
+    def user(self, authorization: str | None) -> str | None:
+        """The user a bearer token belongs to; unknown tokens are the demo user unless strict."""
+        token = (authorization or "").removeprefix("Bearer ").strip()
+        with self._lock:
+            user = self.tokens.get(token)
+        if user is None and not self.strict and token:
+            return DEMO_USER
+        return user
+
+    def once(self, key: str | None, make) -> dict:
+        """make()'s reply, computed once per Idempotency-Key (every time without one)."""
+        if not key:
+            return make()
+        with self._lock:
+            if key not in self.replies:
+                self.replies[key] = make()
+            return self.replies[key]
+
+    def wallet(self, user: str) -> WalletState:
+        with self._lock:
+            wallet = self.wallets.get(user)
+            if wallet is not None:
+                return wallet
+            wallet = self.wallets[user] = WalletState(issuer=self.issuer)
+        for _ in range(self.seed_tickets):
+            wallet.issue()
+        return wallet
+
+
+class Faults:
+    """Latency and error injection settings shared by every handler thread."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, drop_rate: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+
+    def delay(self) -> float:
+        if not self.latency_ms and not self.jitter_ms:
+            return 0.0
+        return max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: WalletState = None
+    accounts: Accounts = None
+    faults: Faults = None
+
+    # ----- Helpers ---------------------------------------------------------
+    def _send(self, status: int, body: bytes = b"", content_type: str = "application/json",
+              headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _json(self, status: int, obj, headers: dict | None = None):
+        self._send(status, json.dumps(obj).encode(), headers=headers)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _inject_faults(self, path: str) -> bool:
+        """Delay, fail or drop the request as configured; True if it was answered here."""
+        if path.startswith("/_admin/") or self.faults is None:
+            return False
+        delay = self.faults.delay()
+        if delay:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < self.faults.drop_rate:
+            self.close_connection = True
+            return True
+        if roll < self.faults.drop_rate + self.faults.error_rate:
+            self._json(503, {"detail": "injected failure"}, headers={"Retry-After": "1"})
+            return True
+        return False
+
+    def _wallet(self) -> WalletState | None:
+        """The caller's wallet, or None after answering 401."""
+        user = self.accounts.user(self.headers.get("Authorization"))
+        if user is None:
+            self._json(401, {"detail": "Not authenticated"}, headers={"WWW-Authenticate": "Bearer"})
+            return None
+        return self.accounts.wallet(user)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ----- Routes ------------------------------------------------------------
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self._body()
+        if self._inject_faults(path):
+            return
+        if path == "/token":
+            form = parse_qs(body.decode())
+            token = self.accounts.login(form.get("username", [""])[0], form.get("password", [""])[0])
+            if token is None:
+                self._json(401, {"detail": "Incorrect username or password"})
+            else:
+                self._json(200, {"access_token": token, "token_type": "Bearer"})
+        elif path == "/register":
+            data = json.loads(body or b"{}")
+            if not data.get("username") or not data.get("password"):
+                self._json(422, {"detail": "username and password are required"})
+                return
+            token = self.accounts.register(data["username"], data["password"])
+            if token is None:
+                self._json(409, {"detail": "Username already registered"})
+            else:
+                self._json(200, {"access_token": token, "token_type": "Bearer"})
+        elif path == "/generate":
+            wallet = self._wallet()
+            if wallet is not None:
+                def generate():
+                    ticket = wallet.issue(json.loads(body or b"{}").get("ticket_type"))
+                    return {"ticket_id": ticket["ticket_id"], "payload": ticket["payload"]}
+
+                self._json(200, self.accounts.once(self.headers.get("Idempotency-Key"), generate))
+        elif path == "/create-checkout-session":
+            user = self.accounts.user(self.headers.get("Authorization"))
+            session = uuid.uuid4().hex
+            ticket_type = json.loads(body or b"{}").get("ticket_type", "single_use")
+            self.accounts.checkouts[session] = (user or DEMO_USER, ticket_type)
+            host = self.headers.get("Host", "127.0.0.1")
+            self._json(200, {"url": f"http://{host}/checkout/{session}"})
+        elif path == "/_admin/issue":
+            ticket_type = json.loads(body or b"{}").get("ticket_type")
+            self._json(200, self.state.issue(ticket_type))
+        elif path.startswith("/_admin/revoke/"):
+            ok = self.state.revoke(path.rsplit("/", 1)[1])
+            self._json(200 if ok else 404, {"revoked": ok})
+        else:
+            self._json(404, {"detail": "Not Found"})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if self._inject_faults(parts.path):
+            return
+        if parts.path == "/public_key":
+            self._send(200, self.accounts.issuer.public_bytes, content_type="application/octet-stream")
+        elif parts.path.startswith("/checkout/"):
+            self._checkout(parts.path.rsplit("/", 1)[1])
+        elif parts.path.startswith("/qr/"):
+            wallet = self._wallet()
+            if wallet is not None:
+                self._qr(wallet, parts.path.rsplit("/", 1)[1])
+        elif parts.path == "/wallet":
+            wallet = self._wallet()
+            if wallet is None:
+                return
+            since = parse_qs(parts.query).get("since")
+            if since:
+                self._wallet_delta(wallet, since[0])
+            else:
+                self._wallet_full(wallet)
+        else:
+            self._json(404, {"detail": "Not Found"})
+
+    def _wallet_full(self, wallet: WalletState):
+        tickets, seq = wallet.snapshot()
+        etag = f'"w{seq}"'
+        headers = {"ETag": etag, "X-Wallet-Cursor": str(seq)}
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers=headers)
+            return
+        self._json(200, tickets, headers=headers)
+
+    def _wallet_delta(self, wallet: WalletState, since: str):
+        try:
+            delta = wallet.changes_since(int(since))
+        except ValueError:
+            delta = None
+        if delta is None:
+            self._json(410, {"detail": "cursor expired"})
+            return
+        records, seq = delta
+        lines = [json.dumps(r) for r in records] + [json.dumps({"cursor": str(seq)})]
+        self._send(200, ("\n".join(lines) + "\n").encode(), content_type="application/x-ndjson")
+
+    def _qr(self, wallet: WalletState, ticket_id: str):
+        ticket = wallet.get(ticket_id)
+        if ticket is None:
+            self._json(404, {"detail": "Ticket not found"})
+            return
+        # A ticket's payload never changes, so its id is a strong validator
+        etag = f'"qr-{ticket_id}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers={"ETag": etag})
+            return
+        self._send(200, qr_png(ticket["payload"]), content_type="image/png", headers={"ETag": etag})
+
+    def _checkout(self, session: str):
+        entry = self.accounts.checkouts.pop(session, None)
+        if entry is None:
+            self._send(404, b"<p>Unknown or completed checkout session.</p>", content_type="text/html")
+            return
+        user, ticket_type = entry
+        ticket = self.accounts.wallet(user).issue(ticket_type)
+        self._send(200, f"<p>Payment received: {ticket_type} ticket {ticket['ticket_id']} "
+                        f"is in your wallet.</p>".encode(), content_type="text/html")
+
+
+_qr_cache: dict[str, bytes] = {}
+_qr_lock = threading.Lock()
+
+
+def qr_png(payload: str) -> bytes:
+    """PNG for a payload, rendered once per payload."""
+    with _qr_lock:
+        png = _qr_cache.get(payload)
+    if png is None:
+        import segno
+
+        out = io.BytesIO()
+        segno.make(payload, error='m').save(out, kind="png", scale=5)
+        png = out.getvalue()
+        with _qr_lock:
+            _qr_cache[payload] = png
+    return png
+
+
+def churn(state: WalletState, interval: float):
+    """Issue, reissue and revoke tickets forever, one change every `interval` seconds."""
+    while True:
+        time.sleep(interval)
+        tickets, _ = state.snapshot()
+        if tickets and random.random() < 0.3:
+            state.revoke(random.choice(tickets)["ticket_id"])
+        else:
+            state.issue()
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, tickets: int = 0, faults: Faults | None = None,
+                issuer: Issuer | None = None, strict_auth: bool = False) -> ThreadingHTTPServer:
+    accounts = Accounts(issuer or Issuer(), tickets, strict_auth)
+    state = accounts.wallet(DEMO_USER)
+    handler = type("Handler", (StandInHandler,), {"state": state, "accounts": accounts, "faults": faults})
+    # Hundreds of load-test clients connect at once; the default backlog of 5 would reset them
+    server_class = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 1024})
+    server = server_class((host, port), handler)
+    server.state = state
+    server.accounts = accounts
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RapidRide stand-in backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tickets", type=int, default=50, help="tickets to seed each wallet with")
+    parser.add_argument("--churn", type=float, default=0, help="seconds between random demo-wallet changes")
+    parser.add_argument("--key", help="Ed25519 private key (PEM or raw 32 bytes) to sign with")
+    parser.add_argument("--format", choices=["v1", "v2"], default="v1", help="ticket payload format")
+    parser.add_argument("--strict-auth", action="store_true", help="answer 401 to unknown tokens")
+    parser.add_argument("--latency", type=float, default=0, help="mean added latency, ms")
+    parser.add_argument("--jitter", type=float, default=0, help="latency standard deviation, ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered 503")
+    parser.add_argument("--drop-rate", type=float, default=0, help="fraction of connections dropped")
+    args = parser.parse_args()
+
+    key = None
+    if args.key:
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key
+        with open(args.key, "rb") as f:
+            data = f.read()
+        key = Ed25519PrivateKey.from_private_bytes(data) if len(data) == 32 else load_pem_private_key(data, None)
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.drop_rate)
+    server = make_server(args.host, args.port, args.tickets, faults, Issuer(key, args.format), args.strict_auth)
+    if args.churn > 0:
+        threading.Thread(target=churn, args=(server.state, args.churn), daemon=True).start()
+    print(f"Stand-in backend on http://{args.host}:{server.server_address[1]} "
+          f"({args.tickets} tickets per wallet, {args.format} payloads, churn={args.churn}s, "
+          f"latency={args.latency}±{args.jitter} ms, errors={args.error_rate:.0%}, "
+          f"drops={args.drop_rate:.0%})", flush=True)
+    server.serve_forever()